@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+import random
+import argparse
+import difflib
+import numpy as np
+from PIL import Image, ImageFilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../media-index"))
+from ocr_backend import OCR_BACKENDS, get_backend
+from image_prep import DEFAULT_IMAGE_PREP, NO_IMAGE_PREP, prepare_image
+from bench_ocr_backend import make_text_images
+
+MODES = {
+    "original": NO_IMAGE_PREP,
+    "prepared": DEFAULT_IMAGE_PREP,
+    "gray": dict(DEFAULT_IMAGE_PREP, gray=True),
+    "binarize": dict(DEFAULT_IMAGE_PREP, binarize=True),
+}
+
+def make_fixtures(n, seed=0):
+    # (name, image, truth or None): text images at scan size, the same text on
+    # camera-sized canvases, and images without text (blank pages, paper noise,
+    # smooth photos)
+    rng = random.Random(seed)
+    nrng = np.random.default_rng(seed)
+    fixtures = []
+    images, truths = make_text_images(n, seed=seed)
+    for i, (img, truth) in enumerate(zip(images, truths)):
+        fixtures.append((f"text-{i}", img, truth))
+    for i, (img, truth) in enumerate(zip(images, truths)):
+        # Photo of a page: text scaled up on a 24 MP canvas
+        big = Image.new("RGB", (6000, 4000), "white")
+        big.paste(img.resize((img.width * 5, img.height * 5), Image.LANCZOS), (200, 600))
+        fixtures.append((f"camera-{i}", big, truth))
+    for i in range(n):
+        shade = rng.randint(200, 255)
+        fixtures.append((f"blank-{i}", Image.new("RGB", (2480, 3508), (shade, shade, shade)), None))
+        noise = np.clip(235 + nrng.normal(0, 3, (1754, 1240)), 0, 255).astype(np.uint8)
+        fixtures.append((f"paper-{i}", Image.fromarray(noise).convert("RGB"), None))
+        photo = Image.fromarray(nrng.integers(0, 255, (600, 800, 3), dtype=np.uint8))
+        fixtures.append((f"photo-{i}", photo.resize((4000, 3000)).filter(ImageFilter.GaussianBlur(20)), None))
+    return fixtures
+
+def similarity(text, truth):
+    return difflib.SequenceMatcher(None, " ".join(text.split()), " ".join(truth.split())).ratio()
+
+def run_mode(backend, fixtures, prep):
+    texts = {}
+    skipped = []
+    t0 = time.perf_counter()
+    for name, img, _ in fixtures:
+        prepared, reason = prepare_image(img, **prep)
+        if reason is not None:
+            texts[name] = ""
+            skipped.append(name)
+        else:
+            texts[name] = backend.image_to_string(prepared)
+    return time.perf_counter() - t0, texts, skipped
+
+def main(n, lang, backend_name, modes):
+    fixtures = make_fixtures(n)
+    n_text = sum(1 for *_, truth in fixtures if truth is not None)
+    backend = get_backend(backend_name, lang)
+    print(f"🖼️ {len(fixtures)} fixtures ({n_text} with text), backend={backend.name}, lang={lang}")
+    print(f"{'mode':>10} {'seconds':>9} {'images/s':>9} {'accuracy':>9} {'skipped':>8} {'lost':>5}")
+    for mode in modes:
+        elapsed, texts, skipped = run_mode(backend, fixtures, MODES[mode])
+        accuracy = sum(similarity(texts[name], truth) for name, _, truth in fixtures if truth is not None) / n_text
+        # Text images wrongly triaged as empty
+        lost = sum(1 for name, _, truth in fixtures if truth is not None and name in skipped)
+        print(f"{mode:>10} {elapsed:>9.2f} {len(fixtures) / elapsed:>9.1f} {accuracy:>9.3f} {len(skipped):>8} {lost:>5}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image preparation before OCR (time and accuracy on a fixture set)")
+    parser.add_argument('-n', type=int, default=5, help="Fixtures of each kind (default: 5)")
+    parser.add_argument('--lang', default="eng", help="Tesseract language code (default: eng)")
+    parser.add_argument('--backend', default="auto", choices=["auto"] + list(OCR_BACKENDS), help="OCR backend (default: auto)")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES), help="Preparation modes to compare (default: all)")
+    args = parser.parse_args()
+    main(args.n, args.lang, args.backend, args.modes)
@@ -0,0 +1,70 @@
+import os
+import sys
+import argparse
+import subprocess
+
+MEDIA_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../media-index")
+
+# Must not be loaded just by importing the indexer: each is pulled in by the
+# extractor or OCR code that needs it
+HEAVY_MODULES = ("cv2", "numpy", "pandas", "pdf2image", "docx", "ebooklib", "bs4", "striprtf", "PIL", "pytesseract")
+
+# Prints the imported heavy modules and the peak RSS (KiB) after the import
+PROBE = (
+    "import sys, resource, {module}; "
+    "print(','.join(m for m in {heavy!r} if m in sys.modules)); "
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+)
+
+def import_time(module):
+    # python -X importtime prints "import time: self | cumulative | name" when each
+    # import finishes, nested imports indented and listed before their parent. Keeps
+    # the modules imported by `module` itself, not interpreter startup (site, ...).
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=MEDIA_INDEX, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        top_level = not name[1:].startswith(" ")
+        name = name.strip()
+        if top_level and name != module:
+            # Some other top-level import finished, along with everything nested in it
+            timings = {}
+            continue
+        timings[name] = (int(self_us), int(cumulative_us))
+        if name == module:
+            break
+    heavy, rss_kb = out.stdout.splitlines()
+    return timings, [m for m in heavy.split(",") if m], int(rss_kb)
+
+def main(modules, runs, top, budget_ms):
+    failed = False
+    for module in modules:
+        totals = []
+        for _ in range(runs):
+            timings, heavy, rss_kb = import_time(module)
+            totals.append(timings[module][1] / 1000)
+        best = min(totals)
+        print(f"📦 import {module}: {best:.1f} ms (best of {runs}), peak RSS {rss_kb / 1024:.0f} MB")
+        for name, (_, cumulative_us) in sorted(timings.items(), key=lambda kv: -kv[1][1])[1:top + 1]:
+            print(f"   {cumulative_us / 1000:>8.1f} ms  {name}")
+        if heavy:
+            print(f"❌ {module} imports heavy modules at startup: {', '.join(heavy)}")
+            failed = True
+        if budget_ms and best > budget_ms:
+            print(f"❌ {module} import takes {best:.1f} ms, budget {budget_ms} ms")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure indexer startup (python -X importtime) and check that heavy dependencies load lazily")
+    parser.add_argument('--modules', nargs='+', default=["media_ocr_index"], help="Modules to import (default: media_ocr_index)")
+    parser.add_argument('--runs', type=int, default=3, help="Imports per module, the fastest counts (default: 3)")
+    parser.add_argument('--top', type=int, default=10, help="Slowest imported modules to list (default: 10)")
+    parser.add_argument('--budget-ms', type=float, default=0, help="Fail if the import takes longer than this (default: no limit)")
+    args = parser.parse_args()
+    sys.exit(main(args.modules, args.runs, args.top, args.budget_ms))
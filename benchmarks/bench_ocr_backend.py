@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import random
+import argparse
+import difflib
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../media-index"))
+from ocr_backend import OCR_BACKENDS, get_backend
+
+WORDS = "index media video frame search archive page text document image recording lecture slide".split()
+
+def make_text_images(n, size=(800, 200), seed=0):
+    # Small images with a couple of lines of text: the case where process startup dominates
+    rng = random.Random(seed)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 28)
+    except OSError:
+        font = ImageFont.load_default()
+    images, truths = [], []
+    for _ in range(n):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(6)) for _ in range(2)]
+        img = Image.new("RGB", size, "white")
+        draw = ImageDraw.Draw(img)
+        for i, line in enumerate(lines):
+            draw.text((20, 30 + i * 60), line, fill="black", font=font)
+        images.append(img)
+        truths.append("\n".join(lines))
+    return images, truths
+
+def run_backend(name, images, lang, batch):
+    backend = get_backend(name, lang)
+    # Warm-up, so in-process engines are measured after the model is loaded
+    backend.images_to_strings(images[:1])
+    texts = []
+    t0 = time.perf_counter()
+    for i in range(0, len(images), batch):
+        texts.extend(backend.images_to_strings(images[i:i + batch]))
+    elapsed = time.perf_counter() - t0
+    return elapsed, texts
+
+def main(n, lang, batch, backends):
+    images, truths = make_text_images(n)
+    print(f"🖼️ {n} synthetic text images, lang={lang}, batch={batch}")
+    print(f"{'backend':>12} {'seconds':>9} {'images/s':>9} {'accuracy':>9}")
+    for name in backends:
+        try:
+            elapsed, texts = run_backend(name, images, lang, batch)
+        except Exception as e:
+            print(f"{name:>12}   skipped: {e}")
+            continue
+        accuracy = sum(
+            difflib.SequenceMatcher(None, " ".join(t.split()), " ".join(truth.split())).ratio()
+            for t, truth in zip(texts, truths)
+        ) / len(truths)
+        print(f"{name:>12} {elapsed:>9.2f} {n / elapsed:>9.1f} {accuracy:>9.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark OCR backends (images per second)")
+    parser.add_argument('-n', type=int, default=100, help="Number of images (default: 100)")
+    parser.add_argument('--lang', default="eng", help="Tesseract language code (default: eng)")
+    parser.add_argument('--batch', type=int, default=16, help="Images per images_to_strings call (default: 16)")
+    parser.add_argument('--backends', nargs='+', default=list(OCR_BACKENDS), help="Backends to compare (default: all)")
+    args = parser.parse_args()
+    main(args.n, args.lang, args.batch, args.backends)
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "../media-index"))
+sys.path.insert(0, os.path.join(HERE, "../streamlit-app"))
+from make_corpus import KINDS, make_corpus
+from media_ocr_index import scan_files, process_file, process_video, DEFAULT_PDF_DPI, DEFAULT_OCR_BATCH, DEFAULT_DEDUP_THRESHOLD
+from ocr_backend import OCR_BACKENDS
+from index_store import IndexWriter, compact_index
+from index_db import IndexDB
+from metrics import Metrics
+from search_index import SearchIndex
+
+# End-to-end benchmark on the synthetic corpus (make_corpus.py): throughput and
+# per-file latency per file type, time of each pipeline stage (scan, extraction,
+# index writes, search index build) and search latency, written as JSON so runs can
+# be compared with --compare. Each file type is extracted in a fresh process, so its
+# peak RSS is its own.
+
+def percentile(values, p):
+    # Nearest-rank percentile
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+def latency_stats(seconds):
+    ms = [s * 1000 for s in seconds]
+    return {
+        "n": len(ms),
+        "total_s": round(sum(seconds), 4),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "max_ms": round(max(ms), 3) if ms else 0.0,
+    }
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS
+    return round(rss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - t0, result
+
+def extract_type(corpus_dir, filetype, rel_paths, lang, backend, interval):
+    # Runs in its own process: extracts every file of one type the way the indexer does
+    latencies, records, errors, n_bytes = [], [], 0, 0
+    metrics = Metrics()
+    for rel_path in rel_paths:
+        n_bytes += os.path.getsize(os.path.join(corpus_dir, rel_path))
+        t0 = time.perf_counter()
+        if filetype == "video":
+            results, msg_list, _, snapshot = process_video(rel_path, corpus_dir, lang, interval, set(), None,
+                                                           DEFAULT_DEDUP_THRESHOLD, backend, DEFAULT_OCR_BATCH)
+        else:
+            results, msg_list, snapshot = process_file(filetype, rel_path, corpus_dir, lang, DEFAULT_PDF_DPI, backend,
+                                                       DEFAULT_OCR_BATCH)
+        latencies.append(time.perf_counter() - t0)
+        metrics.merge(snapshot)
+        errors += sum(1 for m in msg_list if m.startswith("[ERR]"))
+        records.extend(results)
+    total = sum(latencies)
+    stats = {
+        "files": len(rel_paths),
+        "mb": round(n_bytes / (1 << 20), 3),
+        "records": len(records),
+        "errors": errors,
+        "files_per_s": round(len(rel_paths) / total, 3) if total else 0.0,
+        "mb_per_s": round(n_bytes / (1 << 20) / total, 3) if total else 0.0,
+        "latency": latency_stats(latencies),
+        # Seconds and calls per extraction stage (decode, prep, ocr, render, ...)
+        "stages": {k: [round(sec, 4), n] for k, (sec, n) in metrics.stages.items()},
+        "counters": metrics.counters,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    return stats, records
+
+def bench_extraction(corpus_dir, by_type, lang, backend, interval):
+    ctx = multiprocessing.get_context("spawn")
+    types, records = {}, []
+    for filetype, rel_paths in sorted(by_type.items()):
+        with ProcessPoolExecutor(1, mp_context=ctx) as pool:
+            stats, type_records = pool.submit(extract_type, corpus_dir, filetype, rel_paths, lang, backend, interval).result()
+        types[filetype] = stats
+        records.extend(type_records)
+    return types, records
+
+def bench_search(records, corpus, queries, seed, work_dir):
+    # Query latency of the in-memory BM25 index (Streamlit app) and of SQLite FTS5
+    rng = random.Random(seed)
+    words = sorted({w for f in corpus["files"].values() for w in f["words"]})
+    query_list = []
+    for i in range(queries):
+        n_words = 1 + i % 3
+        query = " ".join(rng.choice(words) for _ in range(n_words))
+        query_list.append(f'"{query}"' if i % 5 == 4 else query)
+    stages = {}
+    stages["search_build_s"], index = timed(SearchIndex.build, records)
+    db_path = os.path.join(work_dir, "bench.sqlite")
+    t0 = time.perf_counter()
+    with IndexDB(db_path) as db:
+        for record in records:
+            db.write(record)
+        db.sync()
+    stages["write_sqlite_s"] = time.perf_counter() - t0
+    memory, sqlite, hits = [], [], 0
+    with IndexDB(db_path, readonly=True) as db:
+        for query in query_list:
+            elapsed, (total, _) = timed(index.ranked, query, 10, 0)
+            memory.append(elapsed)
+            hits += total > 0
+            elapsed, _ = timed(db.ranked, query, 10, 0)
+            sqlite.append(elapsed)
+    search = {
+        "queries": len(query_list),
+        "queries_with_hits": hits,
+        "memory": latency_stats(memory),
+        "sqlite": latency_stats(sqlite),
+    }
+    return stages, search
+
+def run_suite(corpus_dir, seed, scale, kinds, lang, backend, interval, queries):
+    corpus = make_corpus(corpus_dir, seed=seed, scale=scale, kinds=kinds)
+    stages = {}
+    stages["scan_s"], scanned = timed(lambda: list(scan_files(corpus_dir)))
+    by_type = {}
+    for filetype, rel_path, _ in scanned:
+        by_type.setdefault(filetype, []).append(rel_path)
+    t0 = time.perf_counter()
+    types, records = bench_extraction(corpus_dir, by_type, lang, backend, interval)
+    stages["extract_s"] = time.perf_counter() - t0
+    with tempfile.TemporaryDirectory() as work_dir:
+        index_file = os.path.join(work_dir, "index.json")
+        t0 = time.perf_counter()
+        with IndexWriter(index_file) as writer:
+            for record in records:
+                writer.write(record)
+        stages["write_segments_s"] = time.perf_counter() - t0
+        stages["compact_s"], _ = timed(compact_index, index_file)
+        search_stages, search = bench_search(records, corpus, queries, seed, work_dir)
+    stages.update(search_stages)
+    return {
+        "meta": run_meta(),
+        "params": {"corpus": corpus["params"], "lang": lang, "backend": backend, "interval": interval},
+        "types": types,
+        "stages": {k: round(v, 4) for k, v in stages.items()},
+        "search": search,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def run_meta():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def print_report(result):
+    print(f"{'type':>6} {'files':>6} {'MB':>8} {'files/s':>9} {'MB/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'RSS MB':>7} {'errors':>6}")
+    for filetype, t in result["types"].items():
+        print(f"{filetype:>6} {t['files']:>6} {t['mb']:>8.2f} {t['files_per_s']:>9.2f} {t['mb_per_s']:>8.2f} "
+              f"{t['latency']['p50_ms']:>9.1f} {t['latency']['p95_ms']:>9.1f} {t['peak_rss_mb'] or 0:>7.0f} {t['errors']:>6}  "
+              + " ".join(f"{k} {sec:.2f}s" for k, (sec, _) in sorted(t["stages"].items(), key=lambda kv: -kv[1][0])))
+    print("⏱️ Stages: " + ", ".join(f"{k[:-2]} {v:.3f}s" for k, v in result["stages"].items()))
+    s = result["search"]
+    print(f"🔎 {s['queries']} queries ({s['queries_with_hits']} with hits): "
+          f"memory p50 {s['memory']['p50_ms']:.2f} ms / p99 {s['memory']['p99_ms']:.2f} ms, "
+          f"sqlite p50 {s['sqlite']['p50_ms']:.2f} ms / p99 {s['sqlite']['p99_ms']:.2f} ms")
+
+def compare(result, baseline):
+    # Ratio new/old for throughput (higher is better) and latencies (lower is better)
+    print(f"📊 Compared with {baseline['meta'].get('commit')} ({baseline['meta']['timestamp']}):")
+    for filetype, t in result["types"].items():
+        old = baseline["types"].get(filetype)
+        if old and old["files_per_s"]:
+            print(f"   {filetype:>6} files/s x{t['files_per_s'] / old['files_per_s']:.2f}")
+    for stage, seconds in result["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old:
+            print(f"   {stage:>18} time x{seconds / old:.2f}")
+    for engine in ("memory", "sqlite"):
+        old = baseline["search"][engine]["p50_ms"]
+        if old:
+            print(f"   search {engine:>6} p50 x{result['search'][engine]['p50_ms'] / old:.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark extraction, indexing and search on a synthetic corpus")
+    parser.add_argument('--corpus', default=os.path.join(tempfile.gettempdir(), "media-index-bench-corpus"), help="Corpus folder, generated if missing or made with other parameters")
+    parser.add_argument('--seed', type=int, default=0, help="Corpus seed (default: 0)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Corpus size multiplier (default: 1)")
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=list(KINDS), help="Kinds of files in the corpus (default: all)")
+    parser.add_argument('--lang', default="eng", help="Tesseract language code (default: eng)")
+    parser.add_argument('--backend', default="auto", choices=["auto"] + list(OCR_BACKENDS), help="OCR backend (default: auto)")
+    parser.add_argument('--interval', type=int, default=5, help="Seconds between video frames (default: 5)")
+    parser.add_argument('--queries', type=int, default=200, help="Search queries to time (default: 200)")
+    parser.add_argument('-o', '--output', help="Write the results to this JSON file (default: bench-<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier results JSON to compare with")
+    args = parser.parse_args()
+    result = run_suite(args.corpus, args.seed, args.scale, args.kinds, args.lang, args.backend, args.interval, args.queries)
+    print_report(result)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(result, json.load(f))
+    output = args.output or f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"✅ Results saved to: {output}")
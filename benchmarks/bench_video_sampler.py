@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../media-index"))
+from media_ocr_index import sample_video_frames, probe_gop, DEFAULT_GOP
+
+def make_synthetic_video(path, seconds=120, fps=25, size=(640, 360), fourcc="mp4v"):
+    # Moving gradient + a frame counter, so every frame differs and decoding is not trivial
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write video with fourcc {fourcc}")
+    xs = np.linspace(0, 255, w, dtype=np.float32)
+    for i in range(seconds * fps):
+        row = ((xs + i * 3) % 256).astype(np.uint8)
+        frame = np.dstack([np.tile(row, (h, 1))] * 3)
+        cv2.putText(frame, f"t={i / fps:.2f}s frame {i}", (20, h // 2), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+
+def run_strategy(path, interval, gop):
+    vidcap = cv2.VideoCapture(path)
+    fps = vidcap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration = frame_count / fps if fps > 0 else 0
+    sec_points = list(range(0, int(duration) + 1, interval))
+    t0 = time.perf_counter()
+    if gop is None:
+        gop = probe_gop(vidcap) or DEFAULT_GOP
+    frames = [(sec, frame) for sec, frame in sample_video_frames(vidcap, sec_points, fps, gop=gop)]
+    elapsed = time.perf_counter() - t0
+    vidcap.release()
+    return elapsed, frames
+
+def frames_differ(a, b):
+    if a is None or b is None:
+        return (a is None) != (b is None)
+    return not np.array_equal(a, b)
+
+def main(seconds, fps, intervals, fourcc, repeat, gop, video=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        if video:
+            path = video
+            print(f"🎞️ Using {path}")
+        else:
+            ext = ".avi" if fourcc in ("MJPG", "XVID") else ".mp4"
+            path = os.path.join(tmp, "synthetic" + ext)
+            print(f"🎞️ Generating {seconds}s @ {fps}fps synthetic video ({fourcc})...")
+            make_synthetic_video(path, seconds=seconds, fps=fps, fourcc=fourcc)
+
+        vidcap = cv2.VideoCapture(path)
+        print(f"Probed GOP: {probe_gop(vidcap)} frames")
+        vidcap.release()
+        print(f"{'interval':>9} {'seek (s)':>10} {'sequential (s)':>15} {'auto (s)':>10} {'seq speedup':>12} {'mismatch':>9}")
+        for interval in intervals:
+            # gop=0 seeks before every sample (the old behaviour); a huge gop never seeks
+            times = {"seek": [], "sequential": [], "auto": []}
+            for _ in range(repeat):
+                t, seek_frames = run_strategy(path, interval, gop=0)
+                times["seek"].append(t)
+                t, seq_frames = run_strategy(path, interval, gop=10**9)
+                times["sequential"].append(t)
+                t, _ = run_strategy(path, interval, gop=gop)
+                times["auto"].append(t)
+            mismatch = sum(1 for (_, a), (_, b) in zip(seek_frames, seq_frames) if frames_differ(a, b))
+            t_seek, t_seq, t_auto = (min(times[k]) for k in ("seek", "sequential", "auto"))
+            print(f"{interval:>9} {t_seek:>10.3f} {t_seq:>15.3f} {t_auto:>10.3f} {t_seek / t_seq:>11.2f}x {mismatch:>9}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark seek-per-sample vs sequential video frame sampling")
+    parser.add_argument('--seconds', type=int, default=120, help="Length of the synthetic video (default: 120)")
+    parser.add_argument('--fps', type=int, default=25, help="Frames per second (default: 25)")
+    parser.add_argument('--intervals', type=int, nargs='+', default=[1, 5, 30], help="Sampling intervals in seconds (default: 1 5 30)")
+    parser.add_argument('--fourcc', default="mp4v", help="Codec for the synthetic video (default: mp4v)")
+    parser.add_argument('--gop', type=int, default=None, help="GOP passed to the auto strategy (default: probed)")
+    parser.add_argument('--video', help="Benchmark an existing video instead of a synthetic one (e.g. a long H.264 recording)")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per strategy, best time is reported (default: 3)")
+    args = parser.parse_args()
+    main(args.seconds, args.fps, args.intervals, args.fourcc, args.repeat, args.gop, video=args.video)
@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit, urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+from make_corpus import WORDS, sentence
+from bench_suite import latency_stats
+
+# Load test of streamlit-app/search_server.py over local HTTP: concurrent clients
+# (one keep-alive connection each) send queries drawn from a fixed set, so repeated
+# queries hit the server's result cache the way a team of analysts would. Reports
+# latency percentiles and throughput per concurrency level. Starts its own server
+# on a synthetic index.json unless --url points to a running one.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVER = os.path.join(HERE, "../streamlit-app/search_server.py")
+
+def make_index(path, n_entries, seed=0):
+    # index.json of n_entries text records (images, video frames, PDF pages)
+    rng = random.Random(seed)
+    entries = []
+    for i in range(n_entries):
+        kind = ("image", "video", "pdf")[i % 3]
+        item = {"type": kind, "filename": f"{kind}/file-{i // 10:05d}", "text": " ".join(sentence(rng, 12) for _ in range(rng.randint(1, 8)))}
+        if kind == "video":
+            item["second"] = (i % 10) * 5
+            item["frame_id"] = f"{item['filename']}|{item['second']}"
+        elif kind == "pdf":
+            item["page"] = i % 10 + 1
+            item["page_id"] = f"{item['filename']}|p{item['page']}"
+        entries.append(item)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+
+def make_queries(n, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for i in range(n):
+        query = " ".join(rng.choice(WORDS) for _ in range(1 + i % 3))
+        queries.append(f'"{query}"' if i % 5 == 4 else query)
+    return queries
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(index_path, db_path, cache_size):
+    port = free_port()
+    cmd = [sys.executable, SERVER, "--port", str(port), "--cache-size", str(cache_size)]
+    cmd += ["--db", db_path] if db_path else ["--index", index_path]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(600):
+        if proc.poll() is not None:
+            raise RuntimeError(f"search server exited with code {proc.returncode}")
+        try:
+            get_json(http.client.HTTPConnection("127.0.0.1", port, timeout=5), "/status")
+            return proc, url
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("search server did not start")
+
+def get_json(conn, path):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"{path}: HTTP {response.status} {body[:200]!r}")
+    return json.loads(body)
+
+def run_level(url, queries, n_requests, concurrency, limit, seed):
+    # n_requests queries from `concurrency` threads -> (stats, share of cached responses)
+    host = urlsplit(url)
+    rng = random.Random(seed)
+    plan = [rng.choice(queries) for _ in range(n_requests)]
+    local = threading.local()
+
+    def one(query):
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection(host.hostname, host.port, timeout=60)
+        t0 = time.perf_counter()
+        response = get_json(local.conn, "/search?" + urlencode({"q": query, "limit": limit}))
+        return time.perf_counter() - t0, response["cached"]
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(one, plan))
+    wall = time.perf_counter() - t0
+    stats = latency_stats([r[0] for r in results])
+    stats["requests_per_s"] = round(len(results) / wall, 1)
+    stats["cached"] = round(sum(r[1] for r in results) / len(results), 3)
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the search server (local HTTP)")
+    parser.add_argument('--url', help="Running search server (default: start one on --index/--db or a synthetic index)")
+    parser.add_argument('--index', help="index.json to serve")
+    parser.add_argument('--db', help="SQLite/FTS5 database to serve")
+    parser.add_argument('--entries', type=int, default=20000, help="Entries of the synthetic index (default: 20000)")
+    parser.add_argument('--cache-size', type=int, default=1024, help="Result cache size of the started server; 0 disables (default: 1024)")
+    parser.add_argument('--queries', type=int, default=200, help="Distinct queries (default: 200)")
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per concurrency level (default: 2000)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64], help="Concurrent clients (default: 1 4 16 64)")
+    parser.add_argument('--limit', type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument('-o', '--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    proc, tmp_dir = None, None
+    url = args.url
+    if not url:
+        index_path = args.index
+        if not index_path and not args.db:
+            tmp_dir = tempfile.TemporaryDirectory()
+            index_path = os.path.join(tmp_dir.name, "index.json")
+            make_index(index_path, args.entries, args.seed)
+        proc, url = start_server(index_path, args.db, args.cache_size)
+    try:
+        status = get_json(http.client.HTTPConnection(urlsplit(url).hostname, urlsplit(url).port), "/status")
+        print(f"🔎 {url}: {status['entries']} entries ({status['backend']}), {args.queries} distinct queries")
+        queries = make_queries(args.queries, args.seed)
+        results = {}
+        print(f"{'clients':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'cached':>7}")
+        for concurrency in args.concurrency:
+            stats = run_level(url, queries, args.requests, concurrency, args.limit, args.seed + concurrency)
+            results[concurrency] = stats
+            print(f"{concurrency:>7} {stats['requests_per_s']:>8.1f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                  f"{stats['p99_ms']:>8.2f} {stats['max_ms']:>8.2f} {stats['cached']:>7.0%}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "status": status, "levels": results}, f, indent=2)
+        print(f"✅ Results saved to: {args.output}")
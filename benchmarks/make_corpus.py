@@ -0,0 +1,205 @@
+import os
+import json
+import random
+import argparse
+
+# Synthetic, reproducible corpus for the benchmarks: text rendered into PNGs, videos
+# with text overlays (written by cv2), multi-page PDFs with a text layer and scanned
+# (image-only) PDFs, DOCX/XLSX/EPUB, plain text. Everything is generated locally from
+# a seed; corpus.json records the parameters and the words put into every file, so
+# the benchmarks can pick search queries that are known to hit.
+
+WORDS = ("index media video frame search archive page text document image recording lecture slide "
+         "report budget meeting protein sample clinical trial dosage patient analysis summary").split()
+
+# Files of each kind at scale 1
+DEFAULT_COUNTS = {"png": 20, "video": 2, "pdf": 5, "scan_pdf": 3, "docx": 10, "xlsx": 5, "epub": 3, "txt": 20}
+VIDEO_SECONDS = 60
+PDF_PAGES = 4
+CORPUS_FILE = "corpus.json"
+
+def sentence(rng, n=8):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+def load_font(size):
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+def render_page(lines, size=(1240, 1754), font_size=32):
+    # White page with black text, about A4 at 150 DPI
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    font = load_font(font_size)
+    for i, line in enumerate(lines):
+        draw.text((80, 100 + i * int(font_size * 1.6)), line, fill="black", font=font)
+    return img
+
+def make_png(path, rng):
+    lines = [sentence(rng) for _ in range(rng.randint(2, 6))]
+    render_page(lines, size=(1200, 200 + 60 * len(lines))).save(path)
+    return lines
+
+def make_video(path, rng, seconds=VIDEO_SECONDS, fps=10, size=(640, 360)):
+    # A slide per 10 s, so unchanged frames exercise the frame dedup
+    import cv2
+    import numpy as np
+    w, h = size
+    slides = [sentence(rng, 4) for _ in range(-(-seconds // 10))]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    for i in range(seconds * fps):
+        frame = np.full((h, w, 3), 255, np.uint8)
+        cv2.putText(frame, slides[i // (fps * 10)], (20, h // 2), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 2)
+        writer.write(frame)
+    writer.release()
+    return slides
+
+def pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_text_pdf(path, pages):
+    # Minimal PDF with a Helvetica text layer, one list of lines per page
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 12 Tf 72 760 Td 16 TL " + " ".join(f"({pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+def make_pdf(path, rng, n_pages=PDF_PAGES):
+    pages = [[sentence(rng) for _ in range(20)] for _ in range(n_pages)]
+    write_text_pdf(path, pages)
+    return [line for page in pages for line in page]
+
+def make_scan_pdf(path, rng, n_pages=2):
+    # Image-only pages: every page goes through OCR
+    pages = [[sentence(rng) for _ in range(12)] for _ in range(n_pages)]
+    images = [render_page(lines) for lines in pages]
+    images[0].save(path, save_all=True, append_images=images[1:], resolution=150)
+    return [line for page in pages for line in page]
+
+def make_docx(path, rng):
+    from docx import Document
+    doc = Document()
+    lines = [sentence(rng, 12) for _ in range(rng.randint(10, 40))]
+    for line in lines:
+        doc.add_paragraph(line)
+    doc.save(path)
+    return lines
+
+def make_xlsx(path, rng):
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    lines = []
+    for _ in range(rng.randint(20, 100)):
+        row = [rng.choice(WORDS), rng.choice(WORDS), rng.randint(0, 10000), round(rng.random() * 100, 2)]
+        ws.append(row)
+        lines.append(" ".join(str(v) for v in row[:2]))
+    wb.save(path)
+    return lines
+
+def make_epub(path, rng, n_chapters=5):
+    from ebooklib import epub
+    book = epub.EpubBook()
+    book.set_identifier(f"bench-{rng.randint(0, 1 << 30)}")
+    book.set_title(sentence(rng, 3))
+    book.set_language("en")
+    chapters, lines = [], []
+    for i in range(n_chapters):
+        paragraphs = [sentence(rng, 15) for _ in range(10)]
+        lines.extend(paragraphs)
+        chapter = epub.EpubHtml(title=f"Chapter {i + 1}", file_name=f"chap_{i + 1}.xhtml", lang="en")
+        chapter.content = "<html><body>" + "".join(f"<p>{p}</p>" for p in paragraphs) + "</body></html>"
+        book.add_item(chapter)
+        chapters.append(chapter)
+    book.toc = chapters
+    book.spine = chapters
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    epub.write_epub(path, book)
+    return lines
+
+def make_txt(path, rng):
+    lines = [sentence(rng, 12) for _ in range(rng.randint(10, 200))]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    return lines
+
+# kind -> (subfolder, extension, generator)
+KINDS = {
+    "png": ("images", ".png", make_png),
+    "video": ("videos", ".mp4", make_video),
+    "pdf": ("pdfs", ".pdf", make_pdf),
+    "scan_pdf": ("scans", ".pdf", make_scan_pdf),
+    "docx": ("docs", ".docx", make_docx),
+    "xlsx": ("sheets", ".xlsx", make_xlsx),
+    "epub": ("books", ".epub", make_epub),
+    "txt": ("notes", ".txt", make_txt),
+}
+
+def corpus_params(seed, scale, kinds):
+    return {"seed": seed, "scale": scale,
+            "counts": {k: max(1, round(DEFAULT_COUNTS[k] * scale)) for k in kinds}}
+
+def make_corpus(folder, seed=0, scale=1.0, kinds=None):
+    # Generates the corpus into folder unless it already holds one with the same
+    # parameters; returns the corpus description ({"params", "files"})
+    kinds = kinds or list(KINDS)
+    params = corpus_params(seed, scale, kinds)
+    corpus_file = os.path.join(folder, CORPUS_FILE)
+    if os.path.exists(corpus_file):
+        with open(corpus_file, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+        if corpus["params"] == params:
+            return corpus
+        # Made with other parameters: start over
+        for rel_path in corpus["files"]:
+            try:
+                os.remove(os.path.join(folder, rel_path))
+            except FileNotFoundError:
+                pass
+    rng = random.Random(seed)
+    files = {}
+    for kind in kinds:
+        subfolder, ext, generator = KINDS[kind]
+        os.makedirs(os.path.join(folder, subfolder), exist_ok=True)
+        for i in range(params["counts"][kind]):
+            rel_path = os.path.join(subfolder, f"{kind}-{i:04d}{ext}")
+            try:
+                lines = generator(os.path.join(folder, rel_path), rng)
+            except ImportError as e:
+                print(f"⚠️ Skipping {kind}: {e}")
+                break
+            files[rel_path] = {"kind": kind, "words": sorted(set(" ".join(lines).split()))}
+    corpus = {"params": params, "files": files}
+    with open(corpus_file, "w", encoding="utf-8") as f:
+        json.dump(corpus, f, indent=2)
+    return corpus
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate the synthetic benchmark corpus")
+    parser.add_argument('-o', '--output', required=True, help="Folder to generate into")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiplier for the number of files of each kind (default: 1)")
+    parser.add_argument('--kinds', nargs='+', default=list(KINDS), choices=list(KINDS), help="Kinds of files (default: all)")
+    args = parser.parse_args()
+    corpus = make_corpus(args.output, seed=args.seed, scale=args.scale, kinds=args.kinds)
+    print(f"✅ Corpus in {args.output}: {len(corpus['files'])} files")
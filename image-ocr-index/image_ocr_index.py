@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import argparse
 from tqdm import tqdm
@@ -11,9 +12,20 @@ os.environ["PATH"] += os.pathsep + os.path.abspath("../app-ocr/poppler-24.08.0/L
 os.environ["PATH"] += os.pathsep + os.path.abspath("../app-ocr/gs10.05.1/bin")
 os.environ["GS"] = os.path.abspath("../app-ocr/gs10.05.1/bin/gswin64c.exe")
 
-def ocr_folder(input_folder, lang="eng"):
+def open_ocr_cache(cache_path, cache_mb):
+    # Cache OCR dùng chung với media-index/media_ocr_index.py và image-video-index.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "media-index"))
+    from ocr_cache import OcrCache, file_key
+    from image_prep import NO_IMAGE_PREP
+    cache = OcrCache(cache_path, cache_mb)
+    return cache, lambda path, lang: file_key(path, "image", lang, {"prep": NO_IMAGE_PREP})
+
+def ocr_folder(input_folder, lang="eng", cache_path=None, cache_mb=1024, no_cache=False):
     index_file = os.path.join(input_folder, "index.json")
     log_file = os.path.join(input_folder, "ocr_log.txt")
+    cache = None
+    if not no_cache:
+        cache, image_key = open_ocr_cache(cache_path, cache_mb)
 
     # Đọc index.json nếu có, để resume
     if os.path.exists(index_file):
@@ -38,13 +50,21 @@ def ocr_folder(input_folder, lang="eng"):
     for fname in tqdm(new_files, desc="OCR processing"):
         img_path = os.path.join(input_folder, fname)
         try:
-            img = Image.open(img_path)
-            text = pytesseract.image_to_string(img, lang=lang)
+            key = image_key(img_path, lang) if cache is not None else None
+            cached = cache.get(key) if key else None
+            if cached:
+                text = cached[0]["text"]
+                msg = f"[OK] {fname} (OCR cache)"
+            else:
+                img = Image.open(img_path)
+                text = pytesseract.image_to_string(img, lang=lang).strip()
+                if key:
+                    cache.put(key, [{"type": "image", "filename": fname, "text": text}], extractor="image")
+                msg = f"[OK] {fname}"
             results.append({
                 "filename": fname,
-                "text": text.strip()
+                "text": text
             })
-            msg = f"[OK] {fname}"
         except Exception as e:
             msg = f"[ERR] {fname}: {e}"
         print(msg)
@@ -56,11 +76,17 @@ def ocr_folder(input_folder, lang="eng"):
     with open(index_file, "w", encoding="utf-8") as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
     print(f"\n✅ Index saved to: {index_file} ({len(results)} files)")
+    if cache is not None:
+        print(f"🗃️ OCR cache: {cache.summary()}")
+        cache.close()
     print(f"📄 Log file: {log_file}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="OCR all images in folder and export index.json (auto save & resume)")
     parser.add_argument('-i', '--input', required=True, help="Input folder containing images")
     parser.add_argument('--lang', default="eng", help="Tesseract language code (default: eng)")
+    parser.add_argument('--ocr-cache', default=None, help="OCR result cache shared with the other indexers (default: $MEDIA_OCR_CACHE or ~/.cache/media-ocr-index/ocr_cache.sqlite)")
+    parser.add_argument('--ocr-cache-mb', type=float, default=1024, help="Size limit of the OCR cache in MB (default: 1024)")
+    parser.add_argument('--no-ocr-cache', action='store_true', help="Neither read nor fill the OCR cache")
     args = parser.parse_args()
-    ocr_folder(args.input, lang=args.lang)
+    ocr_folder(args.input, lang=args.lang, cache_path=args.ocr_cache, cache_mb=args.ocr_cache_mb, no_cache=args.no_ocr_cache)
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import argparse
 from tqdm import tqdm
@@ -16,6 +17,17 @@ os.environ["GS"] = os.path.abspath("../app-ocr/gs10.05.1/bin/gswin64c.exe")
 IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
 VIDEO_EXTS = ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.m4v', '.flv')
 
+# Keyframe interval (frames) dự phòng khi không dò được, mặc định keyint của x264
+DEFAULT_GOP = 250
+
+# Frame được coi là không đổi (dùng lại text OCR trước đó) khi không ô nào của ảnh
+# thu nhỏ lệch quá mức sáng trung bình này (0-255) so với frame OCR gần nhất; -1 để tắt.
+# Đủ thấp để một chữ/số thay đổi trên slide vẫn bị phát hiện, đủ cao cho nhiễu nén.
+DEFAULT_DEDUP_THRESHOLD = 4
+# Cạnh dài ảnh thu nhỏ (px) và kích thước ô khi so sánh
+DEDUP_SIDE = 480
+DEDUP_TILE = 8
+
 def find_files_recursive(folder, exts):
     file_list = []
     for root, dirs, files in os.walk(folder):
@@ -30,7 +42,64 @@ def ocr_image(img_path, lang="eng"):
     text = pytesseract.image_to_string(img, lang=lang)
     return text.strip()
 
-def ocr_video(video_path, input_folder, lang="eng", frame_interval=5, done_set=None):
+def probe_gop(vidcap, max_frames=2 * DEFAULT_GOP):
+    # Distance between the first two keyframes, or None if the backend cannot tell
+    if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+        return None
+    keyframes = []
+    for i in range(max_frames):
+        if not vidcap.grab():
+            break
+        if vidcap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keyframes.append(i)
+            if len(keyframes) == 2:
+                break
+    vidcap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    if len(keyframes) == 2:
+        return keyframes[1] - keyframes[0]
+    return max_frames if keyframes else None
+
+def sample_video_frames(vidcap, sec_points, fps, skip_secs=None, gop=DEFAULT_GOP):
+    # Walk the stream once: grab() advances without converting, and only the
+    # sampled frames are retrieved. Gaps much longer than a GOP (long interval,
+    # or a run of frames already done on resume) are cheaper to reach by seeking.
+    pos = 0
+    for sec in sec_points:
+        if skip_secs and sec in skip_secs:
+            continue
+        frame_idx = int(sec * fps)
+        if frame_idx < pos or frame_idx - pos > 2 * gop:
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            pos = frame_idx
+        success = True
+        while success and pos < frame_idx:
+            success = vidcap.grab()
+            pos += 1
+        frame = None
+        if success:
+            success, frame = vidcap.read()
+            pos += 1
+        yield sec, (frame if success else None)
+
+def frame_signature(frame, side=DEDUP_SIDE):
+    # Grayscale thumbnail of the frame, compared tile by tile in frame_diff (a global
+    # dHash barely moves when one line of slide text changes)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    scale = min(1.0, side / max(h, w))
+    return cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+def frame_diff(a, b, tile=DEDUP_TILE):
+    # Largest mean absolute difference of any tile x tile block (0-255)
+    if a.shape != b.shape:
+        return 255
+    diff = cv2.absdiff(a, b)
+    h, w = diff.shape
+    tiles = cv2.resize(diff, (max(1, w // tile), max(1, h // tile)), interpolation=cv2.INTER_AREA)
+    return int(tiles.max())
+
+def ocr_video(video_path, input_folder, lang="eng", frame_interval=5, done_set=None, gop=None,
+              dedup_threshold=DEFAULT_DEDUP_THRESHOLD, stats=None):
     results = []
     abs_video_path = os.path.join(input_folder, video_path)
     vidcap = cv2.VideoCapture(abs_video_path)
@@ -41,38 +110,107 @@ def ocr_video(video_path, input_folder, lang="eng", frame_interval=5, done_set=N
     duration = frame_count / fps if fps > 0 else 0
     sec_points = list(range(0, int(duration) + 1, frame_interval))
     msg_list = []
-    for sec in tqdm(sec_points, desc=f"OCR video {video_path}", leave=False):
-        frame_idx = int(sec * fps)
-        vidcap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        success, frame = vidcap.read()
-        if not success:
+    if gop is None:
+        gop = probe_gop(vidcap) or DEFAULT_GOP
+    done_secs = set()
+    if done_set is not None:
+        done_secs = {sec for sec in sec_points if f"{video_path}|{sec}" in done_set}
+    if stats is None:
+        stats = {}
+    for k in ("frames", "ocr_calls", "ocr_skipped", "ocr_errors"):
+        stats.setdefault(k, 0)
+    frames_before, skipped_before = stats["frames"], stats["ocr_skipped"]
+    last_ocr = None
+    frames = sample_video_frames(vidcap, sec_points, fps, skip_secs=done_secs, gop=gop)
+    for sec, frame in tqdm(frames, total=len(sec_points) - len(done_secs), desc=f"OCR video {video_path}", leave=False):
+        if frame is None:
             msg_list.append(f"[ERR] Frame {sec}s not found in {video_path}")
             continue
         frame_id = f"{video_path}|{sec}"
-        if done_set is not None and frame_id in done_set:
+        stats["frames"] += 1
+        # Compare with the last frame we actually OCR'd, so slow drift still triggers a new OCR
+        fhash = frame_signature(frame) if dedup_threshold >= 0 else None
+        if last_ocr is not None and fhash is not None and frame_diff(fhash, last_ocr[0]) <= dedup_threshold:
+            source = last_ocr[1]
+            source["until"] = sec
+            results.append({
+                "type": "video",
+                "video": video_path,
+                "second": sec,
+                "frame_id": frame_id,
+                "text": source["text"],
+                "same_as": source["second"]
+            })
+            stats["ocr_skipped"] += 1
+            msg_list.append(f"[OK] {video_path} at {sec}s (unchanged since {source['second']}s)")
             continue
         img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
         try:
             text = pytesseract.image_to_string(img, lang=lang).strip()
-            results.append({
+            stats["ocr_calls"] += 1
+            record = {
                 "type": "video",
                 "video": video_path,
                 "second": sec,
                 "frame_id": frame_id,
                 "text": text
-            })
+            }
+            results.append(record)
+            last_ocr = (fhash, record)
             msg_list.append(f"[OK] {video_path} at {sec}s")
         except Exception as e:
+            stats["ocr_errors"] += 1
             msg_list.append(f"[ERR] {video_path} at {sec}s: {e}")
     vidcap.release()
+    if stats["frames"] > frames_before:
+        msg_list.append(
+            f"[OK] {video_path}: {stats['frames'] - frames_before} frames, "
+            f"{stats['ocr_skipped'] - skipped_before} OCR calls skipped (unchanged frames)"
+        )
     return results, msg_list
 
-def main(input_folder, lang="eng", frame_interval=5):
+MEDIA_INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "media-index")
+
+def open_index_db(db_path):
+    # SQLite/FTS5 store shared with media-index/media_ocr_index.py
+    sys.path.insert(0, MEDIA_INDEX_DIR)
+    from index_db import IndexDB
+    return IndexDB(db_path)
+
+def open_ocr_cache(cache_path, cache_mb):
+    # OCR result cache shared with media-index/media_ocr_index.py. Images are OCR'd
+    # here without any preparation, the same key as media_ocr_index.py with
+    # --max-side 0 --target-dpi 0 --no-triage, so both reuse each other's results.
+    sys.path.insert(0, MEDIA_INDEX_DIR)
+    from ocr_cache import OcrCache, file_key
+    from image_prep import NO_IMAGE_PREP
+    cache = OcrCache(cache_path, cache_mb)
+    image_key = lambda path, lang: file_key(path, "image", lang, {"prep": NO_IMAGE_PREP})
+    video_key = lambda path, lang, params: file_key(path, "image-video-index:video", lang, params)
+    return cache, image_key, video_key
+
+def main(input_folder, lang="eng", frame_interval=5, gop=None,
+         dedup_threshold=DEFAULT_DEDUP_THRESHOLD, db_path=None, cache_path=None, cache_mb=1024, no_cache=False):
     index_file = os.path.join(input_folder, "index.json")
     log_file = os.path.join(input_folder, "ocr_log.txt")
+    db = open_index_db(db_path) if db_path else None
+    cache = None
+    if not no_cache:
+        cache, image_key, video_key = open_ocr_cache(cache_path, cache_mb)
 
     # Resume
-    if os.path.exists(index_file):
+    if db is not None:
+        # Ghi thẳng vào SQLite theo từng batch, không giữ kết quả trong RAM
+        done_images = set()
+        done_videos = set()
+        for item in db.iter_records(with_text=False):
+            if item.get("type") == "image":
+                done_images.add(item.get("filename"))
+            elif item.get("type") == "video":
+                done_videos.add(item.get("frame_id"))
+        results = None
+        print(f"🟩 Resume mode: {len(done_images)} images, {len(done_videos)} video frames done.")
+    elif os.path.exists(index_file):
         with open(index_file, "r", encoding="utf-8") as f:
             index_data = json.load(f)
         done_images = set(item["filename"] for item in index_data if item.get("type", "image") == "image")
@@ -83,6 +221,8 @@ def main(input_folder, lang="eng", frame_interval=5):
         done_images = set()
         done_videos = set()
         results = []
+    # Videos with at least one frame done (frame_id is "<video>|<second>")
+    started_videos = {fid.rsplit("|", 1)[0] for fid in done_videos if fid}
 
     log_mode = "a" if os.path.exists(log_file) else "w"
     log = open(log_file, log_mode, encoding="utf-8")
@@ -93,35 +233,81 @@ def main(input_folder, lang="eng", frame_interval=5):
     for rel_path in tqdm(new_images, desc="OCR Images"):
         img_path = os.path.join(input_folder, rel_path)
         try:
-            text = ocr_image(img_path, lang=lang)
-            results.append({
+            key = image_key(img_path, lang) if cache is not None else None
+            cached = cache.get(key) if key else None
+            text = cached[0]["text"] if cached else ocr_image(img_path, lang=lang)
+            record = {
                 "type": "image",
                 "filename": rel_path,
                 "text": text
-            })
-            msg = f"[OK] {rel_path}"
+            }
+            if db is not None:
+                db.write(record)
+            else:
+                results.append(record)
+            if cached:
+                msg = f"[OK] {rel_path} (OCR cache)"
+            else:
+                if key:
+                    cache.put(key, [record], extractor="image")
+                msg = f"[OK] {rel_path}"
         except Exception as e:
             msg = f"[ERR] {rel_path}: {e}"
         print(msg)
         log.write(msg + "\n")
 
     # 2. OCR all videos
+    video_stats = {"frames": 0, "ocr_calls": 0, "ocr_skipped": 0, "ocr_errors": 0}
     video_files = find_files_recursive(input_folder, VIDEO_EXTS)
     for rel_video in video_files:
-        video_results, msg_list = ocr_video(
-            rel_video, input_folder, lang=lang,
-            frame_interval=frame_interval, done_set=done_videos
-        )
-        results.extend(video_results)
+        # Whole videos are cached; one with frames already done resumes instead
+        key, cached = None, None
+        if cache is not None and rel_video not in started_videos:
+            key = video_key(os.path.join(input_folder, rel_video), lang,
+                            {"interval": frame_interval, "dedup_threshold": dedup_threshold, "dedup": "tile"})
+            cached = cache.get(key)
+        if cached:
+            video_results = [dict(item, video=rel_video, frame_id=f"{rel_video}|{item['second']}") for item in cached]
+            msg_list = [f"[OK] {rel_video} (OCR cache, {len(video_results)} frames)"]
+        else:
+            errors_before = video_stats["ocr_errors"]
+            video_results, msg_list = ocr_video(
+                rel_video, input_folder, lang=lang,
+                frame_interval=frame_interval, done_set=done_videos, gop=gop,
+                dedup_threshold=dedup_threshold, stats=video_stats
+            )
+            # Only complete videos are cached: frames whose OCR failed are retried next run
+            if key and video_results and video_stats["ocr_errors"] == errors_before:
+                cache.put(key, video_results, extractor="image-video-index:video")
+        if db is not None:
+            for record in video_results:
+                db.write(record)
+            db.sync()
+        else:
+            results.extend(video_results)
         for m in msg_list:
             print(m)
             log.write(m + "\n")
 
+    if video_stats["frames"]:
+        msg = (f"[OK] Video frames: {video_stats['frames']}, OCR calls: {video_stats['ocr_calls']}, "
+               f"skipped as unchanged: {video_stats['ocr_skipped']}")
+        print(msg)
+        log.write(msg + "\n")
+
     log.close()
 
-    with open(index_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    print(f"\n✅ Index saved to: {index_file} ({len(results)} entries)")
+    if db is not None:
+        db.sync()
+        print(f"\n✅ Index saved to: {db_path} ({len(db)} entries)")
+        db.close()
+    else:
+        with open(index_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Index saved to: {index_file} ({len(results)} entries)")
+    if cache is not None:
+        print(f"🗃️ OCR cache: {cache.summary()}")
+        cache.close()
     print(f"📄 Log file: {log_file}")
 
 if __name__ == "__main__":
@@ -131,5 +317,14 @@ if __name__ == "__main__":
     parser.add_argument('-i', '--input', required=True, help="Input folder containing images/videos")
     parser.add_argument('--lang', default="eng", help="Tesseract language code (default: eng)")
     parser.add_argument('--interval', type=int, default=5, help="Seconds between video frames (default: 5)")
+    parser.add_argument('--gop', type=int, default=None, help="Video keyframe interval in frames; samples more than 2x this apart are reached by seeking (default: probed per video)")
+    parser.add_argument('--dedup-threshold', type=int, default=DEFAULT_DEDUP_THRESHOLD,
+                        help=f"Max per-tile brightness difference (0-255) to a previous frame to reuse its OCR text; -1 disables (default: {DEFAULT_DEDUP_THRESHOLD})")
+    parser.add_argument('--db', help="Write to this SQLite/FTS5 database instead of <input>/index.json")
+    parser.add_argument('--ocr-cache', default=None, help="OCR result cache shared with the other indexers (default: $MEDIA_OCR_CACHE or ~/.cache/media-ocr-index/ocr_cache.sqlite)")
+    parser.add_argument('--ocr-cache-mb', type=float, default=1024, help="Size limit of the OCR cache in MB (default: 1024)")
+    parser.add_argument('--no-ocr-cache', action='store_true', help="Neither read nor fill the OCR cache")
     args = parser.parse_args()
-    main(args.input, lang=args.lang, frame_interval=args.interval)
+    main(args.input, lang=args.lang, frame_interval=args.interval, gop=args.gop,
+         dedup_threshold=args.dedup_threshold, db_path=args.db,
+         cache_path=args.ocr_cache, cache_mb=args.ocr_cache_mb, no_cache=args.no_ocr_cache)
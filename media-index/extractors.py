@@ -0,0 +1,119 @@
+import os
+import sys
+import importlib
+import importlib.util
+
+# Extractor registry: filetype -> (extensions, extractor). The extractor is either a
+# callable or a "module:function" string imported the first time a file of that
+# type is extracted. The document extractors below also import their libraries
+# (pandas, python-docx, ebooklib, ...) inside the function, so a run that only sees
+# .txt files never loads them, neither in the main process nor in the workers.
+
+EXTRACTORS = {}
+_resolved = {}
+_ext_to_type = {}
+
+def register_extractor(filetype, extensions, extractor):
+    # Later registrations of a filetype or extension replace earlier ones
+    EXTRACTORS[filetype] = (tuple(e.lower() for e in extensions), extractor)
+    _resolved.pop(filetype, None)
+    for ext in EXTRACTORS[filetype][0]:
+        _ext_to_type[ext] = filetype
+
+def get_extractor(filetype):
+    if filetype not in _resolved:
+        extractor = EXTRACTORS[filetype][1]
+        if isinstance(extractor, str):
+            module, _, name = extractor.partition(":")
+            extractor = getattr(importlib.import_module(module), name)
+        _resolved[filetype] = extractor
+    return _resolved[filetype]
+
+def get_filetype(filename):
+    return _ext_to_type.get(os.path.splitext(filename)[1].lower())
+
+def load_extractors(modules):
+    # Imports modules that call register_extractor when imported (--extractors), given
+    # as module names on sys.path or paths to .py files. Runs in the main process and
+    # again in every worker, which may not share the main process's registry.
+    for module in modules or ():
+        if module.endswith(".py"):
+            name = os.path.splitext(os.path.basename(module))[0]
+            if name in sys.modules:
+                continue
+            spec = importlib.util.spec_from_file_location(name, os.path.abspath(module))
+            mod = importlib.util.module_from_spec(spec)
+            # Registered in sys.modules first, so "name:function" extractors resolve
+            sys.modules[name] = mod
+            spec.loader.exec_module(mod)
+        else:
+            importlib.import_module(module)
+
+def extract_text_from_docx(docx_path):
+    from docx import Document
+    doc = Document(docx_path)
+    return "\n".join([p.text for p in doc.paragraphs]).strip()
+
+def extract_text_from_txt(txt_path):
+    with open(txt_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read().strip()
+
+def extract_text_from_rtf(rtf_path):
+    from striprtf.striprtf import rtf_to_text
+    with open(rtf_path, 'r', encoding='utf-8', errors='ignore') as f:
+        rtf_content = f.read()
+    text = rtf_to_text(rtf_content)
+    return text.strip()
+
+def extract_text_from_xlsx(xlsx_path):
+    import pandas as pd
+    dfs = pd.read_excel(xlsx_path, sheet_name=None)
+    text = ""
+    for sheet, df in dfs.items():
+        text += f"\n--- Sheet: {sheet} ---\n"
+        text += df.astype(str).to_csv(sep='\t', index=False)
+    return text.strip()
+
+def extract_text_from_xls(xls_path):
+    return extract_text_from_xlsx(xls_path)
+
+def extract_text_from_epub(epub_path):
+    try:
+        import ebooklib
+        from ebooklib import epub
+        from bs4 import BeautifulSoup
+        book = epub.read_epub(epub_path)
+        text = ""
+        for item in book.get_items():
+            if item.get_type() == ebooklib.ITEM_DOCUMENT:
+                soup = BeautifulSoup(item.get_content(), "html.parser")
+                text += soup.get_text(separator="\n")
+        return text.strip()
+    except MemoryError:
+        raise
+    except Exception as e:
+        return f"[ERR] EPUB: {e}"
+
+def extract_text_from_md(md_path):
+    return extract_text_from_txt(md_path)
+
+def extract_text_from_doc(doc_path):
+    # Option 1: Use antiword or textract (needs installing).
+    # Option 2: Skip .doc, or convert .doc to .docx/.pdf outside script for stable use.
+    return "[WARN] .doc not natively supported, please convert to .docx"
+
+def extract_text_from_azw(azw_path):
+    # Placeholder: Recommend convert to epub/txt via Calibre or use mobi-python.
+    return "[WARN] AZW/MOBI not natively supported, please convert to epub/txt"
+
+# Document types: extractor(path) -> text. Image, video and PDF OCR are registered
+# by media_ocr_index.py, which calls them with OCR options.
+register_extractor("docx", ('.docx',), extract_text_from_docx)
+register_extractor("doc", ('.doc',), extract_text_from_doc)
+register_extractor("xlsx", ('.xlsx',), extract_text_from_xlsx)
+register_extractor("xls", ('.xls',), extract_text_from_xls)
+register_extractor("rtf", ('.rtf',), extract_text_from_rtf)
+register_extractor("txt", ('.txt',), extract_text_from_txt)
+register_extractor("md", ('.md',), extract_text_from_md)
+register_extractor("epub", ('.epub',), extract_text_from_epub)
+register_extractor("azw", ('.azw', '.azw3', '.mobi'), extract_text_from_azw)
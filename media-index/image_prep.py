@@ -0,0 +1,107 @@
+# Image preparation before OCR: cap the resolution (camera photos are far larger than
+# Tesseract needs), skip images that almost certainly hold no text, and optionally
+# convert to grayscale / binarize. Triage works on a small grayscale thumbnail with
+# cheap NumPy statistics, so it costs a few milliseconds per image.
+
+# Longest side after downscaling; an A4 page at 300 DPI is 3508 px
+DEFAULT_MAX_SIDE = 3500
+# Images whose metadata says they were scanned above this are scaled down to it
+DEFAULT_TARGET_DPI = 300
+
+# Triage: the image is cut into blocks (about TRIAGE_SIDE per side) and a block
+# counts as an edge when its darkest and lightest pixels differ by EDGE_STEP or more,
+# which any printed or handwritten stroke does while JPEG noise, paper texture and
+# smooth photo gradients do not. Min/max per block keep thin strokes that a
+# downscaled thumbnail would average away. Only images with almost no edge blocks
+# are skipped; anything else is OCR'd.
+TRIAGE_SIDE = 1000
+EDGE_STEP = 32
+MIN_EDGE_BLOCKS = 4
+BLANK_STD = 3.0
+
+DEFAULT_IMAGE_PREP = {
+    "max_side": DEFAULT_MAX_SIDE,
+    "target_dpi": DEFAULT_TARGET_DPI,
+    "triage": True,
+    "gray": False,
+    "binarize": False,
+}
+
+# The image exactly as loaded, as the older indexers hand it to Tesseract
+NO_IMAGE_PREP = dict(DEFAULT_IMAGE_PREP, max_side=0, target_dpi=0, triage=False)
+
+def downscale(img, max_side=DEFAULT_MAX_SIDE, target_dpi=DEFAULT_TARGET_DPI, mode=None):
+    # Scaled down to max_side / target_dpi (never up), converted to `mode` if given.
+    # A JPEG that is not decoded yet is decoded straight at 1/2, 1/4 or 1/8 scale
+    # and in `mode` when that is enough.
+    from PIL import Image
+    scale = 1.0
+    dpi = img.info.get("dpi")
+    if target_dpi and dpi and dpi[0] and float(dpi[0]) > target_dpi:
+        scale = target_dpi / float(dpi[0])
+    if max_side and max(img.size) * scale > max_side:
+        scale = max_side / max(img.size)
+    scale = min(scale, 1.0)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if img.format == "JPEG":
+        img.draft(mode or img.mode, size)
+    if mode and img.mode != mode:
+        img = img.convert(mode)
+    if img.size == size:
+        return img
+    return img.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+def text_stats(img):
+    # (std of the gray levels, share of edge blocks, number of edge blocks)
+    import numpy as np
+    gray = np.asarray(img.convert("L"))
+    if gray.size == 0:
+        return 0.0, 0.0, 0
+    b = max(2, -(-max(gray.shape) // TRIAGE_SIDE))
+    h, w = gray.shape[0] // b * b, gray.shape[1] // b * b
+    # Std of a strided sample, enough to tell blank from smooth
+    std = float(gray[::b, ::b].std())
+    if h == 0 or w == 0:
+        return std, 0.0, 0
+    # b x b blocks as rows of b*b pixels (the last partial row/column is ignored)
+    blocks = gray[:h, :w].reshape(h // b, b, w // b, b).transpose(0, 2, 1, 3).reshape(h // b, w // b, b * b)
+    contrast = np.ptp(blocks, axis=2)
+    edge_blocks = int(np.count_nonzero(contrast >= EDGE_STEP))
+    return std, edge_blocks / contrast.size, edge_blocks
+
+def triage_reason(img):
+    # Reason to skip OCR ("blank", "no edges") or None
+    std, _, edge_blocks = text_stats(img)
+    if edge_blocks >= MIN_EDGE_BLOCKS:
+        return None
+    return "blank" if std < BLANK_STD else "no edges"
+
+def binarize_image(img):
+    # Otsu's threshold on the gray histogram
+    import numpy as np
+    gray = img.convert("L")
+    hist = np.bincount(np.asarray(gray).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * levels)
+    total, total_mean = weight[-1], mean[-1]
+    background = weight
+    foreground = total - weight
+    valid = (background > 0) & (foreground > 0)
+    between = np.zeros(256)
+    between[valid] = (total_mean * background[valid] - mean[valid] * total) ** 2 / (background[valid] * foreground[valid])
+    threshold = int(np.argmax(between))
+    return gray.point(lambda v: 255 if v > threshold else 0)
+
+def prepare_image(img, max_side=DEFAULT_MAX_SIDE, target_dpi=DEFAULT_TARGET_DPI, triage=True,
+                  gray=False, binarize=False):
+    # (image to OCR, None) or (None, reason) when OCR can be skipped. Triage looks at
+    # the downscaled image, which keeps strokes that are large enough to OCR.
+    img = downscale(img, max_side, target_dpi, mode="L" if gray or binarize else None)
+    if triage:
+        reason = triage_reason(img)
+        if reason is not None:
+            return None, reason
+    if binarize:
+        img = binarize_image(img)
+    return img, None
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import sqlite3
+import argparse
+import threading
+
+from index_store import TOMBSTONE, record_key, iter_compacted, write_json_array
+from text_norm import fold
+
+# Optional SQLite storage for the index: one row per record (metadata as JSON plus
+# the text), an FTS5 full-text table kept in sync by triggers, written in batched
+# transactions. Same write()/sync()/close() interface as index_store.IndexWriter.
+# The FTS table indexes `norm`, the text_norm.fold() of the text computed once at
+# write time; queries are folded the same way.
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    type TEXT,
+    filename TEXT,
+    second INTEGER,
+    page INTEGER,
+    meta TEXT NOT NULL,
+    text TEXT,
+    norm TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_filename ON entries(filename);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    norm, content='entries', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts(rowid, norm) VALUES (new.id, new.norm);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, norm) VALUES ('delete', old.id, old.norm);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_au AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_fts(entries_fts, rowid, norm) VALUES ('delete', old.id, old.norm);
+    INSERT INTO entries_fts(rowid, norm) VALUES (new.id, new.norm);
+END;
+"""
+
+# Databases written before the norm column existed: add it, fill it and index it
+# instead of the raw text
+MIGRATE_NORM = """
+ALTER TABLE entries ADD COLUMN norm TEXT;
+UPDATE entries SET norm = fold_text(text);
+DROP TRIGGER entries_ai;
+DROP TRIGGER entries_ad;
+DROP TRIGGER entries_au;
+DROP TABLE entries_fts;
+"""
+
+def fold_text(text):
+    return fold(text) if isinstance(text, str) else None
+
+COLUMNS = ("id", "type", "filename", "second", "page")
+
+def db_key(item):
+    key = record_key(item)
+    return key if isinstance(key, str) else f"{key[0]}:{key[1]}"
+
+def item_filename(item):
+    # image-video-index.py names the video path "video" instead of "filename"
+    return item.get("filename", item.get("video"))
+
+def fts_query(query):
+    # '"exact phrase" other words' -> FTS5 syntax: every word / phrase must match
+    parts = []
+    query = fold(query)
+    for phrase in re.findall(r'"([^"]*)"', query):
+        words = re.findall(r"\w+", phrase)
+        if words:
+            parts.append('"' + " ".join(words) + '"')
+    for word in re.findall(r"\w+", re.sub(r'"[^"]*"', " ", query)):
+        parts.append(f'"{word}"')
+    return " ".join(parts)
+
+class IndexDB:
+    def __init__(self, path, batch_size=500, readonly=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self._uncommitted = 0
+        self._lock = threading.Lock()
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self._migrate()
+            self.conn.executescript(SCHEMA)
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+            # Rows dropped by tombstones during this run stay readable here, so
+            # collect_records() sees the index as it was when the run started
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS trash AS SELECT * FROM entries WHERE 0")
+            self.conn.commit()
+        self.start_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+
+    def _migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'entries'").fetchone()
+        if exists and version < 1:
+            self.conn.create_function("fold_text", 1, fold_text, deterministic=True)
+            self.conn.executescript(MIGRATE_NORM)
+            self.conn.executescript(SCHEMA)
+            self.conn.execute("INSERT INTO entries_fts(entries_fts) VALUES ('rebuild')")
+            self.conn.commit()
+
+    def write(self, record):
+        if record.get("type") == TOMBSTONE:
+            filename = record.get("filename")
+            self.conn.execute("INSERT INTO trash SELECT * FROM entries WHERE filename = ? AND id <= ?", (filename, self.start_id))
+            self.conn.execute("DELETE FROM entries WHERE filename = ?", (filename,))
+        else:
+            meta = {k: v for k, v in record.items() if k != "text"}
+            self.conn.execute(
+                "INSERT INTO entries (key, type, filename, second, page, meta, text, norm) VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET type = excluded.type, filename = excluded.filename, "
+                "second = excluded.second, page = excluded.page, meta = excluded.meta, text = excluded.text, "
+                "norm = excluded.norm",
+                (db_key(record), record.get("type"), item_filename(record), record.get("second"),
+                 record.get("page"), json.dumps(meta, ensure_ascii=False), record.get("text"),
+                 fold_text(record.get("text")))
+            )
+            self.count += 1
+        self._uncommitted += 1
+        if self._uncommitted >= self.batch_size:
+            self.sync()
+
+    def sync(self):
+        self.conn.commit()
+        self._uncommitted = 0
+
+    def begin_run(self):
+        # Commits and starts a new "run" for collect_records(): --watch treats every
+        # batch of changes as one
+        self.sync()
+        self.conn.execute("DELETE FROM trash")
+        self.start_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.sync()
+        self.conn.close()
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _item(meta, text):
+        item = json.loads(meta)
+        item["text"] = text
+        return item
+
+    def iter_records(self, with_text=True):
+        # Streams rows in insertion order; without text only metadata is read
+        if with_text:
+            for meta, text in self.conn.execute("SELECT meta, text FROM entries ORDER BY id"):
+                yield self._item(meta, text)
+        else:
+            for (meta,) in self.conn.execute("SELECT meta FROM entries ORDER BY id"):
+                yield json.loads(meta)
+
+    def collect_records(self, paths):
+        # Current records of the given paths as of the start of this run
+        found = {p: [] for p in paths}
+        for path in found:
+            rows = self.conn.execute(
+                "SELECT meta, text FROM entries WHERE filename = ? AND id <= ? "
+                "UNION ALL SELECT meta, text FROM trash WHERE filename = ?",
+                (path, self.start_id, path)
+            )
+            found[path] = [self._item(meta, text) for meta, text in rows]
+        return found
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def ranked(self, query, limit=10, offset=0):
+        # (total hits, [(entry, score), ...]) for one page of results, best first,
+        # ranked by FTS5's BM25 (negated so that higher is better)
+        match = fts_query(query)
+        if not match:
+            return 0, []
+        with self._lock:
+            total = self.conn.execute(
+                "SELECT COUNT(*) FROM entries_fts WHERE entries_fts MATCH ?", (match,)
+            ).fetchone()[0]
+            rows = self.conn.execute(
+                "SELECT e.id, e.type, e.filename, e.second, e.page, bm25(entries_fts) AS score FROM entries_fts "
+                "JOIN entries e ON e.id = entries_fts.rowid WHERE entries_fts MATCH ? "
+                "ORDER BY score, e.id LIMIT ? OFFSET ?",
+                (match, limit, offset)
+            ).fetchall()
+        return total, [({k: v for k, v in zip(COLUMNS, row[:-1]) if v is not None}, -row[-1]) for row in rows]
+
+    def get(self, entry_id):
+        with self._lock:
+            row = self.conn.execute("SELECT meta, text FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return self._item(*row) if row else None
+
+    def import_json(self, json_path):
+        # Streams an existing index.json (or index.pack) into the database
+        n = 0
+        for item in iter_compacted(json_path):
+            if "type" in item:
+                self.write(item)
+                n += 1
+        self.sync()
+        return n
+
+    def export_json(self, json_path):
+        # Writes the same layout as the indexers' index.json, streaming
+        return write_json_array(self.iter_records(), json_path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between index.json and the SQLite/FTS5 index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="index.json (or index.pack) -> SQLite")
+    p_import.add_argument('json', help="Path to index.json or index.pack")
+    p_import.add_argument('db', help="Path to the SQLite database (created if missing)")
+    p_export = sub.add_parser("export", help="SQLite -> index.json")
+    p_export.add_argument('db', help="Path to the SQLite database")
+    p_export.add_argument('json', help="Path to write index.json")
+    args = parser.parse_args()
+    if args.command == "import":
+        with IndexDB(args.db) as db:
+            n = db.import_json(args.json)
+        print(f"✅ Imported {n} entries into {args.db}")
+    else:
+        with IndexDB(args.db, readonly=True) as db:
+            n = db.export_json(args.json)
+        print(f"✅ Exported {n} entries to {args.json}")
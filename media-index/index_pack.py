@@ -0,0 +1,259 @@
+import os
+import json
+import mmap
+import zlib
+import struct
+import argparse
+import tempfile
+from array import array
+from functools import lru_cache
+
+# Packed binary index (index.pack), the compact alternative to index.json. Layout:
+#
+#   header      magic, version, record/path/type/block counts, section offsets
+#   types       type names ("image", "video", ...), one byte per record refers to them
+#   paths       every filename once (path dictionary), records refer to it by id
+#   records     fixed-width table, one 32-byte row per record: type, flags, path id,
+#               second/page, text block, offset and length of the text and extras
+#   blocks      (offset, length) of each compressed text block
+#   text        zlib blocks of ~64 KB holding each record's text, followed by its
+#               other keys as JSON ("same_as", "source", ...)
+#
+# The file is memory-mapped. Filenames, types and positions are read from the table
+# without touching the text; a record's text costs one block decompression (recent
+# blocks are cached). frame_id / page_id are rebuilt from filename and second/page.
+
+MAGIC = b"MIDXPACK"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIIQQQQQ")
+RECORD = struct.Struct("<BBHIdIIII")
+BLOCK = struct.Struct("<QI")
+BLOCK_SIZE = 64 * 1024
+# zlib level: the pack is rewritten by every compaction, so speed over the last few %
+COMPRESS_LEVEL = 3
+PACK_SUFFIX = ".pack"
+
+# Record flags. OWN_ID: frame_id/page_id is missing or does not follow the usual
+# scheme, so it is not rebuilt (the extras hold it, if any)
+HAS_SECOND, HAS_PAGE, FLOAT_POS, NO_TEXT, VIDEO_KEY, OWN_ID = 1, 2, 4, 8, 16, 32
+
+# Keys stored in the table (or rebuilt) rather than in the extras JSON
+TABLE_KEYS = {"type", "filename", "video", "second", "page", "text"}
+
+def is_pack(path):
+    return path.endswith(PACK_SUFFIX)
+
+def _position(item, flags):
+    # (flags, value) of a record's second or page
+    for key, flag in (("second", HAS_SECOND), ("page", HAS_PAGE)):
+        value = item.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return flags | flag | (FLOAT_POS if isinstance(value, float) else 0), float(value)
+    return flags, 0.0
+
+def write_pack(items, path, block_size=BLOCK_SIZE, level=COMPRESS_LEVEL):
+    # Streams items (dicts as in index.json) into a packed index at path, atomically.
+    # Texts and the record table are spilled to temporary files, so memory only holds
+    # the path dictionary and one text block. Returns the number of records.
+    types, type_ids = [], {}
+    paths, path_ids = [], {}
+    blocks = array("Q")
+    folder = os.path.dirname(os.path.abspath(path))
+    n = 0
+    with tempfile.TemporaryFile(dir=folder) as table, tempfile.TemporaryFile(dir=folder) as text_blob:
+        buf = bytearray()
+
+        def flush_block():
+            data = zlib.compress(bytes(buf), level)
+            blocks.extend((text_blob.tell(), len(data)))
+            text_blob.write(data)
+            buf.clear()
+
+        for item in items:
+            filetype = item.get("type") or ""
+            if filetype not in type_ids:
+                type_ids[filetype] = len(types)
+                types.append(filetype)
+            flags = 0
+            filename = item.get("filename")
+            if filename is None and "video" in item:
+                filename, flags = item["video"], VIDEO_KEY
+            filename = filename or ""
+            if filename not in path_ids:
+                path_ids[filename] = len(paths)
+                paths.append(filename)
+            flags, position = _position(item, flags)
+            extras = {k: v for k, v in item.items() if k not in TABLE_KEYS}
+            # Ids following the usual scheme are rebuilt on read
+            if flags & HAS_SECOND:
+                id_key, id_value = "frame_id", f"{filename}|{item['second']}"
+            elif flags & HAS_PAGE:
+                id_key, id_value = "page_id", f"{filename}|p{item['page']}"
+            else:
+                id_key = None
+            if id_key and extras.get(id_key) == id_value:
+                del extras[id_key]
+            elif id_key:
+                flags |= OWN_ID
+            text = item.get("text")
+            if not isinstance(text, str):
+                flags |= NO_TEXT
+                if text is not None:
+                    extras["text"] = text
+            text_bytes = text.encode("utf-8") if isinstance(text, str) else b""
+            extra_bytes = json.dumps(extras, ensure_ascii=False).encode("utf-8") if extras else b""
+            if buf and len(buf) + len(text_bytes) + len(extra_bytes) > block_size:
+                flush_block()
+            table.write(RECORD.pack(type_ids[filetype], flags, 0, path_ids[filename], position,
+                                    len(blocks) // 2, len(buf), len(text_bytes), len(extra_bytes)))
+            buf += text_bytes
+            buf += extra_bytes
+            n += 1
+        if buf:
+            flush_block()
+
+        type_data = json.dumps(types).encode("utf-8")
+        path_blob = b"".join(p.encode("utf-8") + b"\0" for p in paths)
+        types_at = HEADER.size
+        paths_at = types_at + len(type_data)
+        records_at = paths_at + len(path_blob)
+        blocks_at = records_at + n * RECORD.size
+        text_at = blocks_at + len(blocks) // 2 * BLOCK.size
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as out:
+            out.write(HEADER.pack(MAGIC, VERSION, n, len(paths), len(types), len(blocks) // 2,
+                                  paths_at, records_at, blocks_at, text_at, len(path_blob)))
+            out.write(type_data)
+            out.write(path_blob)
+            table.seek(0)
+            while chunk := table.read(1 << 20):
+                out.write(chunk)
+            for i in range(0, len(blocks), 2):
+                out.write(BLOCK.pack(blocks[i], blocks[i + 1]))
+            text_blob.seek(0)
+            while chunk := text_blob.read(1 << 20):
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, path)
+    return n
+
+def _block_reader(mm, blocks_at, text_at, cached_blocks):
+    # LRU of decompressed text blocks. A closure over the mapping rather than a cached
+    # bound method, so a PackedIndex has no reference cycle and its mapping is
+    # released as soon as the last reader drops it.
+    @lru_cache(maxsize=cached_blocks)
+    def read_block(block):
+        offset, length = BLOCK.unpack_from(mm, blocks_at + block * BLOCK.size)
+        start = text_at + offset
+        return zlib.decompress(mm[start:start + length])
+    return read_block
+
+class PackedIndex:
+    # Read-only view of an index.pack; behaves like the list of index.json entries
+    # (len, index, iterate) without loading the text
+    def __init__(self, path, cached_blocks=64):
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError(f"{path} is not a packed index")
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.n, n_paths, n_types, self.n_blocks, paths_at, self.records_at, self.blocks_at,
+         self.text_at, paths_len) = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a packed index")
+        if version != VERSION:
+            raise ValueError(f"Unsupported packed index version {version} in {path}")
+        self.types = json.loads(bytes(self.mm[HEADER.size:paths_at]))
+        self.paths = bytes(self.mm[paths_at:paths_at + paths_len]).decode("utf-8").split("\0")[:n_paths]
+        self._block = _block_reader(self.mm, self.blocks_at, self.text_at, cached_blocks)
+
+    def __len__(self):
+        return self.n
+
+    def _row(self, i):
+        return RECORD.unpack_from(self.mm, self.records_at + i * RECORD.size)
+
+    def _item(self, row, with_text=True):
+        type_id, flags, _, path_id, position, block, offset, text_len, extra_len = row
+        filename = self.paths[path_id]
+        item = {"type": self.types[type_id], "video" if flags & VIDEO_KEY else "filename": filename}
+        if flags & (HAS_SECOND | HAS_PAGE):
+            value = position if flags & FLOAT_POS else int(position)
+            if flags & HAS_SECOND:
+                item["second"] = value
+                if not flags & OWN_ID:
+                    item["frame_id"] = f"{filename}|{value}"
+            else:
+                item["page"] = value
+                if not flags & OWN_ID:
+                    item["page_id"] = f"{filename}|p{value}"
+        if not with_text and not (flags & OWN_ID and extra_len):
+            # Table only: type, filename, second/page and ids
+            return item
+        data = self._block(block) if text_len or extra_len else b""
+        if with_text:
+            item["text"] = None if flags & NO_TEXT else data[offset:offset + text_len].decode("utf-8")
+        if extra_len:
+            extras = json.loads(data[offset + text_len:offset + text_len + extra_len])
+            if not with_text:
+                extras = {k: extras[k] for k in ("frame_id", "page_id") if k in extras}
+            # Non-string texts are kept in the extras
+            item.update(extras)
+        return item
+
+    def record(self, i, with_text=True):
+        if not 0 <= i < self.n:
+            raise IndexError(i)
+        return self._item(self._row(i), with_text)
+
+    def __getitem__(self, i):
+        return self.record(i + self.n if i < 0 else i)
+
+    def text(self, i):
+        return self.record(i)["text"]
+
+    def iter_records(self, with_text=True, paths=None):
+        # Records in index order. Without text only the table is read, and records
+        # carry just type, filename, second/page and ids (enough for resume checks);
+        # paths limits the records to these filenames before anything is decompressed.
+        wanted = None
+        if paths is not None:
+            wanted = {i for i, p in enumerate(self.paths) if p in paths}
+        for i in range(self.n):
+            row = self._row(i)
+            if wanted is None or row[3] in wanted:
+                yield self._item(row, with_text)
+
+    def __iter__(self):
+        return self.iter_records()
+
+    def close(self):
+        self._block.cache_clear()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == "__main__":
+    from index_store import iter_json_array, write_json_array
+    parser = argparse.ArgumentParser(description="Convert between index.json and the packed binary index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_pack = sub.add_parser("pack", help="index.json -> index.pack")
+    p_pack.add_argument('json', help="Path to index.json")
+    p_pack.add_argument('pack', help="Path to write index.pack")
+    p_unpack = sub.add_parser("unpack", help="index.pack -> index.json")
+    p_unpack.add_argument('pack', help="Path to index.pack")
+    p_unpack.add_argument('json', help="Path to write index.json")
+    args = parser.parse_args()
+    if args.command == "pack":
+        n = write_pack((item for item in iter_json_array(args.json) if "type" in item), args.pack)
+        size_in, size_out = os.path.getsize(args.json), os.path.getsize(args.pack)
+        print(f"✅ Packed {n} entries into {args.pack} ({size_in / (1 << 20):.1f} MB -> {size_out / (1 << 20):.1f} MB)")
+    else:
+        with PackedIndex(args.pack) as index:
+            n = write_json_array(index, args.json)
+        print(f"✅ Unpacked {n} entries to {args.json}")
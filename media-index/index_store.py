@@ -0,0 +1,345 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+
+from index_pack import PackedIndex, is_pack, write_pack
+
+# New records are appended to JSONL segments in <index.json>.segments/ while a run
+# is in progress, and folded into index.json by compact_index() at the end. An
+# index file ending in .pack is the packed binary format (index_pack.py) instead;
+# segments and compaction work the same way.
+SEGMENT_SUFFIX = ".segments"
+
+# Segment record that drops every earlier record of a file (deleted or changed)
+TOMBSTONE = "deleted"
+
+def record_key(item):
+    # Identity of a record for resume/dedup: one per video frame or PDF page,
+    # one per file otherwise
+    if item.get("type") == "video":
+        return item.get("frame_id")
+    if item.get("page_id"):
+        return item["page_id"]
+    return (item.get("type"), item.get("filename", ""))
+
+def segment_dir(index_file):
+    return index_file + SEGMENT_SUFFIX
+
+def list_segments(index_file):
+    seg_dir = segment_dir(index_file)
+    if not os.path.isdir(seg_dir):
+        return []
+    return [os.path.join(seg_dir, f) for f in sorted(os.listdir(seg_dir)) if f.endswith(".jsonl")]
+
+def iter_json_array(path, chunk_size=1 << 20):
+    # Stream the items of a top-level JSON array without loading the whole file
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof, started = "", 0, False, False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    raise ValueError(f"Unexpected end of JSON array in {path}")
+                buf, pos = f.read(chunk_size), 0
+                eof = not buf
+                continue
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path} is not a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Item spans the buffer end: read more (at least doubling, for huge items)
+                more = f.read(max(chunk_size, len(buf)))
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield item
+            pos = end
+
+def iter_segment_records(index_file, exclude_segment=None):
+    for path in list_segments(index_file):
+        if path == exclude_segment:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn last line from a killed run: that record is simply redone
+                    continue
+
+def iter_compacted(index_file, with_text=True, paths=None):
+    # Records of the compacted index.json / index.pack. A pack is read without the
+    # text when with_text=False, and only for the given paths if any.
+    if not os.path.exists(index_file):
+        return
+    if is_pack(index_file):
+        with PackedIndex(index_file) as index:
+            yield from index.iter_records(with_text=with_text, paths=paths)
+    else:
+        yield from iter_json_array(index_file)
+
+def iter_index_records(index_file, exclude_segment=None, with_text=True, paths=None):
+    # Everything indexed so far: the compacted index, then any pending segments.
+    # with_text and paths only save work; callers still get (and filter) the rest
+    # from index.json and the segments.
+    yield from iter_compacted(index_file, with_text=with_text, paths=paths)
+    yield from iter_segment_records(index_file, exclude_segment=exclude_segment)
+
+class IndexWriter:
+    # Append-only JSONL writer, one new segment per run so a torn write never
+    # touches earlier data. Flushes every record, fsyncs every `fsync_every`
+    # records or `fsync_interval` seconds.
+    def __init__(self, index_file, fsync_every=100, fsync_interval=5.0):
+        seg_dir = segment_dir(index_file)
+        os.makedirs(seg_dir, exist_ok=True)
+        n = len(list_segments(index_file))
+        while os.path.exists(os.path.join(seg_dir, f"segment-{n:06d}.jsonl")):
+            n += 1
+        self.path = os.path.join(seg_dir, f"segment-{n:06d}.jsonl")
+        self.f = open(self.path, "a", encoding="utf-8")
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.count = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def write(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+        self.count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.sync()
+        self.f.close()
+        if self.count == 0:
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def dump_item(item):
+    # Same layout as json.dump(results, f, indent=2), one item at a time
+    return "  " + json.dumps(item, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+
+def write_json_array(items, path):
+    # Streams items into path as an index.json array: written to a temporary file,
+    # fsynced, then swapped in. Returns the number of items written.
+    tmp_file = path + ".tmp"
+    count = 0
+    with open(tmp_file, "w", encoding="utf-8") as out:
+        out.write("[")
+        for item in items:
+            out.write(",\n" if count else "\n")
+            out.write(dump_item(item))
+            count += 1
+        out.write("\n]" if count else "]")
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_file, path)
+    return count
+
+def compact_index(index_file):
+    # Fold pending segments into index.json. A segment record replaces any earlier
+    # record with the same key, and a tombstone drops every earlier record of its
+    # file. Streams both sides, so only keys are kept in memory.
+    # Returns the number of entries in the new index.json.
+    segments = list_segments(index_file)
+    if not segments:
+        if not os.path.exists(index_file):
+            return 0
+        if is_pack(index_file):
+            with PackedIndex(index_file) as index:
+                return len(index)
+        return sum(1 for _ in iter_json_array(index_file))
+
+    last_seen = {}
+    last_tombstone = {}
+    for n, item in enumerate(iter_segment_records(index_file)):
+        if item.get("type") == TOMBSTONE:
+            last_tombstone[item.get("filename")] = n
+        else:
+            last_seen[record_key(item)] = n
+
+    def merged():
+        for item in iter_compacted(index_file):
+            if record_key(item) not in last_seen and item.get("filename") not in last_tombstone:
+                yield item
+        for n, item in enumerate(iter_segment_records(index_file)):
+            if item.get("type") == TOMBSTONE:
+                continue
+            if last_seen[record_key(item)] == n and n > last_tombstone.get(item.get("filename"), -1):
+                yield item
+
+    # Atomic swap first, then drop segments: a crash in between is harmless since
+    # compacting again yields the same index.json
+    if is_pack(index_file):
+        count = write_pack(merged(), index_file)
+    else:
+        count = write_json_array(merged(), index_file)
+    for path in segments:
+        os.remove(path)
+    try:
+        os.rmdir(segment_dir(index_file))
+    except OSError:
+        pass
+    return count
+
+def hash_file(path, chunk_size=1 << 20):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_manifest(manifest_file):
+    # {rel_path: {"size": int, "mtime_ns": int, "hash": str or None}}, plus
+    # "incomplete": true for files indexed with some frames/pages missing
+    if not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest_file, manifest):
+    tmp_file = manifest_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, manifest_file)
+
+class IncrementalPlanner:
+    # Decides, file by file while the scan is still running, what an incremental
+    # run has to do. Only stats files whose size/mtime match the manifest; hashes
+    # the rest. `indexed_paths` are the paths that already have records.
+    UNCHANGED, PROCESS, COPY = "unchanged", "process", "copy"
+
+    def __init__(self, input_folder, manifest, indexed_paths):
+        self.input_folder = input_folder
+        self.manifest = manifest
+        self.indexed_paths = indexed_paths
+        self.hash_to_path = {e["hash"]: p for p, e in manifest.items()
+                             if e.get("hash") and not e.get("incomplete") and p in indexed_paths}
+        self.entries = {}   # manifest entries that are final now (unchanged or copied)
+        self.pending = {}   # manifest entries to commit once the file is reprocessed
+        self.seen = set()
+        self.counts = {self.UNCHANGED: 0, self.PROCESS: 0, self.COPY: 0}
+
+    def classify(self, filetype, rel_path, st=None):
+        # Returns (action, source, stale): source is the already indexed path with the
+        # same content for COPY, stale means the old records of rel_path must be dropped
+        action, source, stale = self._classify(filetype, rel_path, st)
+        self.counts[action] += 1
+        return action, source, stale
+
+    def _classify(self, filetype, rel_path, st):
+        self.seen.add(rel_path)
+        if st is None:
+            st = os.stat(os.path.join(self.input_folder, rel_path))
+        entry = self.manifest.get(rel_path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            if entry.get("incomplete"):
+                return self._retry(filetype, rel_path, entry)
+            self.entries[rel_path] = entry
+            return self.UNCHANGED, None, False
+        if entry is None and rel_path in self.indexed_paths:
+            # Indexed before the manifest existed (or by a killed run): trust the index,
+            # hash later if it ever changes. Videos still go through ocr_video's
+            # frame-level resume to fill any missing frames.
+            new_entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": None}
+            if filetype == "video":
+                self.pending[rel_path] = new_entry
+                return self.PROCESS, None, False
+            self.entries[rel_path] = new_entry
+            return self.UNCHANGED, None, False
+        digest = hash_file(os.path.join(self.input_folder, rel_path))
+        new_entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest}
+        if entry and entry.get("hash") == digest:
+            # Touched but not modified
+            if entry.get("incomplete"):
+                return self._retry(filetype, rel_path, new_entry)
+            self.entries[rel_path] = new_entry
+            return self.UNCHANGED, None, False
+        stale = rel_path in self.indexed_paths
+        src = self.hash_to_path.get(digest)
+        if src is not None and src != rel_path:
+            self.entries[rel_path] = new_entry
+            return self.COPY, src, stale
+        self.pending[rel_path] = new_entry
+        return self.PROCESS, None, stale
+
+    def _retry(self, filetype, rel_path, entry):
+        # Same content, but some frames/pages failed last time. Videos resume and only
+        # fill the missing frames; other files are redone after dropping their records.
+        self.pending[rel_path] = {k: v for k, v in entry.items() if k != "incomplete"}
+        return self.PROCESS, None, filetype != "video" and rel_path in self.indexed_paths
+
+    def commit(self, rel_path, complete=True):
+        # The file has been reprocessed: its pending entry becomes final. Incomplete
+        # files are retried by the next run.
+        entry = self.pending[rel_path]
+        self.entries[rel_path] = entry if complete else dict(entry, incomplete=True)
+
+    def deleted(self):
+        # Call once the scan is complete
+        return sorted((set(self.manifest) | set(self.indexed_paths)) - self.seen)
+
+def collect_records(index_file, paths, exclude_segment=None):
+    # All current records of the given paths, honouring tombstones in pending
+    # segments. Pass the running writer's segment as exclude_segment to see the
+    # index as it was when the run started.
+    paths = set(paths)
+    found = {p: [] for p in paths}
+    if not paths:
+        return found
+    for item in iter_index_records(index_file, exclude_segment=exclude_segment, paths=paths):
+        path = item.get("filename")
+        if path not in paths:
+            continue
+        if item.get("type") == TOMBSTONE:
+            found[path] = []
+        else:
+            found[path].append(item)
+    return found
+
+def retarget_record(item, filetype, rel_path):
+    # Copy of a record moved to another path, keeping the frame_id/page_id schemes
+    item = dict(item, type=filetype, filename=rel_path)
+    if item.get("type") == "video":
+        item["frame_id"] = f"{rel_path}|{item.get('second')}"
+    if item.get("page_id"):
+        item["page_id"] = f"{rel_path}|p{item.get('page')}"
+    return item
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact pending index segments into index.json (or index.pack)")
+    parser.add_argument('index', help="Path to index.json or index.pack")
+    args = parser.parse_args()
+    n = compact_index(args.index)
+    print(f"✅ Index compacted: {args.index} ({n} entries)")
@@ -1,17 +1,26 @@
 import os
+import re
 import json
 import argparse
+import time
+import subprocess
 from tqdm import tqdm
-from PIL import Image
-import pytesseract
-import cv2
 
-from pdf2image import convert_from_path
-from striprtf.striprtf import rtf_to_text
-from docx import Document
-import pandas as pd
-from ebooklib import epub
-from bs4 import BeautifulSoup
+# cv2, numpy, PIL and pdf2image are imported inside the functions that use them, and
+# document libraries inside their extractors, so startup only pays for what a run needs
+from extractors import register_extractor, get_extractor, get_filetype, load_extractors
+from image_prep import DEFAULT_IMAGE_PREP, DEFAULT_MAX_SIDE, DEFAULT_TARGET_DPI, prepare_image
+from index_db import IndexDB
+from ocr_backend import OCR_BACKENDS, OcrBatch, get_backend
+from ocr_cache import DEFAULT_CACHE_MB, OcrCache, cache_key
+from metrics import Metrics, summary_lines, write_metrics, task as task_metrics
+from worker_pool import IsolatedPool, TIMEOUT, CRASHED, MEMORY, ERROR
+from watcher import DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, watch_changes
+from shards import RUNNING, WATCHING, DONE, parse_shard, shard_of, shard_path, write_shard_info
+from index_store import (
+    IndexWriter, TOMBSTONE, iter_index_records, compact_index, load_manifest, save_manifest,
+    IncrementalPlanner, collect_records, retarget_record, hash_file,
+)
 
 # --- OCR portable config (Windows) ---
 os.environ["PATH"] += os.pathsep + os.path.abspath("../app-ocr/Tesseract5.5.0")
@@ -19,36 +28,165 @@ os.environ["PATH"] += os.pathsep + os.path.abspath("../app-ocr/poppler-24.08.0/L
 os.environ["PATH"] += os.pathsep + os.path.abspath("../app-ocr/gs10.05.1/bin")
 os.environ["GS"] = os.path.abspath("../app-ocr/gs10.05.1/bin/gswin64c.exe")
 
-EXT_MAP = {
-    "image": ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'),
-    "video": ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.m4v', '.flv'),
-    "pdf": ('.pdf',),
-    "docx": ('.docx',),
-    "doc": ('.doc',),
-    "xlsx": ('.xlsx',),
-    "xls": ('.xls',),
-    "rtf": ('.rtf',),
-    "txt": ('.txt',),
-    "md": ('.md',),
-    "epub": ('.epub',),
-    "azw": ('.azw', '.azw3', '.mobi'),
-}
-
-def find_files_recursive(folder, exts):
-    file_list = []
-    for root, dirs, files in os.walk(folder):
-        for f in files:
-            if f.lower().endswith(exts):
-                rel_path = os.path.relpath(os.path.join(root, f), folder)
-                file_list.append(rel_path)
-    return sorted(file_list)
-
-def ocr_image(img_path, lang="eng"):
-    img = Image.open(img_path)
-    text = pytesseract.image_to_string(img, lang=lang)
-    return text.strip()
-
-def ocr_video(video_path, input_folder, lang="eng", frame_interval=5, done_set=None):
+# Written by this tool into the input folder, never indexed (shards log to
+# ocr_log.shard-2-of-4.txt)
+OWN_FILES = {"ocr_log.txt"}
+OWN_FILE_RE = re.compile(r"ocr_log\.shard-\d+-of-\d+\.txt")
+
+def is_own_file(rel_path):
+    return rel_path in OWN_FILES or OWN_FILE_RE.fullmatch(rel_path) is not None
+
+# Fallback keyframe interval (frames) when it cannot be probed, x264's default keyint
+DEFAULT_GOP = 250
+
+# PDF pages are rendered one at a time at this DPI (pdf2image's default) when they need OCR
+DEFAULT_PDF_DPI = 200
+# A page whose embedded text layer has at least this many word characters is not OCR'd
+PDF_MIN_TEXT_CHARS = 25
+
+# Video frames / PDF pages handed to the OCR backend at once
+DEFAULT_OCR_BATCH = 8
+
+# Per-file limits for extraction workers: wall-clock seconds (videos get their own,
+# longer budget) and address space in MB (not enforced on Windows); 0 disables
+DEFAULT_TIMEOUT = 600
+DEFAULT_VIDEO_TIMEOUT = 3 * 3600
+# PDFs get --timeout plus this many seconds per page, so a long scan is not cut off
+# (and quarantined) halfway through
+DEFAULT_PDF_PAGE_TIMEOUT = 60
+# Seconds pdfinfo may take to count the pages; past that the PDF gets the flat --timeout
+PDF_INFO_TIMEOUT = 30
+DEFAULT_MAX_MEMORY_MB = 4096
+# Seconds a worker may take to open a video and plan its segments; past that it
+# runs as one segment
+PLAN_TIMEOUT = 120
+
+# Failures that put a file in quarantine until it changes
+QUARANTINE_FAILURES = (TIMEOUT, CRASHED, MEMORY)
+
+# Types whose results go to the shared OCR cache (documents are cheap to re-read)
+CACHED_TYPES = ("image", "pdf", "video")
+
+# Long videos are split into time segments OCR'd by separate workers (--workers > 1),
+# each at least this many seconds long; 0 keeps every video in one worker
+DEFAULT_VIDEO_SEGMENT = 120
+
+# A video frame counts as unchanged (and reuses the previous OCR text) when no tile of
+# its grayscale thumbnail differs from the last OCR'd frame by more than this mean
+# brightness (0-255); -1 disables the check. Low enough that one changed word or
+# digit of slide text counts as a change, high enough for compression noise.
+DEFAULT_DEDUP_THRESHOLD = 4
+# Thumbnail longest side (px) and tile side for the comparison
+DEDUP_SIDE = 480
+DEDUP_TILE = 8
+
+def scan_files(folder, rel_dir=""):
+    # Single scandir pass over folder/subfolders: yields (filetype, rel_path, stat)
+    # for every supported file. Entries are sorted per directory so the order is
+    # deterministic; stat comes from the DirEntry (free on Windows, cached on POSIX).
+    try:
+        with os.scandir(os.path.join(folder, rel_dir)) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError as e:
+        print(f"⚠️ Warning: cannot scan {rel_dir or folder}: {e}")
+        return
+    for entry in entries:
+        rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_files(folder, rel_path)
+                continue
+            filetype = get_filetype(entry.name)
+            if filetype is not None and entry.is_file():
+                yield filetype, rel_path, entry.stat()
+        except OSError as e:
+            print(f"⚠️ Warning: cannot stat {rel_path}: {e}")
+
+def ocr_image(img_path, lang="eng", backend="auto", prep=None):
+    # (text, None), or ("", reason) when triage finds no text worth an OCR pass
+    from PIL import Image
+    # "prep" includes decoding: PIL opens lazily and decodes while downscaling
+    with task_metrics.stage("prep"):
+        img = Image.open(img_path)
+        img, skip_reason = prepare_image(img, **(DEFAULT_IMAGE_PREP if prep is None else prep))
+    if skip_reason is not None:
+        task_metrics.count("ocr_skipped")
+        return "", skip_reason
+    task_metrics.count("ocr_images")
+    task_metrics.count("pixels_ocr", img.width * img.height)
+    with task_metrics.stage("ocr"):
+        text = get_backend(backend, lang).image_to_string(img)
+    return text.strip(), None
+
+def probe_gop(vidcap, max_frames=2 * DEFAULT_GOP):
+    import cv2
+    # Distance between the first two keyframes, or None if the backend cannot tell
+    if not hasattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME"):
+        return None
+    keyframes = []
+    for i in range(max_frames):
+        if not vidcap.grab():
+            break
+        if vidcap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keyframes.append(i)
+            if len(keyframes) == 2:
+                break
+    vidcap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    if len(keyframes) == 2:
+        return keyframes[1] - keyframes[0]
+    return max_frames if keyframes else None
+
+def sample_video_frames(vidcap, sec_points, fps, skip_secs=None, gop=DEFAULT_GOP):
+    import cv2
+    # Walk the stream once: grab() advances without converting, and only the
+    # sampled frames are retrieved. Gaps much longer than a GOP (long interval,
+    # or a run of frames already done on resume) are cheaper to reach by seeking.
+    pos = 0
+    for sec in sec_points:
+        if skip_secs and sec in skip_secs:
+            continue
+        frame_idx = int(sec * fps)
+        if frame_idx < pos or frame_idx - pos > 2 * gop:
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            pos = frame_idx
+        success = True
+        while success and pos < frame_idx:
+            success = vidcap.grab()
+            pos += 1
+        frame = None
+        if success:
+            success, frame = vidcap.read()
+            pos += 1
+        yield sec, (frame if success else None)
+
+def frame_signature(frame, side=DEDUP_SIDE):
+    import cv2
+    # Grayscale thumbnail of the frame, compared tile by tile in frame_diff. A global
+    # hash (dHash) is too coarse here: a new bullet line or "slide 0" -> "slide 1"
+    # barely moves it, so slides would keep the first slide's text.
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    scale = min(1.0, side / max(h, w))
+    return cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+def frame_diff(a, b, tile=DEDUP_TILE):
+    import cv2
+    # Largest mean absolute difference of any tile x tile block (0-255): a changed word
+    # shifts its own tiles a lot, while noise spread over the frame averages out
+    if a.shape != b.shape:
+        return 255
+    diff = cv2.absdiff(a, b)
+    h, w = diff.shape
+    tiles = cv2.resize(diff, (max(1, w // tile), max(1, h // tile)), interpolation=cv2.INTER_AREA)
+    return int(tiles.max())
+
+def ocr_video(video_path, input_folder, lang="eng", frame_interval=5, done_set=None, gop=None,
+              dedup_threshold=DEFAULT_DEDUP_THRESHOLD, stats=None, backend="auto", batch_size=DEFAULT_OCR_BATCH,
+              start_sec=0, end_sec=None):
+    # start_sec/end_sec: only the sample points in [start_sec, end_sec), one segment
+    # of a video split between workers; the first sample is reached with one seek
+    import cv2
+    from PIL import Image
     results = []
     abs_video_path = os.path.join(input_folder, video_path)
     vidcap = cv2.VideoCapture(abs_video_path)
@@ -57,192 +195,785 @@ def ocr_video(video_path, input_folder, lang="eng", frame_interval=5, done_set=N
     fps = vidcap.get(cv2.CAP_PROP_FPS)
     frame_count = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT))
     duration = frame_count / fps if fps > 0 else 0
-    sec_points = list(range(0, int(duration) + 1, frame_interval))
+    sec_points = [sec for sec in range(start_sec, int(duration) + 1, frame_interval) if end_sec is None or sec < end_sec]
+    label = video_path if not start_sec and end_sec is None else f"{video_path} [{start_sec}s-{'' if end_sec is None else f'{end_sec}s'}]"
     msg_list = []
-    for sec in tqdm(sec_points, desc=f"OCR video {video_path}", leave=False):
-        frame_idx = int(sec * fps)
-        vidcap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-        success, frame = vidcap.read()
-        if not success:
+    if gop is None:
+        with task_metrics.stage("probe"):
+            gop = probe_gop(vidcap) or DEFAULT_GOP
+    done_secs = set()
+    if done_set is not None:
+        done_secs = {sec for sec in sec_points if f"{video_path}|{sec}" in done_set}
+    if stats is None:
+        stats = {}
+    for k in ("frames", "ocr_calls", "ocr_skipped", "ocr_errors"):
+        stats.setdefault(k, 0)
+    frames_before, skipped_before = stats["frames"], stats["ocr_skipped"]
+    last_ocr = None
+    # Frames are OCR'd in batches; records get their text when the batch is flushed
+    batch = OcrBatch(get_backend(backend, lang), size=batch_size)
+    reused = []
+    frames = task_metrics.timed_iter("decode", sample_video_frames(vidcap, sec_points, fps, skip_secs=done_secs, gop=gop))
+    for sec, frame in tqdm(frames, total=len(sec_points) - len(done_secs), desc=f"OCR video {label}", leave=False):
+        if frame is None:
             msg_list.append(f"[ERR] Frame {sec}s not found in {video_path}")
             continue
+        t_frame = time.perf_counter()
         frame_id = f"{video_path}|{sec}"
-        if done_set is not None and frame_id in done_set:
-            continue
-        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        try:
-            text = pytesseract.image_to_string(img, lang=lang).strip()
-            results.append({
+        stats["frames"] += 1
+        # Compare with the last frame we actually OCR'd, so slow drift still triggers a new OCR
+        with task_metrics.stage("hash"):
+            fhash = frame_signature(frame) if dedup_threshold >= 0 else None
+        if last_ocr is not None and fhash is not None and frame_diff(fhash, last_ocr[0]) <= dedup_threshold:
+            source = last_ocr[1]
+            source["until"] = sec
+            record = {
                 "type": "video",
                 "filename": video_path,
                 "second": sec,
                 "frame_id": frame_id,
-                "text": text
-            })
-            msg_list.append(f"[OK] {video_path} at {sec}s")
-        except Exception as e:
-            msg_list.append(f"[ERR] {video_path} at {sec}s: {e}")
+                "text": None,
+                "same_as": source["second"]
+            }
+            results.append(record)
+            reused.append((record, source))
+            stats["ocr_skipped"] += 1
+            task_metrics.frames.append([sec, round((time.perf_counter() - t_frame) * 1000, 3), False])
+            continue
+        with task_metrics.stage("convert"):
+            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        task_metrics.frames.append([sec, round((time.perf_counter() - t_frame) * 1000, 3), True])
+        record = {
+            "type": "video",
+            "filename": video_path,
+            "second": sec,
+            "frame_id": frame_id,
+            "text": None
+        }
+        results.append(record)
+        batch.add(record, img)
+        stats["ocr_calls"] += 1
+        last_ocr = (fhash, record)
+    batch.flush()
     vidcap.release()
+    for record, source in reused:
+        if "error" in source:
+            record["error"] = source["error"]
+        else:
+            record["text"] = source["text"]
+    ok_results = []
+    for record in results:
+        if "error" in record:
+            # Counted apart from missing trailing frames: these make the video incomplete
+            stats["ocr_errors"] += 1
+            msg_list.append(f"[ERR] {video_path} at {record['second']}s: {record['error']}")
+        elif "same_as" in record:
+            ok_results.append(record)
+            msg_list.append(f"[OK] {video_path} at {record['second']}s (unchanged since {record['same_as']}s)")
+        else:
+            ok_results.append(record)
+            msg_list.append(f"[OK] {video_path} at {record['second']}s")
+    results = ok_results
+    if stats["frames"] > frames_before:
+        msg_list.append(
+            f"[OK] {label}: {stats['frames'] - frames_before} frames, "
+            f"{stats['ocr_skipped'] - skipped_before} OCR calls skipped (unchanged frames)"
+        )
     return results, msg_list
 
-def extract_text_from_pdf(pdf_path):
+def pdf_text_layer(pdf_path):
+    # Embedded text per page via poppler's pdftotext (one process for the whole file,
+    # pages separated by form feeds). Empty list if pdftotext is not available.
+    try:
+        out = subprocess.run(
+            ["pdftotext", "-layout", "-enc", "UTF-8", pdf_path, "-"],
+            capture_output=True, check=True
+        ).stdout.decode("utf-8", errors="ignore")
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    return out.split("\f")
+
+def pdf_page_count(pdf_path, timeout=None):
+    # Page count via poppler's pdfinfo, or None if it cannot be read in time
     try:
-        images = convert_from_path(pdf_path)
-        text = ""
-        for img in images:
-            text += pytesseract.image_to_string(img) + "\n"
-        return text.strip()
+        from pdf2image import pdfinfo_from_path
+        return int(pdfinfo_from_path(pdf_path, timeout=timeout)["Pages"])
+    except Exception:
+        return None
+
+def ocr_pdf(pdf_path, input_folder, lang="eng", dpi=DEFAULT_PDF_DPI, backend="auto", batch_size=DEFAULT_OCR_BATCH):
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    # One record per page. Pages with a usable text layer are read directly, the rest
+    # are rendered one at a time and OCR'd in small batches, so memory does not grow
+    # with page count.
+    results = []
+    abs_pdf_path = os.path.join(input_folder, pdf_path)
+    try:
+        with task_metrics.stage("pdf_info"):
+            n_pages = int(pdfinfo_from_path(abs_pdf_path)["Pages"])
+    except MemoryError:
+        # Over the worker's memory cap: let the pool quarantine the file
+        raise
     except Exception as e:
-        return f"[ERR] PDF: {e}"
-
-def extract_text_from_docx(docx_path):
-    doc = Document(docx_path)
-    return "\n".join([p.text for p in doc.paragraphs]).strip()
-
-def extract_text_from_txt(txt_path):
-    with open(txt_path, 'r', encoding='utf-8', errors='ignore') as f:
-        return f.read().strip()
-
-def extract_text_from_rtf(rtf_path):
-    with open(rtf_path, 'r', encoding='utf-8', errors='ignore') as f:
-        rtf_content = f.read()
-    text = rtf_to_text(rtf_content)
-    return text.strip()
-
-def extract_text_from_xlsx(xlsx_path):
-    dfs = pd.read_excel(xlsx_path, sheet_name=None)
-    text = ""
-    for sheet, df in dfs.items():
-        text += f"\n--- Sheet: {sheet} ---\n"
-        text += df.astype(str).to_csv(sep='\t', index=False)
-    return text.strip()
-
-def extract_text_from_xls(xls_path):
-    dfs = pd.read_excel(xls_path, sheet_name=None)
-    text = ""
-    for sheet, df in dfs.items():
-        text += f"\n--- Sheet: {sheet} ---\n"
-        text += df.astype(str).to_csv(sep='\t', index=False)
-    return text.strip()
-
-def extract_text_from_epub(epub_path):
+        return results, [f"[ERR] {pdf_path}: PDF: {e}"]
+    with task_metrics.stage("pdf_text"):
+        text_layer = pdf_text_layer(abs_pdf_path)
+    task_metrics.count("pages", n_pages)
+    batch = OcrBatch(get_backend(backend, lang), size=batch_size)
+    msg_list = []
+    n_ocr = 0
+    for page in range(1, n_pages + 1):
+        text = text_layer[page - 1] if page <= len(text_layer) else ""
+        record = {
+            "type": "pdf",
+            "filename": pdf_path,
+            "page": page,
+            "page_id": f"{pdf_path}|p{page}",
+            "text": text.strip(),
+            "source": "text"
+        }
+        if len(re.findall(r"\w", text)) >= PDF_MIN_TEXT_CHARS:
+            results.append(record)
+            continue
+        try:
+            with task_metrics.stage("render"):
+                images = convert_from_path(abs_pdf_path, dpi=dpi, first_page=page, last_page=page)
+        except MemoryError:
+            raise
+        except Exception as e:
+            msg_list.append(f"[ERR] {pdf_path} page {page}: {e}")
+            continue
+        record["source"] = "ocr"
+        results.append(record)
+        if images:
+            batch.add(record, images[0])
+            n_ocr += 1
+    batch.flush()
+    ok_results = []
+    for record in results:
+        if "error" in record:
+            msg_list.append(f"[ERR] {pdf_path} page {record['page']}: {record['error']}")
+        else:
+            ok_results.append(record)
+    results = ok_results
+    msg_list.append(f"[OK] {pdf_path} ({n_pages} pages, {n_pages - n_ocr} from text layer, {n_ocr} OCR)")
+    return results, msg_list
+
+# OCR types; document types are registered in extractors.py. These are called with
+# OCR options: image(path, lang, backend, prep) -> (text, skip reason), pdf -> (records, msgs) like
+# ocr_pdf, video -> (records, msgs) like ocr_video.
+register_extractor("image", ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff'), ocr_image)
+register_extractor("video", ('.mp4', '.avi', '.mov', '.mkv', '.wmv', '.m4v', '.flv'), ocr_video)
+register_extractor("pdf", ('.pdf',), ocr_pdf)
+
+def from_cache(rel_path, filetype, cached):
+    # Records found in the OCR cache, moved to rel_path
+    results = [retarget_record(item, filetype, rel_path) for item in cached]
+    return results, [f"[OK] {rel_path} (OCR cache, {len(results)} records)"]
+
+def process_file(filetype, rel_path, input_folder, lang="eng", pdf_dpi=DEFAULT_PDF_DPI,
+                 backend="auto", batch_size=DEFAULT_OCR_BATCH, image_prep=None, cached=None):
+    # Runs in the worker process when --workers > 1, so keep it top-level (picklable).
+    # The OCR engine from get_backend() lives as long as the worker process. Cache
+    # hits pass through here too, so records keep the order of a run without cache.
+    # Returns (results, msgs, metrics of this file).
+    task_metrics.reset()
+    if cached is not None:
+        return from_cache(rel_path, filetype, cached) + (task_metrics.snapshot(),)
+    try:
+        task_metrics.count("bytes_read", os.path.getsize(os.path.join(input_folder, rel_path)))
+    except OSError:
+        pass
+    results, msg_list = extract_file(filetype, rel_path, input_folder, lang, pdf_dpi, backend, batch_size, image_prep)
+    return results, msg_list, task_metrics.snapshot()
+
+def extract_file(filetype, rel_path, input_folder, lang, pdf_dpi, backend, batch_size, image_prep):
+    if filetype == "pdf":
+        return get_extractor("pdf")(rel_path, input_folder, lang=lang, dpi=pdf_dpi, backend=backend, batch_size=batch_size)
+    abs_path = os.path.join(input_folder, rel_path)
     try:
-        book = epub.read_epub(epub_path)
-        text = ""
-        for item in book.get_items():
-            if item.get_type() == epub.ITEM_DOCUMENT:
-                soup = BeautifulSoup(item.get_content(), "html.parser")
-                text += soup.get_text(separator="\n")
-        return text.strip()
+        skip_reason = None
+        if filetype == "image":
+            text, skip_reason = get_extractor("image")(abs_path, lang=lang, backend=backend, prep=image_prep)
+        else:
+            with task_metrics.stage("extract"):
+                text = get_extractor(filetype)(abs_path)
+        record = {
+            "type": filetype,
+            "filename": rel_path,
+            "text": text
+        }
+        if skip_reason is not None:
+            record["ocr_skipped"] = skip_reason
+            return [record], [f"[OK] {rel_path} (OCR skipped: {skip_reason})"]
+        return [record], [f"[OK] {rel_path}"]
+    except MemoryError:
+        # Over the worker's memory cap: let the pool quarantine the file
+        raise
     except Exception as e:
-        return f"[ERR] EPUB: {e}"
-
-def extract_text_from_md(md_path):
-    return extract_text_from_txt(md_path)
-
-def extract_text_from_doc(doc_path):
-    # Option 1: Use antiword or textract (needs installing).
-    # Option 2: Skip .doc, or convert .doc to .docx/.pdf outside script for stable use.
-    return "[WARN] .doc not natively supported, please convert to .docx"
-
-def extract_text_from_azw(azw_path):
-    # Placeholder: Recommend convert to epub/txt via Calibre or use mobi-python.
-    return "[WARN] AZW/MOBI not natively supported, please convert to epub/txt"
-
-# Tự động chọn hàm phù hợp
-EXTRACT_FUNCS = {
-    "image": ocr_image,
-    "video": ocr_video, # special case
-    "pdf": extract_text_from_pdf,
-    "docx": extract_text_from_docx,
-    "doc": extract_text_from_doc,
-    "xlsx": extract_text_from_xlsx,
-    "xls": extract_text_from_xls,
-    "rtf": extract_text_from_rtf,
-    "txt": extract_text_from_txt,
-    "md": extract_text_from_md,
-    "epub": extract_text_from_epub,
-    "azw": extract_text_from_azw,
-}
-
-def get_filetype(filename):
-    ext = os.path.splitext(filename)[1].lower()
-    for k, v in EXT_MAP.items():
-        if ext in v:
-            return k
-    return None
-
-def main(input_folder, lang="eng", frame_interval=5):
-    index_file = os.path.join(input_folder, "index.json")
+        return [], [f"[ERR] {rel_path}: {e}"]
+
+def process_video(rel_video, input_folder, lang, frame_interval, done_frames, gop,
+                  dedup_threshold, backend, batch_size, cached=None, segment=(0, None)):
+    # ocr_video for a worker process: frame counters and metrics are returned instead of
+    # updated. segment is the (start, end) seconds to OCR, end None = to the end.
+    stats = {"frames": 0, "ocr_calls": 0, "ocr_skipped": 0, "ocr_errors": 0}
+    task_metrics.reset()
+    if cached is not None:
+        return from_cache(rel_video, "video", cached) + (stats, task_metrics.snapshot())
+    # Counted once per video, not per segment
+    if segment[0] == 0:
+        try:
+            task_metrics.count("bytes_read", os.path.getsize(os.path.join(input_folder, rel_video)))
+        except OSError:
+            pass
+    results, msg_list = get_extractor("video")(
+        rel_video, input_folder, lang=lang,
+        frame_interval=frame_interval, done_set=done_frames, gop=gop,
+        dedup_threshold=dedup_threshold, stats=stats,
+        backend=backend, batch_size=batch_size, start_sec=segment[0], end_sec=segment[1]
+    )
+    task_metrics.count("frames", stats["frames"])
+    task_metrics.count("frames_reused", stats["ocr_skipped"])
+    return results, msg_list, stats, task_metrics.snapshot()
+
+def plan_video_segments(rel_video, input_folder, frame_interval, gop, n_parts, min_secs=DEFAULT_VIDEO_SEGMENT):
+    # Splits a video into up to n_parts time segments of at least min_secs, cut on
+    # sample points so the frames (and frame_ids) are exactly those of one pass.
+    # Returns (gop, [(start, end)]): the keyframe interval is probed here once instead
+    # of in every segment's worker. Short videos stay one segment, (0, None).
+    import cv2
+    whole = (gop, [(0, None)])
+    if n_parts < 2 or min_secs <= 0:
+        return whole
+    vidcap = cv2.VideoCapture(os.path.join(input_folder, rel_video))
+    try:
+        if not vidcap.isOpened():
+            return whole
+        fps = vidcap.get(cv2.CAP_PROP_FPS)
+        duration = int(vidcap.get(cv2.CAP_PROP_FRAME_COUNT)) / fps if fps > 0 else 0
+        n = min(n_parts, int(duration // min_secs))
+        if n < 2:
+            return whole
+        if gop is None:
+            gop = probe_gop(vidcap) or DEFAULT_GOP
+    finally:
+        vidcap.release()
+    n_points = int(duration) // frame_interval + 1
+    per_part = -(-n_points // n)
+    starts = [i * frame_interval for i in range(0, n_points, per_part)]
+    return gop, list(zip(starts, starts[1:] + [None]))
+
+def merge_video_parts(parts):
+    # One video's (result, failure, elapsed) from the outputs of its segments, which
+    # come in time order: records and messages are concatenated (so frames stay in
+    # timestamp order), counters and metrics added up. A failed segment fails the
+    # video; result then holds what the other segments found (None if nothing).
+    if len(parts) == 1:
+        return parts[0][1:]
+    results, msg_list, frames = [], [], []
+    stats = {"frames": 0, "ocr_calls": 0, "ocr_skipped": 0, "ocr_errors": 0}
+    metrics = Metrics()
+    failure = None
+    for _, result, part_failure, _ in parts:
+        if part_failure is not None:
+            failure = failure or part_failure
+            continue
+        part_results, part_msgs, part_stats, snapshot = result
+        results += part_results
+        msg_list += part_msgs
+        for key, n in part_stats.items():
+            stats[key] += n
+        metrics.merge(snapshot)
+        frames += snapshot.get("frames", [])
+    metrics.frames = frames
+    result = (results, msg_list, stats, metrics.snapshot())
+    # Segments run side by side: the slowest one is the video's wall-clock time
+    elapsed = max(part[3] for part in parts)
+    if failure is not None and not results:
+        result = None
+    return result, failure, elapsed
+
+def changed_entries(input_folder, paths):
+    # Changed paths from the watcher -> (entries to index, removed paths). A folder
+    # that appeared is scanned as a whole; a path that is gone may be a whole folder.
+    entries, removed = {}, []
+    for rel_path in paths:
+        abs_path = os.path.join(input_folder, rel_path)
+        if os.path.isdir(abs_path):
+            entries.update((e[1], e) for e in scan_files(input_folder, rel_path))
+            continue
+        try:
+            st = os.stat(abs_path)
+        except FileNotFoundError:
+            removed.append(rel_path)
+            continue
+        filetype = get_filetype(rel_path)
+        if filetype is not None and os.path.isfile(abs_path):
+            entries[rel_path] = (filetype, rel_path, st)
+    return list(entries.values()), removed
+
+def run_inline(func, tasks):
+    # Same output as IsolatedPool.imap, in this process and without limits
+    for task in tasks:
+        t0 = time.monotonic()
+        result = func(*task)
+        yield task, result, None, time.monotonic() - t0
+
+def main(input_folder, lang="eng", frame_interval=5, workers=1, gop=None,
+         dedup_threshold=DEFAULT_DEDUP_THRESHOLD, pdf_dpi=DEFAULT_PDF_DPI,
+         ocr_backend="auto", ocr_batch=DEFAULT_OCR_BATCH, db_path=None, timeout=DEFAULT_TIMEOUT,
+         video_timeout=DEFAULT_VIDEO_TIMEOUT, pdf_page_timeout=DEFAULT_PDF_PAGE_TIMEOUT,
+         max_memory_mb=DEFAULT_MAX_MEMORY_MB, image_prep=None,
+         watch=False, poll=False, debounce=DEFAULT_DEBOUNCE, poll_interval=DEFAULT_POLL_INTERVAL,
+         cache_path=None, cache_mb=DEFAULT_CACHE_MB, no_cache=False, metrics_path=None,
+         file_metrics_path=None, profile_path=None, shard=None, pack=False, video_segment=DEFAULT_VIDEO_SEGMENT, extractors=None):
+    # Extra file types (--extractors), registered before the scan; workers load them too
+    extractors = list(extractors or [])
+    load_extractors(extractors)
+    # Timings and counters of the whole run; extraction metrics come back from the
+    # workers with each file
+    run_metrics = Metrics()
+    t_start = time.perf_counter()
+    profiler = None
+    if profile_path:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    # --pack: compacted into the packed binary index.pack instead of index.json
+    index_file = os.path.join(input_folder, "index.pack" if pack else "index.json")
     log_file = os.path.join(input_folder, "ocr_log.txt")
+    # --shard i/N: only the files that hash to shard i, written to outputs of their
+    # own (index.shard-i-of-N.json, ...) that shards.py merges
+    if shard is not None:
+        index_file, log_file = shard_path(index_file, *shard), shard_path(log_file, *shard)
+        db_path = db_path and shard_path(db_path, *shard)
+        print(f"🧩 Shard {shard[0]}/{shard[1]}")
+    # With --db the SQLite database replaces index.json (+ segments) as the store
+    db = IndexDB(db_path) if db_path else None
+    output = db_path or index_file
+    manifest_file = os.path.splitext(output)[0] + ".manifest.json"
+    quarantine_file = os.path.splitext(output)[0] + ".quarantine.json"
+    # Options that change the extracted records; all shards must agree on them
+    shard_params = {"lang": lang, "interval": frame_interval, "dedup_threshold": dedup_threshold, "pdf_dpi": pdf_dpi,
+                    "image_prep": DEFAULT_IMAGE_PREP if image_prep is None else image_prep, "extractors": extractors}
 
-    # Resume logic with KeyError protection
-    if os.path.exists(index_file):
-        with open(index_file, "r", encoding="utf-8") as f:
-            index_data = json.load(f)
+    def shard_info(status, n_entries=None):
+        if shard is not None:
+            store = "sqlite" if db is not None else "pack" if pack else "json"
+            write_shard_info(output, shard, store, shard_params, status, n_entries)
+    shard_info(RUNNING)
+
+    # Resume logic with KeyError protection. Streams index.json plus any segments
+    # left by an interrupted run (or the database rows), keeping only the keys in memory.
+    # Keys are grouped by path, so a tombstone drops its path's keys in one step
+    t0 = time.perf_counter()
+    done_by_path = {}     # path -> {type}
+    frames_by_path = {}   # video path -> {frame_id}
+    bad_rows = 0
+    indexed = db.iter_records(with_text=False) if db is not None else iter_index_records(index_file, with_text=False)
+    for item in indexed:
+        if item.get("type") == TOMBSTONE:
+            path = item.get("filename")
+            done_by_path.pop(path, None)
+            frames_by_path.pop(path, None)
+            continue
         # Cảnh báo dòng lỗi
-        bad_rows = [i for i, item in enumerate(index_data) if "type" not in item or "filename" not in item]
-        if bad_rows:
-            print(f"⚠️ Warning: {len(bad_rows)} bad rows in index.json! They will be ignored.")
+        if "type" not in item or "filename" not in item:
+            bad_rows += 1
         # Resume logic an toàn
-        done = {
-            (item.get("type"), item.get("filename", ""))
-            for item in index_data
-            if item.get("type") not in [None, "video"]
-        }
-        done_videos = set(item.get("frame_id") for item in index_data if item.get("type") == "video")
-        results = index_data
+        if item.get("type") == "video":
+            frame_id = item.get("frame_id")
+            if frame_id is not None:
+                frames_by_path.setdefault(frame_id.rsplit("|", 1)[0], set()).add(frame_id)
+        elif item.get("type") is not None:
+            done_by_path.setdefault(item.get("filename", ""), set()).add(item.get("type"))
+    done = {(filetype, path) for path, types in done_by_path.items() for filetype in types}
+    done_videos = {fid for fids in frames_by_path.values() for fid in fids}
+    run_metrics.add_time("resume", time.perf_counter() - t0)
+    if bad_rows:
+        print(f"⚠️ Warning: {bad_rows} bad rows in index.json! They will be ignored.")
+    if done or done_videos:
         print(f"🟩 Resume mode: {len(done)} files, {len(done_videos)} video frames done.")
-    else:
-        done = set()
-        done_videos = set()
-        results = []
 
     log_mode = "a" if os.path.exists(log_file) else "w"
     log = open(log_file, log_mode, encoding="utf-8")
+    writer = db if db is not None else IndexWriter(index_file)
+    n_written = 0
+    # Per-file metrics, one JSON line per file (--file-metrics)
+    file_metrics = open(file_metrics_path, "a", encoding="utf-8") if file_metrics_path else None
 
-    # Process each type
-    for filetype in EXT_MAP:
-        file_exts = EXT_MAP[filetype]
-        file_list = find_files_recursive(input_folder, file_exts)
-        # Skip videos here, handle separately
-        if filetype == "video":
-            continue
-        new_files = [f for f in file_list if (filetype, f) not in done]
-        if not new_files:
-            continue
-        for rel_path in tqdm(new_files, desc=f"OCR {filetype.upper()}"):
-            abs_path = os.path.join(input_folder, rel_path)
-            try:
-                text = EXTRACT_FUNCS[filetype](abs_path)
-                results.append({
-                    "type": filetype,
-                    "filename": rel_path,
-                    "text": text
-                })
-                msg = f"[OK] {rel_path}"
-            except Exception as e:
-                msg = f"[ERR] {rel_path}: {e}"
-            print(msg)
-            log.write(msg + "\n")
-
-    # OCR all videos (frame-by-frame)
-    video_files = find_files_recursive(input_folder, EXT_MAP["video"])
-    for rel_video in video_files:
-        video_results, msg_list = ocr_video(
-            rel_video, input_folder, lang=lang,
-            frame_interval=frame_interval, done_set=done_videos
-        )
-        results.extend(video_results)
-        for m in msg_list:
-            print(m)
-            log.write(m + "\n")
+    # State carried from pass to pass (the initial scan, then each batch of changes
+    # in --watch mode): paths with records in the index and the manifest
+    indexed_paths = {path for _, path in done} | {fid.rsplit("|", 1)[0] for fid in done_videos}
+    manifest = load_manifest(manifest_file)
+    # Files that hung, crashed or ran out of memory: skipped until they change
+    # {rel_path: {"size", "mtime_ns", "reason", "elapsed"}}
+    quarantine = load_manifest(quarantine_file)
 
-    log.close()
+    def is_quarantined(rel_path, st):
+        entry = quarantine.get(rel_path)
+        if entry is None:
+            return False
+        if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return True
+        del quarantine[rel_path]
+        return False
+
+    def handle_output(filetype, rel_path, result, failure, elapsed):
+        # (results, msgs) of one file; failures that quarantine the file are recorded,
+        # the time spent is added to the file's last log line and its metrics to the run
+        snapshot = result[-1] if failure is None else {}
+        run_metrics.merge(snapshot)
+        run_metrics.count("files_ok" if failure is None else "files_failed")
+        if file_metrics is not None:
+            file_metrics.write(json.dumps({"file": rel_path, "type": filetype, "elapsed_s": round(elapsed, 6),
+                                           "failure": failure and failure[0], **snapshot}) + "\n")
+        if failure is None:
+            file_results, msg_list = result[:2]
+        else:
+            kind, reason = failure
+            run_metrics.count(f"failures_{kind}")
+            if kind != ERROR:
+                # The worker was killed or died and has been replaced
+                run_metrics.count("worker_restarts")
+            file_results, msg_list = [], [f"[ERR] {rel_path}: {reason}"]
+            if kind in QUARANTINE_FAILURES:
+                try:
+                    st = os.stat(os.path.join(input_folder, rel_path))
+                except OSError:
+                    # Deleted or moved while it was being extracted: nothing to quarantine
+                    st = None
+                if st is not None:
+                    quarantine[rel_path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                            "reason": reason, "elapsed": round(elapsed, 1)}
+                    save_manifest(quarantine_file, quarantine)
+                    msg_list = [f"[QUARANTINE] {rel_path}: {reason}, skipped until it changes"]
+        if msg_list:
+            msg_list[-1] += f" [{elapsed:.2f}s]"
+        return file_results, msg_list
+
+    def write(record):
+        nonlocal n_written
+        with run_metrics.stage("write"):
+            writer.write(record)
+        # Tombstones only drop records, they are not new entries
+        if record.get("type") != TOMBSTONE:
+            n_written += 1
+
+    def emit(msg):
+        print(msg)
+        log.write(msg + "\n")
+
+    # Extraction runs in worker processes under the time/memory limits; without limits
+    # and with a single worker (or when profiling) it stays in this process
+    pool = None
+    if profiler is not None:
+        print("🔬 Profiling: extraction runs in this process, without workers or time/memory limits")
+    elif workers > 1 or timeout or video_timeout or max_memory_mb:
+        pool = IsolatedPool(workers, timeout=timeout, max_memory_mb=max_memory_mb,
+                            initializer=load_extractors, initargs=(extractors,))
 
-    with open(index_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-    print(f"\n✅ Index saved to: {index_file} ({len(results)} entries)")
+    def file_timeout(task):
+        # Budget of one file in the pool: PDFs scale with their page count, the rest
+        # (and PDFs served from the cache) get --timeout
+        filetype, rel_path, *_, cached = task
+        if filetype != "pdf" or cached is not None or not pdf_page_timeout:
+            return None
+        with run_metrics.stage("pdf_info"):
+            n_pages = pdf_page_count(os.path.join(input_folder, rel_path), timeout=PDF_INFO_TIMEOUT)
+        return timeout + n_pages * pdf_page_timeout if n_pages else None
+
+    # Shared OCR cache, consulted before a file is handed to the extractor
+    cache = None if no_cache else OcrCache(cache_path, cache_mb)
+    cache_params = {
+        "image": {"prep": DEFAULT_IMAGE_PREP if image_prep is None else image_prep},
+        "pdf": {"dpi": pdf_dpi, "min_text_chars": PDF_MIN_TEXT_CHARS},
+        "video": {"interval": frame_interval, "dedup_threshold": dedup_threshold, "dedup": "tile"},
+    }
+
+    def run_pass(entries, removed=None):
+        # Indexes (filetype, rel_path, stat) entries. removed=None means entries is the
+        # full scan and anything indexed but not in it was deleted; otherwise removed
+        # lists deleted paths (files or whole folders). Returns the number of files
+        # processed, copied or deleted.
+        nonlocal manifest
+        planner = IncrementalPlanner(input_folder, manifest, indexed_paths)
+        copies = []
+        video_files = []
+        dropped = set()
+        n_quarantined = 0
+        cache_keys = {}
+
+        def lookup(filetype, rel_path):
+            # Cached records for the file's content, or None (and the key to store under)
+            if cache is None or filetype not in CACHED_TYPES:
+                return None
+            with run_metrics.stage("cache"):
+                digest = planner.pending[rel_path]["hash"] or hash_file(os.path.join(input_folder, rel_path))
+                key = cache_key(digest, filetype, lang, cache_params[filetype])
+                cached = cache.get(key)
+            if cached is None:
+                run_metrics.count("cache_misses")
+                cache_keys[rel_path] = key
+            else:
+                run_metrics.count("cache_hits")
+            return cached
+
+        def store(filetype, rel_path, results, complete):
+            # Complete results only: a PDF with a failed page or a video with a frame
+            # whose OCR failed is retried next time, and must not be served to copies
+            key = cache_keys.pop(rel_path, None)
+            if key is None or not results or not complete:
+                return
+            with run_metrics.stage("cache"):
+                cache.put(key, results, extractor=filetype)
+
+        def scanned_tasks():
+            # Feeds the extraction stage straight from the scan, so OCR starts before
+            # the walk finishes. Videos and content copies are handled after the scan.
+            nonlocal n_quarantined
+            for filetype, rel_path, st in entries:
+                if is_own_file(rel_path):
+                    continue
+                if shard is not None and shard_of(rel_path, shard[1]) != shard[0]:
+                    continue
+                if is_quarantined(rel_path, st):
+                    n_quarantined += 1
+                    # Keeps its old records (if any) instead of being treated as deleted
+                    planner.seen.add(rel_path)
+                    continue
+                # Stat check, and hashing of files that changed
+                with run_metrics.stage("plan"):
+                    action, src, stale = planner.classify(filetype, rel_path, st)
+                if stale:
+                    # Drop the old records before the new ones are written
+                    write({"type": TOMBSTONE, "filename": rel_path})
+                    dropped.add(rel_path)
+                    if filetype == "video":
+                        done_videos.difference_update([fid for fid in done_videos if fid.rsplit("|", 1)[0] == rel_path])
+                if action == planner.COPY:
+                    copies.append((filetype, rel_path, src))
+                elif action == planner.PROCESS:
+                    if filetype == "video":
+                        video_files.append(rel_path)
+                    else:
+                        yield (filetype, rel_path, input_folder, lang, pdf_dpi, ocr_backend, ocr_batch, image_prep,
+                               lookup(filetype, rel_path))
+
+        if pool is not None:
+            outputs = pool.imap(process_file, scanned_tasks(), task_timeout=file_timeout)
+        else:
+            outputs = run_inline(process_file, scanned_tasks())
+        # Watch batches are small, their [OK] lines are progress enough
+        for (filetype, rel_path, *_), result, failure, elapsed in tqdm(outputs, desc="OCR files", unit="file", disable=removed is not None):
+            file_results, msg_list = handle_output(filetype, rel_path, result, failure, elapsed)
+            complete = not any(m.startswith("[ERR]") for m in msg_list)
+            store(filetype, rel_path, file_results, complete)
+            for record in file_results:
+                write(record)
+            # Failed files stay out of the manifest so the next run retries them; a PDF
+            # with a failed page is kept but marked incomplete, and redone next run
+            if file_results:
+                planner.commit(rel_path, complete)
+            for m in msg_list:
+                emit(m)
+
+        if removed is None:
+            deleted = planner.deleted()
+        else:
+            known = set(manifest) | indexed_paths
+            deleted = sorted(p for p in known if any(p == r or p.startswith(r + os.sep) for r in removed))
+
+        # Moved/copied files reuse the records of the same content as of the start of the run
+        source_paths = {src for _, _, src in copies}
+        if db is not None:
+            sources = db.collect_records(source_paths)
+        else:
+            sources = collect_records(index_file, source_paths, exclude_segment=writer.path)
+        for filetype, rel_path, src in copies:
+            for item in sources[src]:
+                write(retarget_record(item, filetype, rel_path))
+            emit(f"[OK] {rel_path} (same content as {src})")
+
+        # After the copies: a moved file's records are read from its old path first
+        for rel_path in deleted:
+            write({"type": TOMBSTONE, "filename": rel_path})
+            log.write(f"[DEL] {rel_path}\n")
+
+        n_changes = planner.counts['process'] + planner.counts['copy'] + len(deleted)
+        if removed is None or n_changes:
+            print(f"🟩 Incremental: {planner.counts['unchanged']} unchanged, {planner.counts['process']} processed, "
+                  f"{planner.counts['copy']} reused by content, {len(deleted)} deleted, {n_quarantined} quarantined.")
+
+        # OCR all videos (frame-by-frame). With several workers a long video is split
+        # into time segments that run side by side; their outputs come back in
+        # submission order and are merged per video before anything is written.
+        video_stats = {"frames": 0, "ocr_calls": 0, "ocr_skipped": 0, "ocr_errors": 0}
+        done_by_video = {}
+        for fid in done_videos:
+            done_by_video.setdefault(fid.rsplit("|", 1)[0], set()).add(fid)
+        n_segments = {}
+
+        # Segments are planned in the pool as well: opening a broken video or probing
+        # its keyframes can hang or run out of memory just like OCR. A plan that fails
+        # leaves the video in one segment, whose task then fails under the usual limits.
+        plans = {}
+        if pool is not None and pool.workers > 1 and video_segment > 0 and video_files:
+            plan_tasks = [(rel_video, input_folder, frame_interval, gop, pool.workers, video_segment)
+                          for rel_video in video_files]
+            with run_metrics.stage("plan"):
+                for task, plan, failure, _ in pool.imap(plan_video_segments, plan_tasks, timeout=PLAN_TIMEOUT):
+                    if failure is None:
+                        plans[task[0]] = plan
+                    else:
+                        emit(f"⚠️ Warning: cannot plan segments of {task[0]} ({failure[1]}), it runs as one")
+
+        def video_tasks():
+            for rel_video in video_files:
+                # Only videos started from scratch use the cache; resumed ones fill their missing frames
+                cached = None
+                if rel_video not in done_by_video and planner.pending[rel_video]["hash"] is not None:
+                    cached = lookup("video", rel_video)
+                video_gop, segments = gop, [(0, None)]
+                if cached is None:
+                    video_gop, segments = plans.get(rel_video, (gop, [(0, None)]))
+                n_segments[rel_video] = len(segments)
+                for segment in segments:
+                    yield (rel_video, input_folder, lang, frame_interval, done_by_video.get(rel_video, set()), video_gop,
+                           dedup_threshold, ocr_backend, ocr_batch, cached, segment)
+
+        if pool is not None:
+            outputs = pool.imap(process_video, video_tasks(), timeout=video_timeout, max_inflight=pool.workers)
+        else:
+            outputs = run_inline(process_video, video_tasks())
+        parts = []
+        for task, result, failure, elapsed in outputs:
+            rel_video = task[0]
+            parts.append((task[-1], result, failure, elapsed))
+            if len(parts) < n_segments[rel_video]:
+                continue
+            result, failure, elapsed = merge_video_parts(parts)
+            parts = []
+            video_results, msg_list = handle_output("video", rel_video, result, failure, elapsed)
+            # Missing trailing frames ("Frame Ns not found") are normal; OCR errors are not
+            complete = failure is None and not result[2]["ocr_errors"]
+            store("video", rel_video, video_results, complete)
+            if failure is not None and result is not None:
+                # Frames of the segments that finished are kept; a retry only does the rest
+                video_results = result[0]
+                msg_list = result[1] + msg_list
+            if result is not None:
+                for key, n in result[2].items():
+                    video_stats[key] += n
+            for record in video_results:
+                write(record)
+                done_videos.add(record["frame_id"])
+            writer.sync()
+            # Legacy entries (hash None) were already indexed; new videos that failed are retried.
+            # Frames whose OCR failed are missing from the index: the entry is marked
+            # incomplete, so the next run resumes the video and OCRs just those frames.
+            if video_results or planner.pending[rel_video]["hash"] is None:
+                planner.commit(rel_video, complete)
+            for m in msg_list:
+                emit(m)
+
+        if video_stats["frames"]:
+            emit(f"[OK] Video frames: {video_stats['frames']}, OCR calls: {video_stats['ocr_calls']}, "
+                 f"skipped as unchanged: {video_stats['ocr_skipped']}, OCR errors: {video_stats['ocr_errors']}")
+
+        # Carry the outcome over to the next pass
+        if removed is None:
+            manifest = dict(planner.entries)
+        else:
+            manifest = {p: e for p, e in manifest.items() if p not in dropped and p not in deleted}
+            manifest.update(planner.entries)
+        indexed_paths.difference_update(dropped)
+        indexed_paths.difference_update(deleted)
+        indexed_paths.update(planner.entries)
+        return n_changes
+
+    def save():
+        # Makes everything written so far visible to search; returns the entry count
+        nonlocal writer
+        log.flush()
+        if file_metrics is not None:
+            file_metrics.flush()
+        if metrics_path:
+            write_metrics(metrics_path, run_metrics, time.perf_counter() - t_start)
+        with run_metrics.stage("save"):
+            save_manifest(manifest_file, manifest)
+            if db is not None:
+                db.begin_run()
+                n_entries = len(db)
+            else:
+                writer.close()
+                n_entries = compact_index(index_file)
+                writer = IndexWriter(index_file)
+        shard_info(WATCHING, n_entries)
+        return n_entries
+
+    def watched(rel_path, is_dir):
+        # Events worth waking up for: supported files and folders, not our own output
+        if is_dir:
+            return True
+        if get_filetype(rel_path) is None or is_own_file(rel_path):
+            return False
+        return shard is None or shard_of(rel_path, shard[1]) == shard[0]
+
+    def snapshot():
+        # Polling fallback: {rel_path: (size, mtime)} of every supported file
+        return {rel_path: (st.st_size, st.st_mtime_ns) for _, rel_path, st in scan_files(input_folder)
+                if watched(rel_path, False)}
+
+    try:
+        run_pass(run_metrics.timed_iter("scan", scan_files(input_folder)))
+        if watch:
+            n_entries = save()
+            print(f"\n✅ Index saved ({n_entries} entries). 👀 Watching {input_folder} for changes (Ctrl+C to stop)...")
+            for batch in watch_changes(input_folder, accept=watched, snapshot=snapshot, debounce=debounce,
+                                       poll_interval=poll_interval, polling=poll):
+                entries, removed = changed_entries(input_folder, batch)
+                if run_pass(entries, removed):
+                    n_entries = save()
+                    print(f"✅ Index updated ({n_entries} entries)")
+    except KeyboardInterrupt:
+        if not watch:
+            raise
+        print("\n🛑 Stopped watching.")
+    finally:
+        if pool is not None:
+            pool.close()
+    with run_metrics.stage("save"):
+        save_manifest(manifest_file, manifest)
+        if db is not None:
+            db.sync()
+            n_entries, saved_to = len(db), db_path
+            db.close()
+        else:
+            writer.close()
+            n_entries, saved_to = compact_index(index_file), index_file
+    shard_info(DONE, n_entries)
+    print(f"\n✅ Index saved to: {saved_to} ({n_entries} entries, {n_written} new)")
+    if cache is not None:
+        print(f"🗃️ OCR cache: {cache.summary()}")
+        cache.close()
+
+    wall = time.perf_counter() - t_start
+    for line in summary_lines(run_metrics, wall):
+        emit(line)
+    log.close()
+    if file_metrics is not None:
+        file_metrics.close()
+    if metrics_path:
+        write_metrics(metrics_path, run_metrics, wall)
+        print(f"📈 Metrics: {metrics_path}")
+    if profiler is not None:
+        import pstats
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+        print(f"🔬 Profile saved to: {profile_path} (python -m pstats {profile_path}, or snakeviz)")
     print(f"📄 Log file: {log_file}")
 
 if __name__ == "__main__":
@@ -252,5 +983,49 @@ if __name__ == "__main__":
     parser.add_argument('-i', '--input', required=True, help="Input folder containing files")
     parser.add_argument('--lang', default="eng", help="Tesseract language code (default: eng)")
     parser.add_argument('--interval', type=int, default=5, help="Seconds between video frames (default: 5)")
+    parser.add_argument('--gop', type=int, default=None, help="Video keyframe interval in frames; samples more than 2x this apart are reached by seeking (default: probed per video)")
+    parser.add_argument('--video-segment', type=int, default=DEFAULT_VIDEO_SEGMENT,
+                        help=f"With --workers > 1: split videos into time segments of at least this many seconds, OCR'd in parallel; 0 = one worker per video (default: {DEFAULT_VIDEO_SEGMENT})")
+    parser.add_argument('--dedup-threshold', type=int, default=DEFAULT_DEDUP_THRESHOLD,
+                        help=f"Max per-tile brightness difference (0-255) to a previous frame to reuse its OCR text; -1 disables (default: {DEFAULT_DEDUP_THRESHOLD})")
+    parser.add_argument('--pdf-dpi', type=int, default=DEFAULT_PDF_DPI, help=f"DPI for rendering PDF pages that need OCR (default: {DEFAULT_PDF_DPI})")
+    parser.add_argument('--ocr-backend', default="auto", choices=["auto"] + list(OCR_BACKENDS),
+                        help="OCR engine: tesserocr (in-process), batch (one tesseract run per batch) or pytesseract; auto = tesserocr if installed, else pytesseract")
+    parser.add_argument('--ocr-batch', type=int, default=DEFAULT_OCR_BATCH, help=f"Video frames / PDF pages per OCR batch (default: {DEFAULT_OCR_BATCH})")
+    parser.add_argument('--db', help="Write to this SQLite/FTS5 database instead of <input>/index.json (see index_db.py for import/export)")
+    parser.add_argument('--pack', action='store_true', help="Write <input>/index.pack (compact binary index, see index_pack.py) instead of index.json")
+    parser.add_argument('--workers', type=int, default=1, help="Parallel worker processes for images/PDF/documents and video segments (default: 1)")
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help=f"Seconds allowed per image/PDF/document before it is killed and quarantined; 0 = no limit (default: {DEFAULT_TIMEOUT})")
+    parser.add_argument('--pdf-page-timeout', type=int, default=DEFAULT_PDF_PAGE_TIMEOUT, help=f"Seconds added to --timeout per PDF page; 0 = flat --timeout (default: {DEFAULT_PDF_PAGE_TIMEOUT})")
+    parser.add_argument('--video-timeout', type=int, default=DEFAULT_VIDEO_TIMEOUT, help=f"Seconds allowed per video (per segment of a split video); 0 = no limit (default: {DEFAULT_VIDEO_TIMEOUT})")
+    parser.add_argument('--max-memory-mb', type=int, default=DEFAULT_MAX_MEMORY_MB, help=f"Address-space limit per worker process in MB, not enforced on Windows; 0 = no limit (default: {DEFAULT_MAX_MEMORY_MB})")
+    parser.add_argument('--max-side', type=int, default=DEFAULT_MAX_SIDE, help=f"Images larger than this (px, longest side) are scaled down before OCR; 0 = never (default: {DEFAULT_MAX_SIDE})")
+    parser.add_argument('--target-dpi', type=int, default=DEFAULT_TARGET_DPI, help=f"Images scanned above this DPI are scaled down to it before OCR; 0 = never (default: {DEFAULT_TARGET_DPI})")
+    parser.add_argument('--no-triage', action='store_true', help="OCR every image, even blank ones or ones without any sharp edges")
+    parser.add_argument('--ocr-gray', action='store_true', help="Convert images to grayscale before OCR")
+    parser.add_argument('--ocr-binarize', action='store_true', help="Binarize images (Otsu threshold) before OCR")
+    parser.add_argument('--watch', action='store_true', help="After indexing, keep running and index new, changed and deleted files as they appear")
+    parser.add_argument('--poll', action='store_true', help="With --watch: poll the folder instead of using filesystem events (network drives)")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE, help=f"With --watch: seconds a file must stay unchanged before it is indexed (default: {DEFAULT_DEBOUNCE})")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help=f"With --watch --poll: seconds between scans (default: {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument('--ocr-cache', default=None, help="OCR result cache shared by all indexers and folders (default: $MEDIA_OCR_CACHE or ~/.cache/media-ocr-index/ocr_cache.sqlite)")
+    parser.add_argument('--ocr-cache-mb', type=float, default=DEFAULT_CACHE_MB, help=f"Size limit of the OCR cache; least recently used results are evicted (default: {DEFAULT_CACHE_MB})")
+    parser.add_argument('--no-ocr-cache', action='store_true', help="Neither read nor fill the OCR cache")
+    parser.add_argument('--metrics', help="Write run metrics (time per stage, counters) to this file: Prometheus text format for .prom/.txt, JSON otherwise")
+    parser.add_argument('--file-metrics', help="Append per-file metrics (stages, counters, per-frame times for videos) to this JSON-lines file")
+    parser.add_argument('--shard', type=parse_shard, help="Index only shard i of N (e.g. 2/4), to split a folder between machines; merge the outputs with shards.py")
+    parser.add_argument('--extractors', type=lambda s: [m.strip() for m in s.split(",") if m.strip()], default=[],
+                        help="Comma-separated modules (names or .py files) that register extra file types with register_extractor")
+    parser.add_argument('--profile', help="Profile the run with cProfile and save the stats to this file (extraction then runs in-process)")
     args = parser.parse_args()
-    main(args.input, lang=args.lang, frame_interval=args.interval)
+    image_prep = {"max_side": args.max_side, "target_dpi": args.target_dpi, "triage": not args.no_triage,
+                  "gray": args.ocr_gray, "binarize": args.ocr_binarize}
+    main(args.input, lang=args.lang, frame_interval=args.interval, workers=args.workers, gop=args.gop,
+         dedup_threshold=args.dedup_threshold, pdf_dpi=args.pdf_dpi,
+         ocr_backend=args.ocr_backend, ocr_batch=args.ocr_batch, db_path=args.db, timeout=args.timeout,
+         video_timeout=args.video_timeout, pdf_page_timeout=args.pdf_page_timeout,
+         max_memory_mb=args.max_memory_mb, image_prep=image_prep,
+         watch=args.watch, poll=args.poll, debounce=args.debounce, poll_interval=args.poll_interval,
+         cache_path=args.ocr_cache, cache_mb=args.ocr_cache_mb, no_cache=args.no_ocr_cache,
+         metrics_path=args.metrics, file_metrics_path=args.file_metrics, profile_path=args.profile,
+         shard=args.shard, pack=args.pack, video_segment=args.video_segment, extractors=args.extractors)
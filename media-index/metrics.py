@@ -0,0 +1,113 @@
+import os
+import re
+import json
+import time
+from contextlib import contextmanager
+
+# Per-stage timings and counters. Extraction code records into `task`, the metrics of
+# the file being extracted in this process (reset per file, returned to the parent
+# with the result); the indexer merges them into one Metrics for the whole run and
+# adds its own stages (scan, plan, cache, write). Stages are wall-clock seconds and
+# call counts; counters are plain numbers (bytes read, pixels OCR'd, frames, ...).
+
+class Metrics:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.stages = {}     # name -> [seconds, calls]
+        self.counters = {}   # name -> number
+        self.frames = []     # [second, ms spent before OCR, OCR'd] per video frame
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t0)
+
+    def add_time(self, name, seconds, calls=1):
+        entry = self.stages.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += calls
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def timed_iter(self, name, iterable):
+        # Charges the time spent producing each item (e.g. a directory walk) to `name`
+        it = iter(iterable)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.add_time(name, time.perf_counter() - t0, calls=0)
+                return
+            self.add_time(name, time.perf_counter() - t0)
+            yield item
+
+    def snapshot(self):
+        snap = {"stages": {k: [round(s, 6), n] for k, (s, n) in self.stages.items()}, "counters": dict(self.counters)}
+        if self.frames:
+            snap["frames"] = list(self.frames)
+        return snap
+
+    def merge(self, snap):
+        for name, (seconds, calls) in snap.get("stages", {}).items():
+            self.add_time(name, seconds, calls)
+        for name, n in snap.get("counters", {}).items():
+            self.count(name, n)
+
+# Metrics of the extraction running in this process
+task = Metrics()
+
+def human(n):
+    for unit in ("", "K", "M", "G", "T"):
+        if abs(n) < 1000:
+            return f"{n:.3g}{unit}"
+        n /= 1000
+    return f"{n:.3g}P"
+
+def summary_lines(metrics, wall):
+    # Text summary: stages by time (share of the wall-clock time; extraction stages
+    # add up over all workers), then counters
+    lines = [f"📊 Run time {wall:.1f}s, by stage:"]
+    for name, (seconds, calls) in sorted(metrics.stages.items(), key=lambda kv: -kv[1][0]):
+        share = seconds / wall if wall else 0.0
+        per_call = f"{seconds / calls * 1000:.1f} ms/call" if calls else ""
+        lines.append(f"   {name:<10} {seconds:>9.2f}s {share:>6.0%} {calls:>8} calls  {per_call}")
+    if metrics.counters:
+        lines.append("📊 " + ", ".join(f"{name} {human(n)}" for name, n in sorted(metrics.counters.items())))
+    return lines
+
+def prometheus_text(metrics, wall, prefix="media_index"):
+    # Prometheus text exposition format (e.g. for node_exporter's textfile collector)
+    def name(s):
+        return re.sub(r"[^a-zA-Z0-9_]", "_", s)
+    lines = [
+        f"# HELP {prefix}_run_seconds Wall-clock time of the run.",
+        f"# TYPE {prefix}_run_seconds gauge",
+        f"{prefix}_run_seconds {wall:.6f}",
+        f"# HELP {prefix}_stage_seconds_total Time spent per stage.",
+        f"# TYPE {prefix}_stage_seconds_total counter",
+    ]
+    lines += [f'{prefix}_stage_seconds_total{{stage="{k}"}} {s:.6f}' for k, (s, _) in sorted(metrics.stages.items())]
+    lines += [f"# HELP {prefix}_stage_calls_total Calls per stage.", f"# TYPE {prefix}_stage_calls_total counter"]
+    lines += [f'{prefix}_stage_calls_total{{stage="{k}"}} {n}' for k, (_, n) in sorted(metrics.stages.items())]
+    for k, n in sorted(metrics.counters.items()):
+        lines += [f"# TYPE {prefix}_{name(k)}_total counter", f"{prefix}_{name(k)}_total {n}"]
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path, metrics, wall):
+    # .prom / .txt: Prometheus text format, anything else: JSON. Replaced atomically,
+    # so a collector never reads a half-written file.
+    if path.endswith((".prom", ".txt")):
+        data = prometheus_text(metrics, wall)
+    else:
+        data = json.dumps({"run_seconds": round(wall, 3), **metrics.snapshot()}, indent=2)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
@@ -0,0 +1,131 @@
+import os
+import subprocess
+import tempfile
+
+from metrics import task as task_metrics
+
+# OCR engines behind one interface: image_to_string(img) and images_to_strings(imgs).
+# pytesseract starts a tesseract process (and reloads the model) per image; the other
+# two backends keep the model loaded across many images. pytesseract is imported on
+# first use: it pulls in pandas when installed, which is slow to load.
+
+class PytesseractBackend:
+    name = "pytesseract"
+
+    def __init__(self, lang="eng"):
+        self.lang = lang
+
+    def image_to_string(self, img):
+        import pytesseract
+        return pytesseract.image_to_string(img, lang=self.lang)
+
+    def images_to_strings(self, imgs):
+        return [self.image_to_string(img) for img in imgs]
+
+    def close(self):
+        pass
+
+class TesserocrBackend(PytesseractBackend):
+    # In-process libtesseract binding (pip install tesserocr): the language model is
+    # loaded once per process and reused for every image
+    name = "tesserocr"
+
+    def __init__(self, lang="eng"):
+        import tesserocr
+        super().__init__(lang)
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def image_to_string(self, img):
+        self.api.SetImage(img)
+        return self.api.GetUTF8Text()
+
+    def close(self):
+        self.api.End()
+
+class TesseractBatchBackend(PytesseractBackend):
+    # tesseract's list-file mode: one process launch OCRs a whole batch of images,
+    # the txt renderer separates pages with form feeds
+    name = "batch"
+
+    def __init__(self, lang="eng", tesseract_cmd=None):
+        import pytesseract
+        super().__init__(lang)
+        self.tesseract_cmd = tesseract_cmd or pytesseract.pytesseract.tesseract_cmd
+
+    def images_to_strings(self, imgs):
+        if len(imgs) < 2:
+            return [self.image_to_string(img) for img in imgs]
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for i, img in enumerate(imgs):
+                path = os.path.join(tmp, f"{i:05d}.png")
+                img.save(path, compress_level=1)
+                paths.append(path)
+            list_file = os.path.join(tmp, "images.txt")
+            with open(list_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(paths) + "\n")
+            out = subprocess.run(
+                [self.tesseract_cmd, list_file, "stdout", "-l", self.lang],
+                capture_output=True, check=True
+            ).stdout.decode("utf-8", errors="ignore")
+        texts = out.split("\f")
+        if len(texts) == len(imgs) + 1 and not texts[-1].strip():
+            return texts[:-1]
+        # Older tesseract without page separators: cannot split reliably
+        return [self.image_to_string(img) for img in imgs]
+
+OCR_BACKENDS = {
+    "pytesseract": PytesseractBackend,
+    "tesserocr": TesserocrBackend,
+    "batch": TesseractBatchBackend,
+}
+
+_engines = {}
+
+def get_backend(name="auto", lang="eng"):
+    # One long-lived engine per (backend, lang) and per process, so pool workers
+    # keep their engine across files. "auto" prefers the in-process binding.
+    key = (name, lang)
+    if key not in _engines:
+        if name == "auto":
+            try:
+                _engines[key] = get_backend("tesserocr", lang)
+            except (ImportError, RuntimeError):
+                _engines[key] = get_backend("pytesseract", lang)
+        else:
+            _engines[key] = OCR_BACKENDS[name](lang=lang)
+    return _engines[key]
+
+class OcrBatch:
+    # Collects (record, image) pairs and OCRs them together, filling record["text"]
+    # (or record["error"]); lets batch backends see many images per launch
+    def __init__(self, backend, size=8):
+        self.backend = backend
+        self.size = max(1, size)
+        self.pending = []
+
+    def add(self, record, img):
+        self.pending.append((record, img))
+        if len(self.pending) >= self.size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        records = [record for record, _ in self.pending]
+        imgs = [img for _, img in self.pending]
+        self.pending = []
+        task_metrics.count("ocr_images", len(imgs))
+        task_metrics.count("pixels_ocr", sum(img.width * img.height for img in imgs))
+        try:
+            with task_metrics.stage("ocr"):
+                texts = self.backend.images_to_strings(imgs)
+        except MemoryError:
+            # Over the worker's memory cap: the pool quarantines the file
+            raise
+        except Exception as e:
+            for record in records:
+                record["error"] = str(e)
+            return
+        for record, text in zip(records, texts):
+            record["text"] = text.strip()
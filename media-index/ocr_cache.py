@@ -0,0 +1,45 @@
+import os
+import json
+import hashlib
+
+from index_store import hash_file
+from sqlite_lru import SqliteLru
+
+# Persistent OCR result cache shared by all indexers and input folders. Entries are
+# keyed on (content hash, extractor, lang, preprocessing params), so a screenshot or
+# PDF that shows up again in another folder costs one hash instead of an OCR pass.
+# The OCR backend is not part of the key: all of them run the same Tesseract engine.
+# Stored in SQLite (WAL, so several indexers can share it) and bounded by size:
+# the least recently used entries are evicted first (sqlite_lru.py).
+
+DEFAULT_CACHE_MB = 1024
+
+def default_cache_path():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("MEDIA_OCR_CACHE") or os.path.join(base, "media-ocr-index", "ocr_cache.sqlite")
+
+def cache_key(content_hash, extractor, lang, params=None):
+    params = json.dumps(params or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(f"{content_hash}|{extractor}|{lang}|{params}".encode("utf-8"), digest_size=16).hexdigest()
+
+def file_key(path, extractor, lang, params=None):
+    # cache_key() of a file's content, hashed like the incremental manifest does
+    return cache_key(hash_file(path), extractor, lang, params)
+
+class OcrCache(SqliteLru):
+    def __init__(self, path=None, max_mb=DEFAULT_CACHE_MB):
+        super().__init__(path or default_cache_path(), max_mb, "cache", "extractor TEXT, value TEXT NOT NULL")
+
+    def get(self, key):
+        value = self._get(key, "value")
+        return None if value is None else json.loads(value)
+
+    def put(self, key, value, extractor=None):
+        data = json.dumps(value, ensure_ascii=False)
+        self._put(key, len(data.encode("utf-8")), {"extractor": extractor, "value": data})
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        hit_rate = self.stats["hits"] / lookups if lookups else 0.0
+        return (f"{self.stats['hits']} hits, {self.stats['misses']} misses ({hit_rate:.0%} hit rate), "
+                f"{self.stats['evicted']} evicted, {len(self)} entries / {self.size() / (1 << 20):.1f} MB in {self.path}")
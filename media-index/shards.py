@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import platform
+
+from index_store import iter_compacted, write_json_array, record_key, load_manifest, save_manifest
+from index_pack import is_pack, write_pack
+from index_db import IndexDB, item_filename
+
+# Sharded indexing: `media_ocr_index.py --shard i/N` only indexes the files whose
+# relative path hashes to shard i, so N machines (or containers) can share one mount
+# and split the work without talking to each other. Each shard writes its own outputs
+# next to the unsharded ones (index.shard-2-of-4.json, its manifest, log and a
+# .shard.json info file); this script checks that all N are there, complete and
+# consistent, and merges them into the index an unsharded run would have written.
+
+# Info file status: "running" until the first save, "watching" for --watch runs
+# that saved at least once, "done" once the run is over
+RUNNING, WATCHING, DONE = "running", "watching", "done"
+
+SHARD_RE = re.compile(r"\.shard-(\d+)-of-(\d+)$")
+
+# Merge output extensions written as a database rather than index.json
+DB_EXTENSIONS = (".sqlite", ".sqlite3", ".db")
+
+def parse_shard(spec):
+    # "2/4" -> (2, 4); shards are numbered from 1
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec or "")
+    if not m or not 1 <= int(m.group(1)) <= int(m.group(2)):
+        raise argparse.ArgumentTypeError(f"expected i/N with 1 <= i <= N, got {spec!r}")
+    return int(m.group(1)), int(m.group(2))
+
+def shard_of(rel_path, count):
+    # Stable across runs, machines and platforms (unlike hash()): blake2b of the
+    # relative path with "/" separators, numbered from 1
+    digest = hashlib.blake2b(rel_path.replace(os.sep, "/").encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+def shard_path(path, index, count):
+    # index.json -> index.shard-2-of-4.json
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard-{index}-of-{count}{ext}"
+
+def info_path(output):
+    return os.path.splitext(output)[0] + ".shard.json"
+
+def write_shard_info(output, shard, store, params, status, n_entries=None):
+    # store: "json" or "sqlite"; params: the options that change what is extracted,
+    # which must be the same in all shards
+    info = {"shard": shard[0], "of": shard[1], "status": status, "entries": n_entries, "store": store, "params": params,
+            "host": platform.node(), "updated": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    tmp = info_path(output) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2, sort_keys=True)
+    os.replace(tmp, info_path(output))
+
+def find_shards(base):
+    # {(index, count): path} of the shard outputs of base (index.json or a database)
+    folder = os.path.dirname(os.path.abspath(base))
+    root, ext = os.path.splitext(os.path.basename(base))
+    found = {}
+    for name in os.listdir(folder):
+        name_root, name_ext = os.path.splitext(name)
+        if name_ext != ext or not name_root.startswith(root + "."):
+            continue
+        m = SHARD_RE.search(name_root)
+        if m and name_root[:m.start()] == root:
+            found[int(m.group(1)), int(m.group(2))] = os.path.join(folder, name)
+    return found
+
+def check_shards(base, partial=False):
+    # -> ({index: (path, info)}, count, problems, warnings). Missing or unfinished
+    # shards, shards of another split and shards made with other options are
+    # problems; with partial=True missing and unfinished ones are only warnings.
+    found = find_shards(base)
+    problems, warnings = [], []
+    if not found:
+        return {}, 0, [f"no shard outputs found for {base}"], warnings
+    counts = sorted({count for _, count in found})
+    if len(counts) > 1:
+        problems.append(f"shards of different splits: {', '.join(f'of {c}' for c in counts)}")
+    count = counts[-1]
+    shards = {}
+    for (index, n), path in sorted(found.items()):
+        if n != count:
+            continue
+        try:
+            with open(info_path(path), "r", encoding="utf-8") as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            problems.append(f"shard {index}/{count}: no info file ({info_path(path)}), not written by --shard")
+            continue
+        if (info.get("shard"), info.get("of")) != (index, count):
+            problems.append(f"shard {index}/{count}: info file says {info.get('shard')}/{info.get('of')}")
+            continue
+        if info.get("status") == RUNNING:
+            (warnings if partial else problems).append(
+                f"shard {index}/{count}: still running or interrupted (host {info.get('host')}, {info.get('updated')})")
+            if not partial:
+                continue
+        shards[index] = (path, info)
+    missing = [i for i in range(1, count + 1) if i not in shards and (i, count) not in found]
+    if missing:
+        (warnings if partial else problems).append(f"missing shards: {', '.join(f'{i}/{count}' for i in missing)}")
+    params = {json.dumps(info.get("params"), sort_keys=True) for _, info in shards.values()}
+    if len(params) > 1:
+        problems.append("shards were indexed with different options: " +
+                        "; ".join(f"{i}/{count} {json.dumps(info.get('params'), sort_keys=True)}"
+                                  for i, (_, info) in sorted(shards.items())))
+    return shards, count, problems, warnings
+
+def iter_shard(path, info):
+    # Saved records of one shard. Pending segments of an unfinished JSON/pack shard
+    # are not read: its last compacted index is the last consistent state.
+    if info.get("store") == "sqlite":
+        with IndexDB(path, readonly=True) as db:
+            yield from db.iter_records()
+    else:
+        yield from iter_compacted(path)
+
+def sort_key(item):
+    # Merged output order: by file, then page or second
+    position = item.get("page", item.get("second")) or 0
+    if not isinstance(position, (int, float)):
+        position = 0
+    return item_filename(item) or "", item.get("type") or "", position
+
+def merge_shards(base, output, to_db=False, partial=False, check_only=False):
+    # Merges the shard outputs of base into output (index.json, index.pack, or a
+    # database with to_db=True) plus merged manifest/quarantine files, so a later unsharded run
+    # resumes from it. Returns (entries written, problems); nothing is written if
+    # there are problems.
+    shards, count, problems, warnings = check_shards(base, partial)
+    for w in warnings:
+        print(f"⚠️ {w}")
+    if problems:
+        return 0, problems
+
+    # Pass 1: spill every record to a temporary JSONL file, keeping only the sort key,
+    # offset and a digest per record, so duplicates and conflicts can be found and the
+    # output sorted without holding the text in memory
+    spill_path = output + ".merge.tmp"
+    keys, seen = [], {}
+    n_dup = 0
+    with open(spill_path, "w+b") as spill:
+        for index, (path, info) in sorted(shards.items()):
+            n = 0
+            for item in iter_shard(path, info):
+                n += 1
+                filename = item_filename(item)
+                if filename is None or "type" not in item:
+                    continue
+                if shard_of(filename, count) != index:
+                    problems.append(f"shard {index}/{count}: {filename} belongs to shard {shard_of(filename, count)}/{count}")
+                    continue
+                line = json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n"
+                digest = hashlib.blake2b(json.dumps(item, sort_keys=True).encode("utf-8"), digest_size=16).digest()
+                key = record_key(item)
+                if key in seen:
+                    if seen[key] != digest:
+                        problems.append(f"shard {index}/{count}: conflicting records for {key}")
+                    n_dup += 1
+                    continue
+                seen[key] = digest
+                keys.append((sort_key(item), spill.tell()))
+                spill.write(line)
+            if info.get("status") != RUNNING and info.get("entries") is not None and n != info["entries"]:
+                problems.append(f"shard {index}/{count}: {n} entries, but its run saved {info['entries']} "
+                                f"(changed or truncated since)")
+        if problems or check_only:
+            os.remove(spill_path)
+            return len(keys), problems
+
+        # Pass 2: write in sorted order; the same shards always give the same output
+        keys.sort()
+        spill.flush()
+
+        def sorted_items():
+            for _, offset in keys:
+                spill.seek(offset)
+                yield json.loads(spill.readline())
+
+        tmp = output + ".tmp"
+        if is_pack(output) and not to_db:
+            write_pack(sorted_items(), output)
+        elif to_db:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            with IndexDB(tmp) as db:
+                for item in sorted_items():
+                    db.write(item)
+                db.sync()
+            os.replace(tmp, output)
+        else:
+            write_json_array(sorted_items(), output)
+    os.remove(spill_path)
+
+    # Manifests and quarantines are disjoint between shards
+    stem = os.path.splitext(output)[0]
+    for suffix in (".manifest.json", ".quarantine.json"):
+        merged = {}
+        for path, _ in shards.values():
+            merged.update(load_manifest(os.path.splitext(path)[0] + suffix))
+        save_manifest(stem + suffix, merged)
+    if n_dup:
+        print(f"⚠️ {n_dup} duplicate records dropped")
+    return len(keys), problems
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and merge the outputs of sharded runs (media_ocr_index.py --shard i/N)")
+    parser.add_argument('-i', '--input', required=True, help="Input folder the shards indexed")
+    parser.add_argument('--db', help="The shards were run with this --db; merge into that database")
+    parser.add_argument('--pack', action='store_true', help="The shards were run with --pack; merge into <input>/index.pack")
+    parser.add_argument('-o', '--output', help="Write the merged index here instead (.sqlite/.sqlite3/.db = database, .pack = packed index, else index.json)")
+    parser.add_argument('--partial', action='store_true', help="Merge even if shards are missing or still running (their last saved state)")
+    parser.add_argument('--check', action='store_true', help="Only check the shards, write nothing")
+    args = parser.parse_args()
+    base = args.db or os.path.join(args.input, "index.pack" if args.pack else "index.json")
+    output = args.output or base
+    to_db = output.endswith(DB_EXTENSIONS) if args.output else bool(args.db)
+    n, problems = merge_shards(base, output, to_db=to_db, partial=args.partial, check_only=args.check)
+    if problems:
+        for p in problems[:50]:
+            print(f"❌ {p}")
+        if len(problems) > 50:
+            print(f"❌ ... and {len(problems) - 50} more")
+        raise SystemExit(1)
+    if args.check:
+        print(f"✅ Shards OK: {n} entries")
+    else:
+        print(f"✅ Merged index saved to: {output} ({n} entries)")
@@ -0,0 +1,91 @@
+import os
+import time
+import sqlite3
+
+# Size-bounded key/value table in SQLite, the storage behind the OCR cache
+# (ocr_cache.py) and the app's preview cache. WAL, so several processes can share
+# one file; every row carries its size and last use, and once the total goes over
+# the limit the least recently used rows are evicted first.
+
+# Eviction goes a bit below the limit so it does not run on every put
+EVICT_TO = 0.9
+
+class SqliteLru:
+    def __init__(self, path, max_mb, table, columns, check_same_thread=True):
+        # columns: the value columns between key and size, e.g. "value TEXT NOT NULL"
+        self.path = path
+        self.table = table
+        self.max_bytes = int(max_mb * (1 << 20))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=check_same_thread)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, {columns}, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_used ON {table}(last_used)")
+        self.conn.commit()
+        # Running total; re-read from the table before evicting (other processes write too)
+        self.total = self.size()
+        self.stats = {"hits": 0, "misses": 0, "puts": 0, "evicted": 0}
+
+    def _get(self, key, column):
+        row = self.conn.execute(f"SELECT {column} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self.conn.execute(f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (time.time(), key))
+        self.conn.commit()
+        return row[0]
+
+    def _put(self, key, size, values):
+        # values: {column: value}; rows larger than the whole cache are not stored
+        if size > self.max_bytes:
+            return
+        names = ", ".join(values)
+        marks = ", ".join("?" * len(values))
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, {names}, size, last_used) VALUES (?, {marks}, ?, ?)",
+            (key, *values.values(), size, time.time())
+        )
+        self.stats["puts"] += 1
+        self.total += size
+        if self.total > self.max_bytes:
+            self.total = self.size()
+            if self.total > self.max_bytes:
+                self._evict(int(self.max_bytes * EVICT_TO))
+        self.conn.commit()
+
+    def _evict(self, target):
+        # Oldest first until the total is back under target
+        excess = self.size() - target
+        drop = []
+        for key, size in self.conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_used"):
+            if excess <= 0:
+                break
+            drop.append((key,))
+            excess -= size
+        self.conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", drop)
+        self.stats["evicted"] += len(drop)
+        self.total = self.size()
+
+    def size(self):
+        return self.conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+
+    def __len__(self):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.conn.commit()
+        self.conn.close()
+        self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,52 @@
+import re
+import unicodedata
+
+# Search normalization: compatibility forms (NFKC/NFKD), case folding, diacritics
+# stripped (Vietnamese "Hà Nội" -> "ha noi", "đ" -> "d"), invisible OCR noise removed
+# and whitespace runs collapsed. fold() is the fast path used when indexing;
+# fold_with_offsets() gives the same string plus, for every character of it, the
+# offset of the original character it came from (for highlighting).
+
+# Combining marks dropped after decomposition
+COMBINING_RE = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+WS_RE = re.compile(r"\s+")
+
+# Letters with a stroke have no decomposition; zero-width characters and soft
+# hyphens show up in OCR output between letters of a word
+TRANSLATE = str.maketrans({
+    "\u0111": "d", "\u0110": "D", "\u0142": "l", "\u0141": "L", "\u00f8": "o", "\u00d8": "O", "\u0127": "h", "\u0126": "H",
+    "\u00ad": None, "\u200b": None, "\u200c": None, "\u200d": None, "\u2060": None, "\ufeff": None,
+})
+
+def fold(text):
+    text = unicodedata.normalize("NFKD", text)
+    text = COMBINING_RE.sub("", text).translate(TRANSLATE).casefold()
+    return WS_RE.sub(" ", text)
+
+def _fold_char(c):
+    if c.isascii():
+        return " " if c.isspace() else c.lower()
+    out = COMBINING_RE.sub("", unicodedata.normalize("NFKD", c)).translate(TRANSLATE).casefold()
+    return " " if out.isspace() else out
+
+def fold_with_offsets(text):
+    # (folded, offsets): folded == fold(text) and folded[i] comes from text[offsets[i]]
+    chars, offsets = [], []
+    for i, c in enumerate(text):
+        out = _fold_char(c)
+        for o in out:
+            if o.isspace():
+                if chars and chars[-1] == " ":
+                    continue
+                o = " "
+            chars.append(o)
+            offsets.append(i)
+    return "".join(chars), offsets
+
+def original_span(text, offsets, start, end):
+    # Span of `text` covering folded[start:end], including trailing combining marks
+    o_start = offsets[start]
+    o_end = offsets[end - 1] + 1
+    while o_end < len(text) and unicodedata.combining(text[o_end]):
+        o_end += 1
+    return o_start, o_end
@@ -0,0 +1,115 @@
+import os
+import time
+import queue
+import threading
+
+# Change feed for --watch: filesystem events (inotify on Linux, FSEvents / ReadDirectoryChangesW
+# elsewhere) through watchdog when it is installed, otherwise a polling loop that
+# compares stat snapshots. Changed paths are held back until they have been quiet for
+# `debounce` seconds and their size/mtime stopped moving, so uploads and copies that
+# are still being written are not indexed half-way. While nothing happens the
+# consumer blocks on a queue and uses no CPU.
+
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_POLL_INTERVAL = 5.0
+
+# Event types that may change what is indexed ("opened", "closed_no_write" do not)
+CHANGE_EVENTS = ("created", "modified", "deleted", "moved", "closed")
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def _start_observer(folder, events, accept):
+    # watchdog observer putting accepted relative paths on `events`, or None if
+    # watchdog is not installed
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.event_type not in CHANGE_EVENTS:
+                return
+            # A folder's own "modified" just means its listing changed; the files
+            # in it get their own events
+            if event.is_directory and event.event_type in ("modified", "closed"):
+                return
+            for path in (event.src_path, getattr(event, "dest_path", "")):
+                if not path:
+                    continue
+                rel_path = os.path.relpath(os.fsdecode(path), folder)
+                if rel_path != "." and not rel_path.startswith(".." + os.sep) and accept(rel_path, event.is_directory):
+                    events.put(rel_path)
+
+    observer = Observer()
+    observer.schedule(Handler(), folder, recursive=True)
+    observer.start()
+    return observer
+
+def _poll(folder, events, snapshot, poll_interval, stop):
+    # Fallback: diff {rel_path: (size, mtime)} snapshots every poll_interval seconds
+    previous = snapshot()
+    while not stop.wait(poll_interval):
+        current = snapshot()
+        for rel_path in current.keys() | previous.keys():
+            if current.get(rel_path) != previous.get(rel_path):
+                events.put(rel_path)
+        previous = current
+
+def watch_changes(folder, accept, snapshot, debounce=DEFAULT_DEBOUNCE, poll_interval=DEFAULT_POLL_INTERVAL,
+                  polling=False):
+    # Yields sorted batches of relative paths (files or folders) that were created,
+    # changed, moved or deleted; the caller stats them to tell which. Runs until
+    # interrupted. accept(rel_path, is_dir) filters filesystem events; snapshot() is
+    # used by the polling fallback (also with polling=True, e.g. for network shares
+    # where inotify sees nothing).
+    events = queue.Queue()
+    stop = threading.Event()
+    observer = None if polling else _start_observer(folder, events, accept)
+    if observer is not None:
+        print("👀 Watching with filesystem events")
+    else:
+        if not polling:
+            print("⚠️ watchdog is not installed (pip install watchdog), falling back to polling")
+        print(f"👀 Polling every {poll_interval:g}s")
+        threading.Thread(target=_poll, args=(folder, events, snapshot, poll_interval, stop), daemon=True).start()
+
+    pending = {}   # rel_path -> (time of the last event, size/mtime at that time)
+    try:
+        while True:
+            wait_for = None
+            if pending:
+                first_ready = min(t for t, _ in pending.values()) + debounce
+                wait_for = max(0.0, first_ready - time.monotonic())
+            try:
+                rel_path = events.get(timeout=wait_for)
+                while True:
+                    pending[rel_path] = (time.monotonic(), _signature(os.path.join(folder, rel_path)))
+                    rel_path = events.get_nowait()
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            ready = []
+            for rel_path, (t, signature) in list(pending.items()):
+                if now - t < debounce:
+                    continue
+                current = _signature(os.path.join(folder, rel_path))
+                if current != signature:
+                    # Still being written without events (polling, network share): wait again
+                    pending[rel_path] = (now, current)
+                    continue
+                del pending[rel_path]
+                ready.append(rel_path)
+            if ready:
+                yield sorted(ready)
+    finally:
+        stop.set()
+        if observer is not None:
+            observer.stop()
+            observer.join()
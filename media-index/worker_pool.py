@@ -0,0 +1,169 @@
+import time
+import signal
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+
+try:
+    import resource
+except ImportError:
+    # Windows: no per-process memory limit
+    resource = None
+
+# Process pool for extractions that may hang or blow up: every task runs in a worker
+# process with a wall-clock timeout and an address-space limit. A worker that times
+# out is killed, one that crashes (segfault, OOM kill, MemoryError) is replaced, and
+# the pool carries on with the next task.
+
+TIMEOUT, CRASHED, MEMORY, ERROR = "timeout", "crashed", "memory", "error"
+
+def _limit_memory(max_memory_mb):
+    if resource is None or not max_memory_mb:
+        return
+    limit = max_memory_mb << 20
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        # Not enforceable here (e.g. macOS); run without the cap
+        pass
+
+def _worker(conn, max_memory_mb, initializer, initargs):
+    # Ctrl+C is for the parent, which stops the workers itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _limit_memory(max_memory_mb)
+    # Spawned workers (Windows, macOS) start from a fresh interpreter: state set up
+    # in the parent at run time (e.g. extra extractors) has to be rebuilt here
+    if initializer is not None:
+        initializer(*initargs)
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        func, args = job
+        try:
+            result = func(*args)
+        except MemoryError:
+            conn.send((MEMORY, f"memory limit of {max_memory_mb} MB exceeded"))
+            return
+        except Exception as e:
+            conn.send((ERROR, f"{type(e).__name__}: {e}"))
+            continue
+        conn.send((None, result))
+
+class IsolatedPool:
+    def __init__(self, workers=1, timeout=None, max_memory_mb=0, initializer=None, initargs=()):
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.initargs = initargs
+        self.timeout = timeout or None
+        self.max_memory_mb = max_memory_mb
+        self.ctx = multiprocessing.get_context()
+        self.idle = []
+
+    def _start(self):
+        parent_conn, child_conn = self.ctx.Pipe()
+        proc = self.ctx.Process(target=_worker, args=(child_conn, self.max_memory_mb, self.initializer, self.initargs), daemon=True)
+        proc.start()
+        child_conn.close()
+        return proc, parent_conn
+
+    def _stop(self, worker, kill=False):
+        proc, conn = worker
+        if kill:
+            proc.kill()
+        proc.join()
+        conn.close()
+        return proc.exitcode
+
+    def imap(self, func, tasks, timeout=None, max_inflight=None, task_timeout=None):
+        # Yields (task, result, failure, elapsed) in submission order, so index.json
+        # stays deterministic. failure is None or (kind, message) with kind one of
+        # TIMEOUT, CRASHED, MEMORY (the worker was replaced) or ERROR (func raised).
+        # Tasks are pulled lazily, `tasks` can be a generator that is still scanning.
+        # task_timeout(task) -> seconds gives a task its own budget (e.g. by size);
+        # it is only consulted when there is a timeout at all. timeout=None means the
+        # pool's timeout, 0 means no limit.
+        timeout = self.timeout if timeout is None else (timeout or None)
+        max_inflight = max_inflight or self.workers * 4
+        while len(self.idle) < self.workers:
+            self.idle.append(self._start())
+        queue = deque()   # [task, done, result, failure, elapsed] in submission order
+        running = {}      # conn -> (worker, slot, start time, time limit)
+        tasks = iter(tasks)
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and self.idle and len(queue) < max_inflight:
+                    try:
+                        task = next(tasks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    slot = [task, False, None, None, 0.0]
+                    queue.append(slot)
+                    limit = timeout
+                    if timeout and task_timeout is not None:
+                        limit = task_timeout(task) or timeout
+                    worker = self.idle.pop()
+                    worker[1].send((func, task))
+                    running[worker[1]] = (worker, slot, time.monotonic(), limit)
+                while queue and queue[0][1]:
+                    task, _, result, failure, elapsed = queue.popleft()
+                    yield task, result, failure, elapsed
+                if not running:
+                    if exhausted and not queue:
+                        return
+                    continue
+                wait_for = None
+                if timeout:
+                    first_deadline = min(start + limit for _, _, start, limit in running.values())
+                    wait_for = max(0.0, first_deadline - time.monotonic())
+                for conn in wait(list(running), timeout=wait_for):
+                    worker, slot, start, _ = running.pop(conn)
+                    slot[1], slot[4] = True, time.monotonic() - start
+                    try:
+                        kind, payload = conn.recv()
+                    except (EOFError, OSError):
+                        exitcode = self._stop(worker)
+                        slot[3] = (CRASHED, f"worker crashed (exit code {exitcode})")
+                        self.idle.append(self._start())
+                        continue
+                    if kind is None:
+                        slot[2] = payload
+                    else:
+                        slot[3] = (kind, payload)
+                    if kind == MEMORY:
+                        self._stop(worker)
+                        self.idle.append(self._start())
+                    else:
+                        self.idle.append(worker)
+                if timeout:
+                    now = time.monotonic()
+                    for conn, (worker, slot, start, limit) in list(running.items()):
+                        if now - start >= limit:
+                            del running[conn]
+                            self._stop(worker, kill=True)
+                            slot[1], slot[3], slot[4] = True, (TIMEOUT, f"timed out after {limit:g}s"), now - start
+                            self.idle.append(self._start())
+        finally:
+            # Consumer stopped early: drop the workers still busy with its tasks
+            for worker, _, _, _ in running.values():
+                self._stop(worker, kill=True)
+
+    def close(self):
+        for worker in self.idle:
+            try:
+                worker[1].send(None)
+            except OSError:
+                pass
+            self._stop(worker)
+        self.idle = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
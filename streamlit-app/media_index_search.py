@@ -1,77 +1,179 @@
 import streamlit as st
 import os
 import json
-import re
+import sys
+import time
+import threading
+import urllib.parse
+import urllib.request
 from PIL import Image
 
+# index_pack, index_db and text_norm live with the indexer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../media-index"))
+from search_index import SearchIndex, match_spans, snippet
+from index_pack import PackedIndex, is_pack
+from preview_cache import PreviewCache
+
 # Path to the index.json file
 INDEX_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../media-data/index.json'))
+# Packed binary index (media_ocr_index.py --pack); used instead of index.json when present
+PACK_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '../media-data/index.pack'))
+if os.path.exists(PACK_PATH):
+    INDEX_PATH = PACK_PATH
+# Optional SQLite/FTS5 index (media_ocr_index.py --db); used instead of index.json when present
+DB_PATH = os.environ.get("MEDIA_INDEX_DB", os.path.abspath(os.path.join(os.path.dirname(__file__), '../media-data/index.sqlite')))
+USE_DB = os.path.exists(DB_PATH)
+# Optional search server (search_server.py): the app then only sends queries and
+# renders results, the index is loaded once by the server for all sessions
+SERVER_URL = os.environ.get("MEDIA_INDEX_SERVER", "").rstrip("/")
+# Folder the indexed filenames are relative to
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", os.path.abspath(os.path.join(os.path.dirname(__file__), '../media-data')))
 st.set_page_config(page_title="📚 Media Index Search", layout="wide")
 
 st.title("📚 Media OCR Index Search")
 st.caption("Search for any keyword in your entire OCR-indexed archive: images, videos, PDF, DOCX, XLSX, TXT, RTF, EPUB, and more.")
 
+# The loaded index is keyed on (size, mtime) of the file, so a rewritten index is
+# picked up on the next rerun instead of being cached for the whole session
+def index_signature():
+    st_index = os.stat(INDEX_PATH)
+    return st_index.st_size, st_index.st_mtime_ns
+
 # Load index.json (with Streamlit caching for speed)
-@st.cache_data
-def load_index():
+@st.cache_data(max_entries=1)
+def load_index(signature):
     with open(INDEX_PATH, 'r', encoding='utf-8') as f:
         return json.load(f)
-index_data = load_index()
 
-# Highlight keyword in text using <mark>
-def highlight(text, keyword):
-    if not keyword.strip(): return text
-    pattern = re.compile(re.escape(keyword), re.IGNORECASE)
-    return pattern.sub(lambda m: f'<mark style="background:yellow">{m.group(0)}</mark>', text)
+# index.pack is memory-mapped once for all sessions; text is read only for the entries shown
+@st.cache_resource
+def pack_holder():
+    return {"signature": None, "pack": None, "lock": threading.Lock()}
+
+def load_pack(signature):
+    # Only the current pack is kept. The previous one is not closed here, other
+    # sessions may still be rendering from it: its mapping is released when the last
+    # of them drops it (PackedIndex has no reference cycles, so that is immediate).
+    holder = pack_holder()
+    with holder["lock"]:
+        if holder["signature"] != signature:
+            holder["pack"], holder["signature"] = PackedIndex(INDEX_PATH), signature
+        return holder["pack"]
+
+def load_entries(signature):
+    return load_pack(signature) if is_pack(INDEX_PATH) else load_index(signature)
+
+# Inverted index (token -> entries/positions), built once and kept next to index.json
+@st.cache_resource(max_entries=1)
+def load_search_index(signature):
+    return SearchIndex.load_or_build(INDEX_PATH, load_entries(signature))
+
+# SQLite mode: nothing is loaded up front, text is read only for the entries shown
+@st.cache_resource
+def load_db():
+    from index_db import IndexDB
+    return IndexDB(DB_PATH, readonly=True)
+
+# Thumbnails and video frames, made once and shared by all sessions
+@st.cache_resource
+def load_previews():
+    return PreviewCache()
+
+previews = load_previews()
+
+# With a search server nothing is loaded here
+if USE_DB and not SERVER_URL:
+    db = load_db()
+elif not SERVER_URL:
+    signature = index_signature()
+    index_data = load_entries(signature)
+    search_index = load_search_index(signature)
+
+PAGE_SIZES = [10, 20, 50]
+SNIPPET_CHARS = 2000
+
+def ask_server(path, **params):
+    url = f"{SERVER_URL}{path}?{urllib.parse.urlencode(params)}"
+    with urllib.request.urlopen(url, timeout=30) as r:
+        return json.load(r)
+
+def find(keyword, limit, offset):
+    # (total hits, entries of one page), best BM25 score first
+    if SERVER_URL:
+        response = ask_server("/search", q=keyword, limit=limit, offset=offset, snippet=SNIPPET_CHARS)
+        return response["total"], response["results"]
+    if USE_DB:
+        total, hits = db.ranked(keyword, limit, offset)
+        return total, [item for item, _ in hits]
+    total, hits = search_index.ranked(keyword, limit, offset)
+    return total, [index_data[i] for i, _ in hits]
+
+def full_item(item):
+    # DB hits carry metadata only; fetch the text when the entry is displayed.
+    # Server hits already carry their snippet.
+    return db.get(item["id"]) if USE_DB and not SERVER_URL else item
+
+# Highlight (start, end) spans of text using <mark>; match_spans() ignores case and diacritics
+def highlight(text, spans):
+    out, last = [], 0
+    for start, end in spans:
+        out.append(text[last:start])
+        out.append(f'<mark style="background:yellow">{text[start:end]}</mark>')
+        last = end
+    out.append(text[last:])
+    return "".join(out)
+
+def show_item(item, keyword, expanded=False):
+    item = full_item(item)
+    label = f"{item.get('type', '?').capitalize()}: {item.get('filename', '')}" + (f" (p. {item['page']})" if "page" in item else "")
+    with st.expander(label, expanded=expanded):
+        # Show preview for image (cached thumbnail, not the full-size original)
+        if item.get("type") == "image":
+            thumb = previews.thumbnail(os.path.join(MEDIA_ROOT, item["filename"]))
+            if thumb is not None:
+                st.image(thumb, caption=item["filename"])
+        # Video frame info, with the frame at that second
+        elif item.get("type") == "video":
+            st.write(f"**Video:** {item['filename']} | Frame: {item.get('second', '?')}s")
+            if item.get("second") is not None:
+                frame = previews.video_frame(os.path.join(MEDIA_ROOT, item["filename"]), item["second"])
+                if frame is not None:
+                    st.image(frame, caption=f"{item['filename']} @ {item['second']}s")
+        elif "page" in item:
+            st.write(f"**File:** {item.get('filename','?')} | Page: {item['page']}")
+        else:
+            st.write(f"**File:** {item.get('filename','?')}")
+        # Show highlighted text snippet
+        if "snippet" in item:
+            text, spans = item["snippet"], item["highlights"]
+        else:
+            text = snippet(item.get("text") or "", keyword, SNIPPET_CHARS)
+            spans = match_spans(text, keyword)
+        st.markdown(highlight(text, spans), unsafe_allow_html=True)
 
 # --- Search UI ---
 keyword = st.text_input("🔍 Enter keyword to search:", "")
 
 if keyword.strip():
-    # Find all items that contain the keyword (case-insensitive)
-    results = [
-        item for item in index_data
-        if isinstance(item.get("text"), str) and re.search(re.escape(keyword), item.get("text", ""), re.IGNORECASE)
-    ]
-    st.info(f"🔎 Found {len(results)} matching files/frames for: '{keyword}'")
-
-    if 0 < len(results) <= 3:
-        # Show all matches directly
+    # All words must match (case-insensitive); "quoted words" must appear as a phrase.
+    # Results are ranked (BM25) and only the current page is fetched and rendered.
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Results per page:", PAGE_SIZES)
+    # One page widget per query, so a new query starts again at page 1
+    page_key = f"page|{keyword}|{page_size}"
+    page = st.session_state.get(page_key, 1)
+    t0 = time.perf_counter()
+    total, results = find(keyword, page_size, (page - 1) * page_size)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    n_pages = max(1, -(-total // page_size))
+    st.info(f"🔎 Found {total} matching files/frames for: '{keyword}' ({elapsed_ms:.1f} ms)")
+
+    if total:
+        col_page.number_input(f"Page (of {n_pages}):", min_value=1, max_value=n_pages, key=page_key)
+        first = (page - 1) * page_size
+        st.caption(f"Showing {first + 1}-{first + len(results)} of {total}")
         for item in results:
-            with st.expander(f"{item.get('type', '?').capitalize()}: {item.get('filename', '')}"):
-                # Show preview for image
-                if item.get("type") == "image":
-                    img_path = os.path.abspath(os.path.join("../media-data", item["filename"]))
-                    if os.path.exists(img_path):
-                        st.image(img_path, caption=item["filename"], use_column_width=True)
-                # Video frame info
-                elif item.get("type") == "video":
-                    st.write(f"**Video:** {item['filename']} | Frame: {item.get('second', '?')}s")
-                else:
-                    st.write(f"**File:** {item.get('filename','?')}")
-                # Show highlighted text snippet
-                snippet = item["text"]
-                if len(snippet) > 2000:
-                    snippet = snippet[:2000] + "\n..."
-                st.markdown(highlight(snippet, keyword), unsafe_allow_html=True)
-    elif len(results) > 3:
-        # Show dropdown list if there are many matches
-        file_list = [f"{item.get('type','?').capitalize()}: {item.get('filename','')}" for item in results]
-        idx = st.selectbox("Select a file/frame to view details:", range(len(results)), format_func=lambda i: file_list[i])
-        item = results[idx]
-        with st.expander(f"{item.get('type', '?').capitalize()}: {item.get('filename', '')}", expanded=True):
-            if item.get("type") == "image":
-                img_path = os.path.abspath(os.path.join("../media-data", item["filename"]))
-                if os.path.exists(img_path):
-                    st.image(img_path, caption=item["filename"], use_column_width=True)
-            elif item.get("type") == "video":
-                st.write(f"**Video:** {item['filename']} | Frame: {item.get('second', '?')}s")
-            else:
-                st.write(f"**File:** {item.get('filename','?')}")
-            snippet = item["text"]
-            if len(snippet) > 2000:
-                snippet = snippet[:2000] + "\n..."
-            st.markdown(highlight(snippet, keyword), unsafe_allow_html=True)
+            show_item(item, keyword, expanded=(total <= 3))
     else:
         st.warning("No matching files found!")
 else:
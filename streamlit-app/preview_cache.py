@@ -0,0 +1,126 @@
+import io
+import os
+import sys
+import hashlib
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../media-index"))
+from sqlite_lru import SqliteLru
+
+# Preview cache for search results: downscaled JPEG thumbnails of images and the video
+# frame at a hit's second, made the first time they are shown and kept on disk, so a
+# result page sends a few KB per hit instead of the full-size original, and every asset
+# is decoded at most once. Keyed on the file's path, size and mtime (a changed file
+# gets a new preview), stored in SQLite (WAL, shared by all sessions and app
+# processes) and bounded by size: the least recently shown previews are evicted
+# first (sqlite_lru.py).
+
+DEFAULT_PREVIEW_MB = 256
+# Longest side of a preview in pixels
+THUMB_SIDE = 480
+JPEG_QUALITY = 85
+
+def default_preview_path():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("MEDIA_PREVIEW_CACHE") or os.path.join(base, "media-ocr-index", "previews.sqlite")
+
+def preview_key(kind, path, second=None, max_side=THUMB_SIDE):
+    st = os.stat(path)
+    raw = f"{kind}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{second}|{max_side}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+def make_thumbnail(path, max_side=THUMB_SIDE):
+    # JPEG bytes of the image scaled to fit max_side; JPEGs are decoded at reduced
+    # size directly (draft mode), so a 40 MP photo never gets decoded in full
+    from PIL import Image, ImageOps
+    with Image.open(path) as img:
+        img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_side, max_side))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=JPEG_QUALITY)
+    return out.getvalue()
+
+def make_video_frame(path, second, max_side=THUMB_SIDE):
+    # JPEG bytes of the frame at `second`, picked the way media_ocr_index.py samples
+    # it (frame int(second * fps)), so the preview is the frame that was OCR'd
+    import cv2
+    vidcap = cv2.VideoCapture(path)
+    try:
+        if not vidcap.isOpened():
+            return None
+        fps = vidcap.get(cv2.CAP_PROP_FPS)
+        if fps > 0:
+            vidcap.set(cv2.CAP_PROP_POS_FRAMES, int(float(second) * fps))
+        success, frame = vidcap.read()
+    finally:
+        vidcap.release()
+    if not success:
+        return None
+    h, w = frame.shape[:2]
+    scale = max_side / max(h, w)
+    if scale < 1:
+        frame = cv2.resize(frame, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    success, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    return data.tobytes() if success else None
+
+class PreviewCache(SqliteLru):
+    def __init__(self, path=None, max_mb=DEFAULT_PREVIEW_MB):
+        # One connection shared by the app's session threads
+        super().__init__(path or default_preview_path(), max_mb, "previews", "data BLOB NOT NULL",
+                         check_same_thread=False)
+        self.lock = threading.Lock()
+        # Previews being made right now, so concurrent sessions wait instead of decoding twice
+        self.making = {}
+
+    def get(self, key):
+        with self.lock:
+            return self._get(key, "data")
+
+    def put(self, key, data):
+        with self.lock:
+            self._put(key, len(data), {"data": data})
+
+    def _cached(self, key, make):
+        data = self.get(key)
+        if data is not None:
+            return data
+        with self.lock:
+            event = self.making.get(key)
+            owner = event is None
+            if owner:
+                event = self.making[key] = threading.Event()
+        if not owner:
+            event.wait()
+            return self.get(key)
+        try:
+            try:
+                data = make()
+            except Exception:
+                # Unreadable or unsupported file: no preview (retried next time)
+                data = None
+            if data is not None:
+                self.put(key, data)
+            return data
+        finally:
+            with self.lock:
+                del self.making[key]
+            event.set()
+
+    def thumbnail(self, path, max_side=THUMB_SIDE):
+        # JPEG bytes, or None if the image is missing or cannot be decoded
+        try:
+            key = preview_key("image", path, max_side=max_side)
+        except OSError:
+            return None
+        return self._cached(key, lambda: make_thumbnail(path, max_side))
+
+    def video_frame(self, path, second, max_side=THUMB_SIDE):
+        # JPEG bytes of the frame at `second`, or None
+        try:
+            key = preview_key("video", path, second, max_side)
+        except OSError:
+            return None
+        return self._cached(key, lambda: make_video_frame(path, second, max_side))
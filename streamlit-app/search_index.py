@@ -0,0 +1,243 @@
+import os
+import re
+import sys
+import math
+import json
+import heapq
+import struct
+from array import array
+from bisect import bisect_left
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../media-index"))
+from text_norm import fold, fold_with_offsets, original_span
+
+# Inverted index over index.json. Each token maps to packed arrays
+# (entry_ids, offsets, positions): the token occurs in entry entry_ids[j] at token
+# positions positions[offsets[j]:offsets[j + 1]]. entry_id is the position of the
+# entry in index.json. Built once, saved next to index.json and rebuilt only when
+# index.json changes. Entry lengths (in tokens) are kept for BM25 ranking.
+# Text and queries are tokenized after text_norm.fold(), so searches ignore case
+# and diacritics ("ha noi" finds "Hà Nội").
+#
+# On disk (index.inv): magic, JSON metadata (version, signature, tokens and their
+# array sizes), then the entry lengths and every token's three arrays as raw
+# little-endian uint32. Plain data only, nothing in the file is executed on load:
+# the search server reads it from the shared media folder.
+
+TOKEN_RE = re.compile(r"\w+")
+PHRASE_RE = re.compile(r'"([^"]*)"')
+
+def tokenize(text):
+    return TOKEN_RE.findall(fold(text))
+
+def parse_query(query):
+    # '"exact phrase" other words' -> (phrases, terms); every part must match (AND)
+    phrases = [tokenize(p) for p in PHRASE_RE.findall(query)]
+    phrases = [p for p in phrases if p]
+    terms = tokenize(PHRASE_RE.sub(" ", query))
+    return phrases, terms
+
+def query_terms(query):
+    # Every token of the query, for highlighting
+    phrases, terms = parse_query(query)
+    return [t for p in phrases for t in p] + terms
+
+def match_spans(text, query):
+    # (start, end) offsets in the original text of every query token, matched on
+    # the folded text
+    tokens = set(query_terms(query))
+    if not tokens or not text:
+        return []
+    folded, offsets = fold_with_offsets(text)
+    spans = []
+    for m in TOKEN_RE.finditer(folded):
+        if m.group(0) in tokens:
+            spans.append(original_span(text, offsets, m.start(), m.end()))
+    return spans
+
+def snippet(text, query, size=2000):
+    # Part of a long text around the first hit
+    if len(text) <= size:
+        return text
+    spans = match_spans(text, query)
+    start = max(0, (spans[0][0] if spans else 0) - size // 4)
+    end = min(len(text), start + size)
+    return ("...\n" if start else "") + text[start:end] + ("\n..." if end < len(text) else "")
+
+def search_index_path(index_path):
+    return os.path.splitext(index_path)[0] + ".inv"
+
+def _signature(index_path):
+    st = os.stat(index_path)
+    return (st.st_size, st.st_mtime_ns)
+
+MAGIC = b"MIDXINV\0"
+META_LEN = struct.Struct("<I")
+# Unsigned 32-bit array type code (4 bytes; "I" on every common platform)
+UINT32 = "I" if array("I").itemsize == 4 else "L"
+
+def _to_le(values):
+    if sys.byteorder == "big":
+        values = array(UINT32, values)
+        values.byteswap()
+    return values.tobytes()
+
+def _from_le(data, start, count):
+    values = array(UINT32)
+    values.frombytes(data[start:start + count * 4])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values, start + count * 4
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+class SearchIndex:
+    VERSION = 5
+
+    def __init__(self, postings=None, n_entries=0, signature=None, lengths=None):
+        self.postings = postings or {}
+        self.n_entries = n_entries
+        self.signature = signature
+        self.lengths = lengths if lengths is not None else array(UINT32, [0] * n_entries)
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if len(self.lengths) else 0.0
+
+    @classmethod
+    def build(cls, entries, signature=None):
+        raw = {}
+        lengths = array(UINT32)
+        for entry_id, item in enumerate(entries):
+            text = item.get("text")
+            tokens = tokenize(text) if isinstance(text, str) else []
+            lengths.append(len(tokens))
+            for pos, token in enumerate(tokens):
+                raw.setdefault(token, {}).setdefault(entry_id, []).append(pos)
+        postings = {}
+        for token, by_entry in raw.items():
+            entry_ids, offsets, positions = array(UINT32), array(UINT32, [0]), array(UINT32)
+            for entry_id, plist in by_entry.items():
+                entry_ids.append(entry_id)
+                positions.extend(plist)
+                offsets.append(len(positions))
+            postings[token] = (entry_ids, offsets, positions)
+        return cls(postings, len(lengths), signature, lengths)
+
+    def save(self, path):
+        tokens = list(self.postings)
+        meta = {"version": self.VERSION, "signature": list(self.signature) if self.signature else None,
+                "n_entries": self.n_entries,
+                "tokens": tokens, "sizes": [[len(self.postings[t][0]), len(self.postings[t][2])] for t in tokens]}
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(META_LEN.pack(len(meta_bytes)))
+            f.write(meta_bytes)
+            f.write(_to_le(self.lengths))
+            for token in tokens:
+                for values in self.postings[token]:
+                    f.write(_to_le(values))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a search index")
+        at = len(MAGIC) + META_LEN.size
+        (meta_len,) = META_LEN.unpack_from(data, len(MAGIC))
+        meta = json.loads(data[at:at + meta_len])
+        if meta["version"] != cls.VERSION:
+            raise ValueError(f"Unsupported search index version {meta['version']}")
+        at += meta_len
+        view = memoryview(data)
+        lengths, at = _from_le(view, at, meta["n_entries"])
+        postings = {}
+        for token, (n_ids, n_positions) in zip(meta["tokens"], meta["sizes"]):
+            entry_ids, at = _from_le(view, at, n_ids)
+            offsets, at = _from_le(view, at, n_ids + 1)
+            positions, at = _from_le(view, at, n_positions)
+            postings[token] = (entry_ids, offsets, positions)
+        if at != len(data):
+            raise ValueError(f"{path} is truncated or corrupt")
+        signature = tuple(meta["signature"]) if meta["signature"] else None
+        return cls(postings, meta["n_entries"], signature, lengths)
+
+    @classmethod
+    def load_or_build(cls, index_path, entries):
+        # Reuse the on-disk index if it was built from this exact index.json
+        path = search_index_path(index_path)
+        signature = _signature(index_path)
+        if os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.signature == signature:
+                    return index
+            except Exception:
+                pass
+        index = cls.build(entries, signature)
+        try:
+            index.save(path)
+        except OSError:
+            pass
+        return index
+
+    def positions(self, token, entry_id):
+        entry_ids, offsets, positions = self.postings[token]
+        j = bisect_left(entry_ids, entry_id)
+        if j == len(entry_ids) or entry_ids[j] != entry_id:
+            return []
+        return positions[offsets[j]:offsets[j + 1]]
+
+    def _phrase_match(self, phrase, entry_id):
+        # Positions p where phrase[k] occurs at p + k for every k
+        starts = set(self.positions(phrase[0], entry_id))
+        for k, token in enumerate(phrase[1:], 1):
+            starts &= {p - k for p in self.positions(token, entry_id)}
+            if not starts:
+                return False
+        return True
+
+    def _matches(self, phrases, tokens):
+        if not tokens or any(t not in self.postings for t in tokens):
+            return set()
+        # Intersect starting from the rarest token
+        ordered = sorted(tokens, key=lambda t: len(self.postings[t][0]))
+        candidates = set(self.postings[ordered[0]][0])
+        for token in ordered[1:]:
+            candidates.intersection_update(self.postings[token][0])
+            if not candidates:
+                return candidates
+        for phrase in phrases:
+            if len(phrase) > 1:
+                candidates = {e for e in candidates if self._phrase_match(phrase, e)}
+        return candidates
+
+    def _scores(self, tokens, candidates):
+        # BM25 of every candidate, one pass over each token's postings
+        scores = dict.fromkeys(candidates, 0.0)
+        avg = self.avg_length or 1.0
+        for token in tokens:
+            entry_ids, offsets, _ = self.postings[token]
+            df = len(entry_ids)
+            idf = math.log(1 + (self.n_entries - df + 0.5) / (df + 0.5))
+            for j, entry_id in enumerate(entry_ids):
+                if entry_id in scores:
+                    tf = offsets[j + 1] - offsets[j]
+                    norm = K1 * (1 - B + B * self.lengths[entry_id] / avg)
+                    scores[entry_id] += idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def ranked(self, query, limit=10, offset=0):
+        # (total hits, [(entry_id, score), ...]) for one page of results, best first.
+        # Only the top offset + limit entries are ever sorted (heap selection).
+        phrases, terms = parse_query(query)
+        tokens = set(terms) | {t for p in phrases for t in p}
+        candidates = self._matches(phrases, tokens)
+        if not candidates:
+            return 0, []
+        scores = self._scores(tokens, candidates)
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda kv: (kv[1], -kv[0]))
+        return len(candidates), top[offset:]
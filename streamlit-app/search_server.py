@@ -0,0 +1,308 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+# index_pack, index_db and text_norm live with the indexer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../media-index"))
+from search_index import SearchIndex, match_spans, snippet
+from index_pack import PackedIndex, is_pack
+
+# Headless search service: loads the index once (index.json + its inverted index,
+# index.pack whose text stays on disk, or the SQLite/FTS5 database) and answers queries over HTTP with snippets and
+# highlight offsets, so any number of Streamlit sessions (MEDIA_INDEX_SERVER) or
+# scripts share one copy. One thread per request; repeated queries are served from
+# an LRU cache that is dropped whenever the index changes. index.json is reloaded in
+# the background when it is rewritten, queries keep using the old copy meanwhile.
+#
+#   GET /search?q=<query>&limit=10&offset=0&snippet=2000
+#   GET /entry/<id>      full entry, text included (ids are per generation)
+#   GET /status          entries, generation, cache stats
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 1024
+MAX_LIMIT = 200
+SNIPPET_CHARS = 2000
+# Seconds between checks of index.json for changes
+CHECK_INTERVAL = 1.0
+
+class QueryCache:
+    # LRU of query responses, safe to share between request threads
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.items.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_entries:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.stats["invalidations"] += 1
+
+    def summary(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.items), max_entries=self.max_entries)
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+def close_state(state):
+    # A replaced index.pack is unmapped, so the file can be rewritten again (Windows
+    # cannot replace a mapped file) and reloads do not pile up mappings
+    entries = state[1]
+    if isinstance(entries, PackedIndex):
+        entries.close()
+
+class SearchService:
+    def __init__(self, index_path=None, db_path=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.index_path = index_path
+        self.db_path = db_path
+        self.cache = QueryCache(cache_size)
+        self.generation = 0
+        self.reloading = False
+        self.lock = threading.Lock()
+        # Requests using each loaded state: {id(state): count}. A replaced state is
+        # closed by the last request still reading it.
+        self.in_use = {}
+        self.last_check = time.monotonic()
+        if db_path:
+            from index_db import IndexDB
+            self.db = IndexDB(db_path, readonly=True)
+            self.version = self._data_version()
+            self.state = None
+        else:
+            self.db = None
+            self.state = self._load()
+
+    def _load(self):
+        # (signature, entries, search index) of index.json as it is now. A packed
+        # index is memory-mapped and only read for the hits.
+        signature = file_signature(self.index_path)
+        if is_pack(self.index_path):
+            entries = PackedIndex(self.index_path)
+        else:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        return signature, entries, SearchIndex.load_or_build(self.index_path, entries)
+
+    def _reload(self):
+        try:
+            state = self._load()
+        except (OSError, ValueError) as e:
+            # Probably caught mid-write; the next check tries again
+            print(f"⚠️ Reload of {self.index_path} failed: {e}")
+            state = None
+        old = None
+        with self.lock:
+            if state is not None:
+                old, self.state = self.state, state
+                self.generation += 1
+                self.cache.clear()
+                print(f"🔄 Reloaded {self.index_path} ({len(state[1])} entries, generation {self.generation})")
+                if id(old) in self.in_use:
+                    old = None
+            self.reloading = False
+        if old is not None:
+            close_state(old)
+
+    def _acquire(self):
+        # (generation, state) for one request; release the state when done
+        with self.lock:
+            if self.state is not None:
+                self.in_use[id(self.state)] = self.in_use.get(id(self.state), 0) + 1
+            return self.generation, self.state
+
+    def _release(self, state):
+        if state is None:
+            return
+        with self.lock:
+            n = self.in_use.pop(id(state)) - 1
+            if n:
+                self.in_use[id(state)] = n
+                return
+            if state is self.state:
+                return
+        close_state(state)
+
+    def _data_version(self):
+        # Changes whenever another connection (the indexer) commits
+        with self.db._lock:
+            return self.db.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def check_for_changes(self):
+        if self.db is not None:
+            version = self._data_version()
+            with self.lock:
+                if version != self.version:
+                    self.version = version
+                    self.generation += 1
+                    self.cache.clear()
+            return
+        now = time.monotonic()
+        with self.lock:
+            if self.reloading or now - self.last_check < CHECK_INTERVAL:
+                return
+            self.last_check = now
+            if file_signature(self.index_path) in (None, self.state[0]):
+                return
+            self.reloading = True
+        threading.Thread(target=self._reload, daemon=True).start()
+
+    def __len__(self):
+        return len(self.db) if self.db is not None else len(self.state[1])
+
+    def search(self, query, limit=10, offset=0, snippet_chars=SNIPPET_CHARS):
+        # {"query", "total", "generation", "results": [entry metadata + score,
+        # snippet and highlight (start, end) offsets into the snippet]}
+        self.check_for_changes()
+        generation, state = self._acquire()
+        try:
+            return self._search(generation, state, query, limit, offset, snippet_chars)
+        finally:
+            self._release(state)
+
+    def _search(self, generation, state, query, limit, offset, snippet_chars):
+        key = (generation, query, limit, offset, snippet_chars)
+        response = self.cache.get(key)
+        if response is not None:
+            return response, True
+        results = []
+        if self.db is not None:
+            total, hits = self.db.ranked(query, limit, offset)
+            for meta, score in hits:
+                item = self.db.get(meta["id"]) or meta
+                results.append((meta["id"], item, score))
+        else:
+            _, entries, search_index = state
+            total, hits = search_index.ranked(query, limit, offset)
+            results = [(entry_id, entries[entry_id], score) for entry_id, score in hits]
+        out = []
+        for entry_id, item, score in results:
+            text = snippet(item.get("text") or "", query, snippet_chars)
+            result = {k: v for k, v in item.items() if k != "text"}
+            result.update(id=entry_id, score=round(score, 4), snippet=text, highlights=match_spans(text, query))
+            out.append(result)
+        response = {"query": query, "total": total, "generation": generation, "results": out}
+        self.cache.put(key, response)
+        return response, False
+
+    def entry(self, entry_id):
+        if self.db is not None:
+            item = self.db.get(entry_id)
+            return item and dict(item, id=entry_id)
+        _, state = self._acquire()
+        try:
+            entries = state[1]
+            return dict(entries[entry_id], id=entry_id) if 0 <= entry_id < len(entries) else None
+        finally:
+            self._release(state)
+
+    def status(self):
+        return {"backend": "sqlite" if self.db is not None else "json", "path": self.db_path or self.index_path,
+                "entries": len(self), "generation": self.generation, "cache": self.cache.summary()}
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+    log_requests = False
+    protocol_version = "HTTP/1.1"
+    # Keep-alive clients: headers and body go out as separate writes, Nagle would
+    # hold the body back until the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path == "/search":
+                query = params.get("q", "").strip()
+                if not query:
+                    return self.send_json(400, {"error": "missing q"})
+                limit = min(MAX_LIMIT, max(1, int(params.get("limit", 10))))
+                offset = max(0, int(params.get("offset", 0)))
+                snippet_chars = max(1, int(params.get("snippet", SNIPPET_CHARS)))
+                t0 = time.perf_counter()
+                response, cached = self.service.search(query, limit, offset, snippet_chars)
+                elapsed_ms = round((time.perf_counter() - t0) * 1000, 3)
+                return self.send_json(200, dict(response, cached=cached, elapsed_ms=elapsed_ms))
+            if url.path.startswith("/entry/"):
+                item = self.service.entry(int(url.path[len("/entry/"):]))
+                if item is None:
+                    return self.send_json(404, {"error": "no such entry"})
+                return self.send_json(200, item)
+            if url.path == "/status":
+                return self.send_json(200, self.service.status())
+            self.send_json(404, {"error": f"unknown path {url.path}"})
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        if self.log_requests:
+            super().log_message(format, *args)
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Default listen backlog is 5: bursts of new connections would wait for SYN retries
+    request_queue_size = 128
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT, log_requests=False):
+    # port=0 picks a free port (server.server_address[1])
+    handler = type("SearchHandler", (Handler,), {"service": service, "log_requests": log_requests})
+    return Server((host, port), handler)
+
+if __name__ == "__main__":
+    default_index = os.path.abspath(os.path.join(os.path.dirname(__file__), "../media-data/index.json"))
+    parser = argparse.ArgumentParser(description="Serve searches over the media index via HTTP (JSON)")
+    parser.add_argument('--index', default=default_index, help="index.json or index.pack to serve (default: ../media-data/index.json)")
+    parser.add_argument('--db', default=os.environ.get("MEDIA_INDEX_DB"), help="Serve this SQLite/FTS5 database instead (default: $MEDIA_INDEX_DB)")
+    parser.add_argument('--host', default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help=f"Query results kept in the LRU cache; 0 disables (default: {DEFAULT_CACHE_SIZE})")
+    parser.add_argument('--log', action='store_true', help="Log every request")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    service = SearchService(index_path=None if args.db else args.index, db_path=args.db, cache_size=args.cache_size)
+    server = make_server(service, args.host, args.port, args.log)
+    print(f"📚 {len(service)} entries loaded in {time.perf_counter() - t0:.1f}s from {args.db or args.index}")
+    print(f"🔎 Listening on http://{args.host}:{server.server_address[1]}/search?q=... (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped.")
+    finally:
+        server.server_close()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import their neighbours by module name, as when run from their folder
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ("media-index", "streamlit-app"):
+    sys.path.insert(0, os.path.join(ROOT, folder))
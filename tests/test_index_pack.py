@@ -0,0 +1,92 @@
+import gc
+import weakref
+
+import pytest
+
+from index_pack import PackedIndex, write_pack
+
+ITEMS = [
+    {"type": "image", "filename": "a.png", "text": "Xin chào Hà Nội"},
+    {"type": "video", "filename": "v.mp4", "second": 0, "frame_id": "v.mp4|0", "text": "slide 1", "until": 10},
+    {"type": "video", "filename": "v.mp4", "second": 10, "frame_id": "v.mp4|10", "text": "slide 1", "same_as": 0},
+    {"type": "video", "filename": "v.mp4", "second": 12.5, "frame_id": "v.mp4|12.5", "text": ""},
+    # image-video-index keys frames on "video" rather than "filename"
+    {"type": "video", "video": "w.avi", "second": 5, "frame_id": "w.avi|5", "text": "w"},
+    {"type": "pdf", "filename": "doc.pdf", "page": 1, "page_id": "doc.pdf|p1", "text": "page one", "source": "text"},
+    # ids that do not follow the usual scheme are kept as they are
+    {"type": "pdf", "filename": "doc.pdf", "page": 2, "page_id": "custom-2", "text": "page two"},
+    {"type": "video", "filename": "x.mp4", "second": 3, "text": "no frame id"},
+    {"type": "docx", "filename": "notes.docx", "text": None},
+    {"type": "xlsx", "filename": "sheet.xlsx", "text": ["not", "a", "string"]},
+]
+
+
+@pytest.fixture
+def pack_path(tmp_path):
+    path = str(tmp_path / "index.pack")
+    assert write_pack(ITEMS, path) == len(ITEMS)
+    return path
+
+
+def test_round_trip(pack_path):
+    with PackedIndex(pack_path) as index:
+        assert len(index) == len(ITEMS)
+        assert list(index) == ITEMS
+        assert index[-1] == ITEMS[-1]
+        assert index.text(0) == ITEMS[0]["text"]
+        with pytest.raises(IndexError):
+            index.record(len(ITEMS))
+
+
+def test_small_blocks(tmp_path):
+    # Every record in its own compressed block, and texts larger than a block
+    path = str(tmp_path / "index.pack")
+    items = ITEMS + [{"type": "txt", "filename": "big.txt", "text": "x" * 5000}]
+    write_pack(items, path, block_size=16)
+    with PackedIndex(path, cached_blocks=2) as index:
+        assert list(index) == items
+        assert [index[i] for i in reversed(range(len(items)))] == items[::-1]
+
+
+def test_records_without_text(pack_path):
+    with PackedIndex(pack_path) as index:
+        records = list(index.iter_records(with_text=False))
+    assert [r["type"] for r in records] == [item["type"] for item in ITEMS]
+    assert all("text" not in r for r in records)
+    assert records[1] == {"type": "video", "filename": "v.mp4", "second": 0, "frame_id": "v.mp4|0"}
+    assert records[6]["page_id"] == "custom-2"
+
+
+def test_records_of_some_paths(pack_path):
+    with PackedIndex(pack_path) as index:
+        assert list(index.iter_records(paths={"doc.pdf", "w.avi"})) == [ITEMS[4], ITEMS[5], ITEMS[6]]
+        assert list(index.iter_records(paths=set())) == []
+
+
+def test_empty_pack(tmp_path):
+    path = str(tmp_path / "index.pack")
+    assert write_pack([], path) == 0
+    with PackedIndex(path) as index:
+        assert len(index) == 0
+        assert list(index) == []
+
+
+def test_not_a_pack(tmp_path):
+    path = tmp_path / "index.pack"
+    path.write_bytes(b"[]" * 100)
+    with pytest.raises(ValueError):
+        PackedIndex(str(path))
+
+
+def test_released_without_the_cyclic_gc(pack_path):
+    # The app drops a replaced pack instead of closing it; its mapping must go as
+    # soon as the last reference does
+    gc.disable()
+    try:
+        index = PackedIndex(pack_path)
+        index[0]
+        ref = weakref.ref(index)
+        del index
+        assert ref() is None
+    finally:
+        gc.enable()
@@ -0,0 +1,93 @@
+import json
+
+from index_pack import write_pack
+from index_store import TOMBSTONE, IndexWriter, compact_index, collect_records, iter_index_records, list_segments
+
+
+def write_index(path, items):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(items, f)
+
+
+def write_segment(index_file, records):
+    with IndexWriter(index_file) as writer:
+        for record in records:
+            writer.write(record)
+
+
+def image(name, text):
+    return {"type": "image", "filename": name, "text": text}
+
+
+def frame(video, second, text):
+    return {"type": "video", "filename": video, "second": second, "frame_id": f"{video}|{second}", "text": text}
+
+
+def test_tombstone_drops_earlier_records(tmp_path):
+    index_file = str(tmp_path / "index.json")
+    write_index(index_file, [image("a.png", "old a"), image("b.png", "b"), frame("v.mp4", 0, "f0"), frame("v.mp4", 5, "f5")])
+    write_segment(index_file, [{"type": TOMBSTONE, "filename": "a.png"}, {"type": TOMBSTONE, "filename": "v.mp4"},
+                               frame("v.mp4", 0, "new f0")])
+
+    assert compact_index(index_file) == 2
+    with open(index_file, encoding="utf-8") as f:
+        assert json.load(f) == [image("b.png", "b"), frame("v.mp4", 0, "new f0")]
+    assert list_segments(index_file) == []
+
+
+def test_record_after_tombstone_survives(tmp_path):
+    # A changed file: tombstone, then its new records, in the same segment
+    index_file = str(tmp_path / "index.json")
+    write_index(index_file, [image("a.png", "old")])
+    write_segment(index_file, [{"type": TOMBSTONE, "filename": "a.png"}, image("a.png", "new")])
+    assert collect_records(index_file, ["a.png"])["a.png"] == [image("a.png", "new")]
+    compact_index(index_file)
+    with open(index_file, encoding="utf-8") as f:
+        assert json.load(f) == [image("a.png", "new")]
+
+
+def test_tombstone_replay_is_idempotent(tmp_path):
+    # A crash between swapping in index.json and removing the segments replays
+    # them on the next compaction: the result must not change
+    index_file = str(tmp_path / "index.json")
+    write_index(index_file, [image("a.png", "a"), image("b.png", "b"), frame("v.mp4", 0, "f0")])
+    records = [{"type": TOMBSTONE, "filename": "a.png"}, image("c.png", "c"),
+               {"type": TOMBSTONE, "filename": "v.mp4"}, frame("v.mp4", 0, "f0 again"),
+               {"type": TOMBSTONE, "filename": "c.png"}, image("c.png", "c2")]
+    write_segment(index_file, records)
+    compact_index(index_file)
+    with open(index_file, encoding="utf-8") as f:
+        once = json.load(f)
+
+    for _ in range(2):
+        write_segment(index_file, records)
+        compact_index(index_file)
+        with open(index_file, encoding="utf-8") as f:
+            assert json.load(f) == once
+    assert once == [image("b.png", "b"), frame("v.mp4", 0, "f0 again"), image("c.png", "c2")]
+
+
+def test_tombstone_of_unknown_file_is_harmless(tmp_path):
+    index_file = str(tmp_path / "index.json")
+    write_index(index_file, [image("a.png", "a")])
+    write_segment(index_file, [{"type": TOMBSTONE, "filename": "gone.png"}])
+    assert compact_index(index_file) == 1
+    assert [item for item in iter_index_records(index_file)] == [image("a.png", "a")]
+
+
+def test_pack_compaction_matches_json(tmp_path):
+    items = [image("a.png", "a"), image("b.png", "b")]
+    records = [{"type": TOMBSTONE, "filename": "a.png"}, image("c.png", "c")]
+    results = []
+    for name in ("index.json", "index.pack"):
+        index_file = str(tmp_path / name)
+        if name.endswith(".json"):
+            write_index(index_file, items)
+        else:
+            write_pack(items, index_file)
+        write_segment(index_file, records)
+        compact_index(index_file)
+        write_segment(index_file, records)
+        compact_index(index_file)
+        results.append(list(iter_index_records(index_file)))
+    assert results[0] == results[1] == [image("b.png", "b"), image("c.png", "c")]
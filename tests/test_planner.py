@@ -0,0 +1,145 @@
+import os
+
+from index_store import IncrementalPlanner, hash_file
+
+UNCHANGED, PROCESS, COPY = IncrementalPlanner.UNCHANGED, IncrementalPlanner.PROCESS, IncrementalPlanner.COPY
+
+
+def make_file(folder, name, data):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def entry(folder, name, **extra):
+    path = os.path.join(folder, name)
+    st = os.stat(path)
+    return dict({"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": hash_file(path)}, **extra)
+
+
+def test_unchanged_file_is_not_hashed_again(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "a.png", b"aaa")
+    planner = IncrementalPlanner(folder, {"a.png": dict(entry(folder, "a.png"), hash="not rehashed")}, {"a.png"})
+    assert planner.classify("image", "a.png") == (UNCHANGED, None, False)
+    assert planner.entries["a.png"]["hash"] == "not rehashed"
+
+
+def test_touched_file_with_same_content_is_unchanged(tmp_path):
+    folder = str(tmp_path)
+    path = make_file(folder, "a.png", b"aaa")
+    manifest = {"a.png": entry(folder, "a.png")}
+    os.utime(path, ns=(1, 1))
+    planner = IncrementalPlanner(folder, manifest, {"a.png"})
+    assert planner.classify("image", "a.png") == (UNCHANGED, None, False)
+    assert planner.entries["a.png"]["mtime_ns"] == 1
+
+
+def test_changed_file_is_processed_and_stale(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "a.png", b"aaa")
+    manifest = {"a.png": entry(folder, "a.png")}
+    make_file(folder, "a.png", b"changed")
+    planner = IncrementalPlanner(folder, manifest, {"a.png"})
+    assert planner.classify("image", "a.png") == (PROCESS, None, True)
+    assert "a.png" not in planner.entries
+    planner.commit("a.png")
+    assert planner.entries["a.png"]["hash"] == hash_file(os.path.join(folder, "a.png"))
+
+
+def test_new_file_with_indexed_content_is_copied(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "a.png", b"same")
+    make_file(folder, "copy.png", b"same")
+    planner = IncrementalPlanner(folder, {"a.png": entry(folder, "a.png")}, {"a.png"})
+    assert planner.classify("image", "a.png") == (UNCHANGED, None, False)
+    assert planner.classify("image", "copy.png") == (COPY, "a.png", False)
+    assert planner.counts == {UNCHANGED: 1, PROCESS: 0, COPY: 1}
+
+
+def test_moved_file_is_copied_from_its_old_path(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "old.png", b"moved")
+    manifest = {"old.png": entry(folder, "old.png")}
+    os.rename(os.path.join(folder, "old.png"), os.path.join(folder, "new.png"))
+    planner = IncrementalPlanner(folder, manifest, {"old.png"})
+    assert planner.classify("image", "new.png") == (COPY, "old.png", False)
+    assert planner.deleted() == ["old.png"]
+
+
+def test_changed_file_taking_indexed_content_is_copied_and_stale(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "a.png", b"aaa")
+    make_file(folder, "b.png", b"bbb")
+    manifest = {"a.png": entry(folder, "a.png"), "b.png": entry(folder, "b.png")}
+    make_file(folder, "b.png", b"aaa")
+    planner = IncrementalPlanner(folder, manifest, {"a.png", "b.png"})
+    assert planner.classify("image", "b.png") == (COPY, "a.png", True)
+
+
+def test_content_without_records_is_not_a_copy_source(tmp_path):
+    # In the manifest but not in the index (e.g. the index was rebuilt): nothing to copy
+    folder = str(tmp_path)
+    make_file(folder, "a.png", b"same")
+    make_file(folder, "copy.png", b"same")
+    planner = IncrementalPlanner(folder, {"a.png": entry(folder, "a.png")}, set())
+    assert planner.classify("image", "copy.png") == (PROCESS, None, False)
+
+
+def test_indexed_file_without_manifest_entry(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "a.png", b"aaa")
+    make_file(folder, "v.mp4", b"video")
+    planner = IncrementalPlanner(folder, {}, {"a.png", "v.mp4"})
+    assert planner.classify("image", "a.png") == (UNCHANGED, None, False)
+    assert planner.entries["a.png"]["hash"] is None
+    # Videos still resume to fill any missing frames
+    assert planner.classify("video", "v.mp4") == (PROCESS, None, False)
+
+
+def test_incomplete_file_is_retried(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "doc.pdf", b"pdf")
+    make_file(folder, "v.mp4", b"video")
+    manifest = {"doc.pdf": entry(folder, "doc.pdf", incomplete=True), "v.mp4": entry(folder, "v.mp4", incomplete=True)}
+    planner = IncrementalPlanner(folder, manifest, {"doc.pdf", "v.mp4"})
+    # Other files are redone from scratch, videos resume and keep their frames
+    assert planner.classify("pdf", "doc.pdf") == (PROCESS, None, True)
+    assert planner.classify("video", "v.mp4") == (PROCESS, None, False)
+    assert "incomplete" not in planner.pending["doc.pdf"]
+
+
+def test_touched_incomplete_file_is_retried(tmp_path):
+    folder = str(tmp_path)
+    path = make_file(folder, "doc.pdf", b"pdf")
+    manifest = {"doc.pdf": entry(folder, "doc.pdf", incomplete=True)}
+    os.utime(path, ns=(1, 1))
+    planner = IncrementalPlanner(folder, manifest, {"doc.pdf"})
+    assert planner.classify("pdf", "doc.pdf") == (PROCESS, None, True)
+
+
+def test_commit_records_incomplete_files(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "doc.pdf", b"pdf")
+    planner = IncrementalPlanner(folder, {}, set())
+    assert planner.classify("pdf", "doc.pdf") == (PROCESS, None, False)
+    planner.commit("doc.pdf", complete=False)
+    assert planner.entries["doc.pdf"]["incomplete"] is True
+
+    # Next run: retried, and not offered as the source of a copy meanwhile
+    make_file(folder, "copy.pdf", b"pdf")
+    planner = IncrementalPlanner(folder, dict(planner.entries), {"doc.pdf"})
+    assert planner.classify("pdf", "copy.pdf") == (PROCESS, None, False)
+    assert planner.classify("pdf", "doc.pdf") == (PROCESS, None, True)
+    planner.commit("doc.pdf")
+    assert "incomplete" not in planner.entries["doc.pdf"]
+
+
+def test_deleted_covers_manifest_and_index(tmp_path):
+    folder = str(tmp_path)
+    make_file(folder, "a.png", b"aaa")
+    planner = IncrementalPlanner(folder, {"a.png": entry(folder, "a.png"), "gone.png": {"size": 1, "mtime_ns": 1, "hash": "x"}},
+                                 {"a.png", "only-indexed.png"})
+    planner.classify("image", "a.png")
+    assert planner.deleted() == ["gone.png", "only-indexed.png"]
@@ -0,0 +1,131 @@
+import json
+import os
+
+from index_pack import PackedIndex
+from index_store import load_manifest, save_manifest
+from shards import DONE, RUNNING, merge_shards, shard_of, shard_path, write_shard_info
+
+PARAMS = {"lang": "eng", "interval": 5}
+
+
+def image(name, text=None):
+    return {"type": "image", "filename": name, "text": text or f"text of {name}"}
+
+
+def names_in(shard, count, n=3):
+    # The first n file names that hash to shard
+    names, i = [], 0
+    while len(names) < n:
+        name = f"img{i}.png"
+        if shard_of(name, count) == shard:
+            names.append(name)
+        i += 1
+    return names
+
+
+def write_shard(base, index, count, items, status=DONE, params=PARAMS, entries=None):
+    path = shard_path(base, index, count)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(items, f)
+    save_manifest(os.path.splitext(path)[0] + ".manifest.json", {item["filename"]: {"hash": item["filename"]} for item in items})
+    write_shard_info(path, (index, count), "json", params, status, len(items) if entries is None else entries)
+    return path
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_merge_is_sorted_and_merges_manifests(tmp_path):
+    base = str(tmp_path / "index.json")
+    one, two = names_in(1, 2), names_in(2, 2)
+    write_shard(base, 1, 2, [image(n) for n in reversed(one)])
+    write_shard(base, 2, 2, [image(n) for n in two])
+
+    n, problems = merge_shards(base, base)
+    assert problems == []
+    assert n == 6
+    assert read(base) == [image(n) for n in sorted(one + two)]
+    assert sorted(load_manifest(str(tmp_path / "index.manifest.json"))) == sorted(one + two)
+
+
+def test_conflicting_records_block_the_merge(tmp_path):
+    base = str(tmp_path / "index.json")
+    one = names_in(1, 2)
+    write_shard(base, 1, 2, [image(n) for n in one] + [image(one[0], "different text")])
+    write_shard(base, 2, 2, [image(n) for n in names_in(2, 2)])
+
+    _, problems = merge_shards(base, base)
+    assert problems == [f"shard 1/2: conflicting records for ('image', '{one[0]}')"]
+    assert not os.path.exists(base)
+    assert not os.path.exists(base + ".merge.tmp")
+
+
+def test_identical_duplicates_are_dropped(tmp_path, capsys):
+    base = str(tmp_path / "index.json")
+    one = names_in(1, 2)
+    write_shard(base, 1, 2, [image(n) for n in one] + [image(one[0])])
+    write_shard(base, 2, 2, [image(n) for n in names_in(2, 2)])
+
+    n, problems = merge_shards(base, base)
+    assert problems == []
+    assert n == 6
+    assert "1 duplicate records dropped" in capsys.readouterr().out
+
+
+def test_record_in_the_wrong_shard_is_a_problem(tmp_path):
+    base = str(tmp_path / "index.json")
+    stray = names_in(2, 2)[0]
+    write_shard(base, 1, 2, [image(n) for n in names_in(1, 2)] + [image(stray)])
+    write_shard(base, 2, 2, [])
+
+    _, problems = merge_shards(base, base)
+    assert problems == [f"shard 1/2: {stray} belongs to shard 2/2"]
+
+
+def test_missing_running_and_mismatched_shards(tmp_path):
+    base = str(tmp_path / "index.json")
+    write_shard(base, 1, 3, [image(n) for n in names_in(1, 3)])
+    write_shard(base, 2, 3, [image(n) for n in names_in(2, 3)], status=RUNNING)
+
+    _, problems = merge_shards(base, base)
+    assert len(problems) == 2
+    assert problems[0].startswith("shard 2/3: still running")
+    assert problems[1] == "missing shards: 3/3"
+
+    # --partial merges what is there
+    n, problems = merge_shards(base, base, partial=True)
+    assert problems == []
+    assert n == 6
+
+    write_shard(base, 3, 3, [], params=dict(PARAMS, lang="vie"))
+    _, problems = merge_shards(base, base, partial=True)
+    assert problems[0].startswith("shards were indexed with different options")
+
+
+def test_truncated_shard_is_a_problem(tmp_path):
+    base = str(tmp_path / "index.json")
+    write_shard(base, 1, 1, [image(n) for n in names_in(1, 1)], entries=5)
+    _, problems = merge_shards(base, base)
+    assert problems == ["shard 1/1: 3 entries, but its run saved 5 (changed or truncated since)"]
+
+
+def test_check_only_writes_nothing(tmp_path):
+    base = str(tmp_path / "index.json")
+    write_shard(base, 1, 1, [image(n) for n in names_in(1, 1)])
+    n, problems = merge_shards(base, base, check_only=True)
+    assert (n, problems) == (3, [])
+    assert not os.path.exists(base)
+
+
+def test_merge_into_pack(tmp_path):
+    base = str(tmp_path / "index.json")
+    one, two = names_in(1, 2), names_in(2, 2)
+    write_shard(base, 1, 2, [image(n) for n in one])
+    write_shard(base, 2, 2, [image(n) for n in two])
+    output = str(tmp_path / "index.pack")
+    n, problems = merge_shards(base, output)
+    assert (n, problems) == (6, [])
+    with PackedIndex(output) as index:
+        assert list(index) == [image(n) for n in sorted(one + two)]